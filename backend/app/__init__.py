@@ -10,6 +10,7 @@ def create_app(config_name='development'):
     """Application Factory Pattern"""
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.config['CONFIG_NAME'] = config_name
 
     # Initialize extensions
     db.init_app(app)
@@ -78,21 +78,18 @@ def register():
     )
     db.session.add(profile)
 
+    # Welcome notification, committed with the new account (email via outbox)
+    NotificationService.enqueue(
+        user_id=user.id,
+        title="Bienvenido a UniFinanzas",
+        message="Tu cuenta esta lista. Empieza a registrar gastos, metas y presupuestos.",
+        notification_type="general",
+        channels=("email", "db")
+    )
+
     # Create default categories
     create_default_categories(user.id, commit=True)
 
-    # Welcome notification (DB only)
-    try:
-        NotificationService.send_notification(
-            user_id=user.id,
-            title="Bienvenido a UniFinanzas",
-            message="Tu cuenta esta lista. Empieza a registrar gastos, metas y presupuestos.",
-            notification_type="general",
-            channels=("email", "db")
-        )
-    except Exception as exc:
-        current_app.logger.warning(f"Welcome notification failed: {exc}")
-
     # Create tokens
     access_token = create_access_token(identity=user)
     refresh_token = create_refresh_token(identity=user)
@@ -36,6 +36,19 @@ class ExpenseUpdateSchema(Schema):
 
 # ========== ENDPOINTS ==========
 
+def _schedule_threshold_check(user_id, expense_amount):
+    """Disparar verificación de umbrales de forma asíncrona (no bloquear si falla)"""
+    try:
+        from app.tasks.notification_tasks import check_budget_threshold_task
+        check_budget_threshold_task.delay(
+            user_id=user_id,
+            expense_amount=expense_amount
+        )
+    except Exception as e:
+        # Log error but don't fail the request
+        logger.debug(f"Threshold check task: {e}")
+
+
 @expenses_bp.route('', methods=['GET'])
 @jwt_required()
 @limiter.limit("100 per minute")
@@ -139,18 +152,10 @@ def create_expense():
             except Exception as e:
                 current_app.logger.error(f"Error uploading attachment: {e}")
 
+    BudgetService.apply_expense_deltas(current_user.id, [(expense.expense_date, expense.amount)])
     db.session.commit()
 
-    # Disparar verificación de umbrales de forma asíncrona (no bloquear si falla)
-    try:
-        from app.tasks.notification_tasks import check_budget_threshold_task
-        check_budget_threshold_task.delay(
-            user_id=current_user.id,
-            expense_amount=float(expense.amount)
-        )
-    except Exception as e:
-        # Log error but don't fail the request
-        logger.debug(f"Threshold check task: {e}")
+    _schedule_threshold_check(current_user.id, float(expense.amount))
 
     # Log audit
     log_audit(
@@ -211,18 +216,10 @@ def quick_expense():
     )
 
     db.session.add(expense)
+    BudgetService.apply_expense_deltas(current_user.id, [(expense.expense_date, expense.amount)])
     db.session.commit()
 
-    # Disparar verificación de umbrales de forma asíncrona (no bloquear si falla)
-    try:
-        from app.tasks.notification_tasks import check_budget_threshold_task
-        check_budget_threshold_task.delay(
-            user_id=current_user.id,
-            expense_amount=float(expense.amount)
-        )
-    except Exception as e:
-        # Log error but don't fail the request
-        logger.debug(f"Threshold check task: {e}")
+    _schedule_threshold_check(current_user.id, float(expense.amount))
 
     # Calculate new risk indicator (no bloquear si falla)
     try:
@@ -289,6 +286,7 @@ def update_expense(expense_id):
 
     # Save old values for audit
     old_values = expense.to_dict()
+    old_amount, old_date = expense.amount, expense.expense_date
 
     # Update fields
     if 'amount' in data:
@@ -313,8 +311,19 @@ def update_expense(expense_id):
     if 'tags' in data:
         expense.tags = data['tags']
 
+    # Mover el gasto entre contadores de periodo si cambió el monto o la fecha
+    amount_changed = expense.amount != old_amount or expense.expense_date != old_date
+    if amount_changed:
+        BudgetService.apply_expense_deltas(current_user.id, [
+            (old_date, -old_amount),
+            (expense.expense_date, expense.amount)
+        ])
+
     db.session.commit()
 
+    if amount_changed:
+        _schedule_threshold_check(current_user.id, float(expense.amount - old_amount))
+
     # Log audit
     log_audit(
         user_id=current_user.id,
@@ -352,8 +361,11 @@ def delete_expense(expense_id):
 
     # Soft delete
     expense.soft_delete(reason=reason)
+    BudgetService.apply_expense_deltas(current_user.id, [(expense.expense_date, -expense.amount)])
     db.session.commit()
 
+    _schedule_threshold_check(current_user.id, -float(expense.amount))
+
     # Log audit
     log_audit(
         user_id=current_user.id,
@@ -132,6 +132,7 @@ def update_preferences():
             current_prefs[key] = data[key]
 
     profile.notification_preferences = current_prefs
+    profile.schedule_daily_reminder()
     db.session.commit()
 
     return jsonify({
@@ -6,6 +6,7 @@ from flask_jwt_extended import jwt_required, current_user
 
 from app.extensions import db
 from app.models import Payment, Category
+from app.services.payment_reminder_service import PaymentReminderService
 
 payments_bp = Blueprint('payments', __name__)
 
@@ -113,6 +114,8 @@ def create_payment():
     )
 
     db.session.add(payment)
+    db.session.flush()
+    PaymentReminderService.schedule(payment)
     db.session.commit()
 
     return jsonify({'payment': payment.to_dict()}), 201
@@ -147,6 +150,7 @@ def update_payment(payment_id):
             payment.reminder_7_sent = False
             payment.reminder_3_sent = False
             payment.reminder_0_sent = False
+            PaymentReminderService.schedule(payment)
     if 'frequency' in data:
         if data['frequency'] not in ALLOWED_FREQUENCIES:
             return jsonify({'error': 'Invalid frequency'}), 400
@@ -198,7 +202,10 @@ def mark_payment_paid(payment_id):
             notes=payment.notes
         )
         db.session.add(next_payment)
+        db.session.flush()
+        PaymentReminderService.schedule(next_payment)
 
+    PaymentReminderService.schedule(payment)
     db.session.commit()
 
     response = {'payment': payment.to_dict()}
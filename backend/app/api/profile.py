@@ -4,6 +4,7 @@ from marshmallow import Schema, fields, validate, ValidationError, EXCLUDE
 
 from app.extensions import db
 from app.models import UserProfile
+from app.services.payment_reminder_service import PaymentReminderService
 
 profile_bp = Blueprint('profile', __name__)
 
@@ -79,6 +80,10 @@ def update_profile():
         current_prefs.update(data['notification_preferences'] or {})
         profile.notification_preferences = current_prefs
 
+    if 'timezone' in data or 'notification_preferences' in data:
+        profile.schedule_daily_reminder()
+        PaymentReminderService.reschedule_user(profile)
+
     if 'risk_thresholds' in data:
         # Validate thresholds
         thresholds = data['risk_thresholds']
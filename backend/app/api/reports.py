@@ -5,6 +5,7 @@ import io
 from flask import Blueprint, jsonify, request, send_file
 from flask_jwt_extended import current_user, jwt_required
 
+from app.extensions import task_queue
 from app.models import Expense
 from app.services.budget_service import BudgetService
 from app.services.report_service import ReportService
@@ -122,17 +123,22 @@ def download_pdf():
         if start_date > end_date:
             return jsonify({'error': 'start_date no puede ser mayor que end_date'}), 400
 
-        pdf_buffer = ReportService.generate_pdf_report(
-            user_id=current_user.id,
-            report_type=report_type,
-            start_date=start_date,
-            end_date=end_date
+        # El render es CPU-bound: se hace en el pool de procesos del lane 'cpu_sync',
+        # separado del de los reportes asincronos para no esperar detras de ellos
+        pdf_bytes = task_queue.call(
+            'cpu_sync',
+            ReportService.render_pdf_bytes,
+            current_user.id,
+            report_type,
+            start_date,
+            end_date,
+            timeout=60
         )
 
         filename = f"reporte_gastos_{start_date_str}_{end_date_str}.pdf"
 
         return send_file(
-            pdf_buffer,
+            io.BytesIO(pdf_bytes),
             mimetype='application/pdf',
             as_attachment=True,
             download_name=filename
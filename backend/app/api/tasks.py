@@ -1,14 +1,34 @@
 """
 Task status endpoints - Check local task queue status
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request
 from flask_jwt_extended import jwt_required
 
 from app.extensions import task_queue
+from app.task_metrics import provider_metrics
 
 tasks_bp = Blueprint('tasks', __name__)
 
 
+@tasks_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def get_task_metrics():
+    """
+    Métricas de la cola local: latencia de espera y ejecución por tarea,
+    contadores por resultado y profundidad actual por lane, más la latencia y
+    el resultado de las peticiones a proveedores (Brevo, FCM).
+
+    Usa ?format=prometheus para el formato de texto de Prometheus.
+    """
+    if request.args.get('format') == 'prometheus':
+        return Response(
+            task_queue.metrics_text() + provider_metrics.render_prometheus(),
+            mimetype='text/plain; version=0.0.4'
+        )
+
+    return jsonify({**task_queue.metrics_snapshot(), 'providers': provider_metrics.snapshot()}), 200
+
+
 @tasks_bp.route('/<task_id>', methods=['GET'])
 @jwt_required()
 def get_task_status(task_id):
@@ -29,6 +49,8 @@ def get_task_status(task_id):
             'state': task.state,
             'status': 'Task is running'
         }
+        if isinstance(task.info, dict):
+            response['progress'] = task.info
     elif task.state == 'SUCCESS':
         response = {
             'state': task.state,
@@ -46,6 +68,12 @@ def get_task_status(task_id):
             'state': task.state,
             'status': 'Task cancelled'
         }
+    elif task.state == 'TIMEOUT':
+        response = {
+            'state': task.state,
+            'status': 'Task exceeded its time limit',
+            'error': str(task.info)
+        }
     elif task.state == 'RETRY':
         response = {
             'state': task.state,
@@ -43,9 +43,13 @@ class Config:
     BREVO_FROM_EMAIL = os.environ.get('BREVO_FROM_EMAIL', 'noreply@unifinanzas.com')
     BREVO_FROM_NAME = os.environ.get('BREVO_FROM_NAME', 'UniFinanzas')
     BREVO_API_URL = os.environ.get('BREVO_API_URL', 'https://api.brevo.com/v3/smtp/email')
+    BREVO_TIMEOUT = float(os.environ.get('BREVO_TIMEOUT', 10))  # seconds
+    BREVO_POOL_SIZE = int(os.environ.get('BREVO_POOL_SIZE', 10))  # keep-alive connections per process
+    BREVO_BATCH_SIZE = int(os.environ.get('BREVO_BATCH_SIZE', 100))  # messageVersions per request
 
     # FCM (Firebase Cloud Messaging)
     FCM_SERVER_KEY = os.environ.get('FCM_SERVER_KEY')
+    FCM_BATCH_SIZE = int(os.environ.get('FCM_BATCH_SIZE', 1000))  # tokens per multicast request (FCM max 1000)
 
     # Redis (Cache)
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
@@ -54,14 +58,62 @@ class Config:
     CACHE_DEFAULT_TIMEOUT = 300
 
     # Task Queue (in-process)
-    TASK_QUEUE_MAX_WORKERS = int(os.environ.get('TASK_QUEUE_MAX_WORKERS', 4))
+    TASK_QUEUE_MAX_WORKERS = int(os.environ.get('TASK_QUEUE_MAX_WORKERS', 4))  # 'default' lane
+    TASK_QUEUE_LANES = {  # worker threads per named lane
+        'interactive': int(os.environ.get('TASK_QUEUE_INTERACTIVE_WORKERS', 2)),
+        'bulk': int(os.environ.get('TASK_QUEUE_BULK_WORKERS', 2)),
+    }
+    TASK_QUEUE_PROCESS_LANES = {  # worker processes per lane (CPU-bound work, e.g. PDF rendering)
+        'cpu': int(os.environ.get('TASK_QUEUE_CPU_PROCESSES', 2)),
+        'cpu_sync': int(os.environ.get('TASK_QUEUE_CPU_SYNC_PROCESSES', 1)),  # task_queue.call from requests
+    }
+    # 'inline': tasks run in the web process; 'external': .delay() inserts into task_jobs for `python -m app.worker`
+    TASK_QUEUE_MODE = os.environ.get('TASK_QUEUE_MODE', 'inline')
+    TASK_QUEUE_JOB_LEASE = int(os.environ.get('TASK_QUEUE_JOB_LEASE', 300))  # seconds
+    TASK_QUEUE_JOB_MAX_ATTEMPTS = int(os.environ.get('TASK_QUEUE_JOB_MAX_ATTEMPTS', 5))
+    TASK_QUEUE_WORKER_POLL_INTERVAL = float(os.environ.get('TASK_QUEUE_WORKER_POLL_INTERVAL', 1.0))
     TASK_QUEUE_SCHEDULER_ENABLED = os.environ.get('TASK_QUEUE_SCHEDULER_ENABLED', 'false').lower() == 'true'
     TASK_QUEUE_TIMEZONE = os.environ.get('TASK_QUEUE_TIMEZONE', 'America/Lima')
+    # Only the elected leader fires cron triggers: 'auto' (Postgres advisory lock, file lock otherwise), 'postgres', 'file'
+    TASK_QUEUE_SCHEDULER_LOCK = os.environ.get('TASK_QUEUE_SCHEDULER_LOCK', 'auto')
+    TASK_QUEUE_SCHEDULER_LOCK_FILE = os.environ.get('TASK_QUEUE_SCHEDULER_LOCK_FILE', '/tmp/unifinanzas/scheduler.lock')
+    TASK_QUEUE_SCHEDULER_ELECTION_INTERVAL = int(os.environ.get('TASK_QUEUE_SCHEDULER_ELECTION_INTERVAL', 15))  # seconds
+    TASK_QUEUE_SCHEDULER_MISFIRE_GRACE = int(os.environ.get('TASK_QUEUE_SCHEDULER_MISFIRE_GRACE', 30))  # seconds
+    TASK_QUEUE_MAX_RECORDS = int(os.environ.get('TASK_QUEUE_MAX_RECORDS', 10000))
+    TASK_QUEUE_RECORD_TTLS = {  # seconds since last update; None = keep until capacity eviction
+        'SUCCESS': int(os.environ.get('TASK_QUEUE_SUCCESS_TTL', 3600)),
+        'FAILURE': int(os.environ.get('TASK_QUEUE_FAILURE_TTL', 86400)),
+        'REVOKED': int(os.environ.get('TASK_QUEUE_REVOKED_TTL', 3600)),
+        'TIMEOUT': int(os.environ.get('TASK_QUEUE_TIMEOUT_TTL', 86400)),
+    }
+    # Shared task state so any worker can answer GET /api/v1/tasks/<id>: 'database', 'redis', 'memory' or 'none'
+    TASK_QUEUE_RESULT_BACKEND = os.environ.get('TASK_QUEUE_RESULT_BACKEND', 'database')
+    TASK_QUEUE_RESULT_REDIS_URL = os.environ.get('TASK_QUEUE_RESULT_REDIS_URL')  # defaults to REDIS_URL
+    TASK_QUEUE_RESULT_TTL = int(os.environ.get('TASK_QUEUE_RESULT_TTL', 86400))
+    TASK_QUEUE_RESULT_FLUSH_INTERVAL = float(os.environ.get('TASK_QUEUE_RESULT_FLUSH_INTERVAL', 0.5))
 
     # Rate Limiting
     RATELIMIT_DEFAULT = "200 per day, 50 per hour"
     RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 
+    # Periodic jobs
+    WEEKLY_SUMMARY_CHUNK_SIZE = int(os.environ.get('WEEKLY_SUMMARY_CHUNK_SIZE', 1000))  # users per subtask
+
+    # Notification retention (cleanup_old_notifications)
+    NOTIFICATION_RETENTION_READ_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_READ_DAYS', 30))
+    NOTIFICATION_RETENTION_UNREAD_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_UNREAD_DAYS', 180))
+    NOTIFICATION_RETENTION_MAX_PER_USER = int(os.environ.get('NOTIFICATION_RETENTION_MAX_PER_USER', 500))  # newest kept
+    NOTIFICATION_RETENTION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_RETENTION_BATCH_SIZE', 1000))
+    NOTIFICATION_RETENTION_BATCH_PAUSE = float(os.environ.get('NOTIFICATION_RETENTION_BATCH_PAUSE', 0.2))  # seconds
+    NOTIFICATION_RETENTION_ARCHIVE = os.environ.get('NOTIFICATION_RETENTION_ARCHIVE', 'false').lower() == 'true'
+
+    # Notification outbox (deliver_notification_outbox)
+    NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.environ.get('NOTIFICATION_OUTBOX_BATCH_SIZE', 100))
+    NOTIFICATION_OUTBOX_LEASE = int(os.environ.get('NOTIFICATION_OUTBOX_LEASE', 120))  # seconds
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5))
+    NOTIFICATION_OUTBOX_RETRY_DELAY = int(os.environ.get('NOTIFICATION_OUTBOX_RETRY_DELAY', 30))  # seconds, doubled per attempt
+    NOTIFICATION_OUTBOX_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_OUTBOX_RETENTION_DAYS', 7))  # finished rows
+
     # PDF Generation
     PDF_TEMP_DIR = os.environ.get('PDF_TEMP_DIR', '/tmp/unifinanzas/pdfs')
 
@@ -79,6 +131,8 @@ class TestingConfig(Config):
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)
     CACHE_TYPE = 'SimpleCache'
     WTF_CSRF_ENABLED = False
+    TASK_QUEUE_PROCESS_LANES = {}  # run 'cpu' tasks on the default thread lane
+    TASK_QUEUE_RESULT_BACKEND = 'memory'
 
 
 class ProductionConfig(Config):
@@ -1,11 +1,14 @@
 from app.models.user import User, UserProfile, RefreshToken
 from app.models.category import Category
-from app.models.budget import Budget, BudgetAllocation
+from app.models.budget import Budget, BudgetAllocation, BudgetSpendCounter
 from app.models.expense import Expense, Attachment
-from app.models.notification import Notification
-from app.models.payment import Payment
+from app.models.notification import Notification, NotificationArchive, NotificationOutbox
+from app.models.payment import Payment, PaymentReminder
 from app.models.audit import AuditLog
 from app.models.closure import WeeklyClosure
+from app.models.task_result import TaskResult
+from app.models.task_job import TaskJob
+from app.models.task_checkpoint import TaskCheckpoint
 
 __all__ = [
     'User',
@@ -14,10 +17,17 @@ __all__ = [
     'Category',
     'Budget',
     'BudgetAllocation',
+    'BudgetSpendCounter',
     'Expense',
     'Attachment',
     'Notification',
+    'NotificationArchive',
+    'NotificationOutbox',
     'Payment',
+    'PaymentReminder',
     'AuditLog',
-    'WeeklyClosure'
+    'WeeklyClosure',
+    'TaskResult',
+    'TaskJob',
+    'TaskCheckpoint'
 ]
@@ -68,3 +68,19 @@ class BudgetAllocation(db.Model):
             'allocated_amount': float(self.allocated_amount),
             'created_at': self.created_at.isoformat()
         }
+
+
+class BudgetSpendCounter(db.Model):
+    # Running total of a budget period, kept up to date with expense deltas
+    # (BudgetService.apply_expense_deltas) and reconciled by check_all_budgets.
+    # `level` is the last evaluated traffic light, used to detect crossings.
+    __tablename__ = 'budget_spend_counters'
+
+    budget_id = db.Column(db.String(36), db.ForeignKey('budgets.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    spent = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    level = db.Column(db.String(10), nullable=False, default='green')  # 'green', 'yellow', 'red'
+    updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<BudgetSpendCounter {self.budget_id} ${self.spent} {self.level}>'
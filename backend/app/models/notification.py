@@ -1,5 +1,5 @@
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from app.extensions import db
 
 
@@ -18,6 +18,10 @@ class Notification(db.Model):
     sent_at = db.Column(db.DateTime(timezone=True))
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_notifications_user_id_created_at', 'user_id', 'created_at'),
+    )
+
     def mark_as_read(self):
         self.is_read = True
         self.read_at = datetime.utcnow()
@@ -39,3 +43,55 @@ class Notification(db.Model):
 
     def __repr__(self):
         return f'<Notification {self.title}>'
+
+
+class NotificationArchive(db.Model):
+    # Cold copy of pruned notifications (NOTIFICATION_RETENTION_ARCHIVE=true):
+    # no message body or payload, no foreign keys.
+    __tablename__ = 'notification_archive'
+
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.String(36), nullable=False, index=True)
+    notification_type = db.Column(db.String(50), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    is_read = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime(timezone=True))
+    archived_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NotificationArchive {self.title}>'
+
+
+class NotificationOutbox(db.Model):
+    # One row per notification and external channel ('push', 'email'), written
+    # in the same transaction as the event that triggers it and drained by
+    # deliver_notification_outbox. Carries its own payload so channels without
+    # a 'db' record can still be delivered.
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    notification_id = db.Column(db.String(36), db.ForeignKey('notifications.id', ondelete='SET NULL'))
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    channel = db.Column(db.String(10), nullable=False)  # 'push', 'email'
+    notification_type = db.Column(db.String(50), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    data = db.Column(db.JSON, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'skipped', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Aware UTC: claim() and purge() compare these with aware datetimes, which a
+    # naive value would miss by the offset of the database TimeZone.
+    next_attempt_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    locked_until = db.Column(db.DateTime(timezone=True))
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime(timezone=True))
+
+    notification = db.relationship('Notification')
+
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.channel} {self.status}>'
@@ -40,3 +40,19 @@ class Payment(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
+
+
+class PaymentReminder(db.Model):
+    # Reminder schedule: one row per pending (payment, days before due). The
+    # per-minute job claims rows with fire_at <= now; rows past expires_at
+    # (end of that local day) are dropped without sending.
+    __tablename__ = 'payment_reminders'
+
+    payment_id = db.Column(db.String(36), db.ForeignKey('payments.id', ondelete='CASCADE'), primary_key=True)
+    days_before = db.Column(db.Integer, primary_key=True)  # 7, 3, 0
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    fire_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f'<PaymentReminder {self.payment_id} -{self.days_before}d @ {self.fire_at}>'
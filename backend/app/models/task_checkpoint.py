@@ -0,0 +1,20 @@
+from datetime import datetime
+from app.extensions import db
+
+
+class TaskCheckpoint(db.Model):
+    # One row per chunk of a fan-out job run (e.g. 'weekly_summary:2026-10-12');
+    # a re-run of the same key only enqueues the chunks not marked 'done'.
+    __tablename__ = 'task_checkpoints'
+
+    run_key = db.Column(db.String(100), primary_key=True)
+    chunk_index = db.Column(db.Integer, primary_key=True)
+    lower_bound = db.Column(db.String(36))  # inclusive user_id; None = open
+    upper_bound = db.Column(db.String(36))  # exclusive user_id; None = open
+    state = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'done'
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    completed_at = db.Column(db.DateTime(timezone=True))
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TaskCheckpoint {self.run_key}#{self.chunk_index} {self.state}>'
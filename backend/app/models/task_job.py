@@ -0,0 +1,26 @@
+import uuid
+from datetime import datetime
+from app.extensions import db
+
+
+class TaskJob(db.Model):
+    # Durable queue used when TASK_QUEUE_MODE=external; rows are claimed by
+    # `python -m app.worker` and deleted once the task finishes.
+    __tablename__ = 'task_jobs'
+    __table_args__ = (
+        db.Index('ix_task_jobs_state_run_at', 'state', 'run_at'),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = db.Column(db.String(255), nullable=False)
+    args = db.Column(db.JSON, default=list)
+    kwargs = db.Column(db.JSON, default=dict)
+    state = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running'
+    run_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    locked_by = db.Column(db.String(255))
+    locked_until = db.Column(db.DateTime(timezone=True))
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TaskJob {self.name} {self.state}>'
@@ -0,0 +1,17 @@
+from app.extensions import db
+
+
+class TaskResult(db.Model):
+    # Shared task state, written in batches by every worker's TaskQueue
+    __tablename__ = 'task_results'
+
+    id = db.Column(db.String(36), primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    state = db.Column(db.String(20), nullable=False)
+    result = db.Column(db.Text)  # JSON
+    info = db.Column(db.Text)
+    retries = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<TaskResult {self.name} {self.state}>'
@@ -2,6 +2,7 @@ import uuid
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.extensions import db
+from app.utils.helpers import next_local_occurrence, parse_time_of_day, pref_enabled
 from sqlalchemy.ext.mutable import MutableDict
 
 
@@ -74,6 +75,8 @@ class UserProfile(db.Model):
         'red': 85
     })
     fcm_token = db.Column(db.String(255))
+    # Próximo recordatorio diario (UTC); NULL si está desactivado.
+    next_reminder_at = db.Column(db.DateTime(timezone=True), index=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -83,6 +86,16 @@ class UserProfile(db.Model):
             return f"{self.first_name} {self.last_name}"
         return self.first_name or self.last_name or "Usuario"
 
+    def schedule_daily_reminder(self, after=None):
+        # Recalcular cuando cambian daily_reminder, reminder_time o la zona horaria.
+        prefs = self.notification_preferences or {}
+        if not pref_enabled(prefs, 'daily_reminder', False):
+            self.next_reminder_at = None
+            return
+        self.next_reminder_at = next_local_occurrence(
+            parse_time_of_day(prefs.get('reminder_time', '20:00')), self.timezone, after
+        )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -1,9 +1,13 @@
 from datetime import date, timedelta
 from decimal import Decimal
-from sqlalchemy import func
+from sqlalchemy import and_, case, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.extensions import db
-from app.models import Budget, Expense, UserProfile, Category, Payment
+from app.models import Budget, BudgetSpendCounter, Expense, UserProfile, Category, Payment
+
+# Orden de los niveles del semáforo para detectar cruces de umbral hacia arriba
+LEVEL_RANK = {'green': 0, 'yellow': 1, 'red': 2}
 
 
 class BudgetService:
@@ -36,6 +40,23 @@ class BudgetService:
 
         return Decimal(str(total))
 
+    @staticmethod
+    def get_period_expenses_by_user(user_ids, start_date, end_date):
+        """Get total expenses in a period for several users (one grouped query)"""
+        if not user_ids:
+            return {}
+        rows = db.session.query(
+            Expense.user_id,
+            func.coalesce(func.sum(Expense.amount), 0)
+        ).filter(
+            Expense.user_id.in_(user_ids),
+            Expense.is_deleted == False,
+            Expense.expense_date >= start_date,
+            Expense.expense_date <= end_date
+        ).group_by(Expense.user_id).all()
+
+        return {user_id: Decimal(str(total)) for user_id, total in rows}
+
     @staticmethod
     def get_expenses_by_category(user_id, start_date, end_date, include_payments=False):
         """Get expenses grouped by category"""
@@ -116,6 +137,87 @@ class BudgetService:
 
         return categories
 
+    @staticmethod
+    def get_period_summaries(user_ids, start_date, end_date, top_n=3):
+        """Get total spent, top-N categories and active budget for many users in one query.
+
+        Returns ``{user_id: {'total_spent', 'budget', 'top_categories'}}`` for every
+        requested user; ``budget`` is None without an active budget.
+        """
+        summaries = {
+            user_id: {'total_spent': 0.0, 'budget': None, 'top_categories': []}
+            for user_id in user_ids
+        }
+        if not summaries:
+            return summaries
+
+        category_total = func.sum(Expense.amount)
+        per_category = db.session.query(
+            Expense.user_id.label('user_id'),
+            Category.name.label('name'),
+            Category.icon.label('icon'),
+            category_total.label('total'),
+            func.sum(category_total).over(partition_by=Expense.user_id).label('user_total'),
+            func.row_number().over(
+                partition_by=Expense.user_id,
+                order_by=(category_total.desc(), Category.name)
+            ).label('rank')
+        ).join(
+            Category, Expense.category_id == Category.id
+        ).filter(
+            Expense.user_id.in_(user_ids),
+            Expense.is_deleted == False,
+            Expense.expense_date >= start_date,
+            Expense.expense_date <= end_date
+        ).group_by(
+            Expense.user_id, Category.id, Category.name, Category.icon
+        ).subquery()
+
+        today = date.today()
+        top_categories = db.session.query(
+            per_category.c.user_id,
+            per_category.c.name,
+            per_category.c.icon,
+            per_category.c.total,
+            per_category.c.user_total,
+            db.literal(None).label('budget')
+        ).filter(per_category.c.rank <= top_n)
+        budgets = db.session.query(
+            Budget.user_id,
+            db.literal(None),
+            db.literal(None),
+            db.literal(None),
+            db.literal(None),
+            func.max(Budget.total_amount)
+        ).filter(
+            Budget.user_id.in_(user_ids),
+            Budget.is_active == True,
+            Budget.period_start <= today,
+            Budget.period_end >= today
+        ).group_by(Budget.user_id)
+
+        for user_id, name, icon, total, user_total, budget in top_categories.union_all(budgets).all():
+            summary = summaries[user_id]
+            if budget is not None:
+                summary['budget'] = float(budget)
+                continue
+            summary['total_spent'] = float(user_total)
+            summary['top_categories'].append({'name': name, 'icon': icon, 'total': float(total)})
+
+        for summary in summaries.values():
+            summary['top_categories'].sort(key=lambda x: x['total'], reverse=True)
+
+        return summaries
+
+    @staticmethod
+    def classify_risk(percentage, thresholds):
+        """Map a spent percentage to a traffic-light level and message"""
+        if percentage >= thresholds['red']:
+            return 'red', '¡Alerta! Has superado el umbral crítico de gasto'
+        if percentage >= thresholds['yellow']:
+            return 'yellow', 'Precaución: Te acercas al límite de tu presupuesto'
+        return 'green', 'Tu gasto está bajo control'
+
     @staticmethod
     def get_risk_indicator(user_id):
         """Calculate risk indicator (traffic light)"""
@@ -147,15 +249,7 @@ class BudgetService:
         thresholds = profile.risk_thresholds if profile else {'yellow': 60, 'red': 85}
 
         # Determine risk level
-        if percentage >= thresholds['red']:
-            level = 'red'
-            message = '¡Alerta! Has superado el umbral crítico de gasto'
-        elif percentage >= thresholds['yellow']:
-            level = 'yellow'
-            message = 'Precaución: Te acercas al límite de tu presupuesto'
-        else:
-            level = 'green'
-            message = 'Tu gasto está bajo control'
+        level, message = BudgetService.classify_risk(percentage, thresholds)
 
         return {
             'level': level,
@@ -168,6 +262,194 @@ class BudgetService:
             'period_end': budget.period_end.isoformat()
         }
 
+    @staticmethod
+    def apply_expense_deltas(user_id, deltas):
+        """
+        Apply [(expense_date, delta), ...] to the spend counters of the user's
+        active budgets covering those dates (an edit that moves an expense is
+        -old on the old date plus +new on the new one). Call inside the
+        expense's transaction; the first change of a period seeds the counter
+        with the full period sum instead.
+        """
+        deltas = [(expense_date, delta) for expense_date, delta in deltas if delta]
+        if not deltas:
+            return
+
+        db.session.flush()
+        dates = [expense_date for expense_date, _ in deltas]
+        budgets = db.session.query(Budget.id, Budget.period_start, Budget.period_end).filter(
+            Budget.user_id == user_id,
+            Budget.is_active == True,
+            Budget.period_start <= max(dates),
+            Budget.period_end >= min(dates)
+        ).all()
+
+        table = BudgetSpendCounter.__table__
+        for budget in budgets:
+            delta = sum(
+                delta for expense_date, delta in deltas
+                if budget.period_start <= expense_date <= budget.period_end
+            )
+            if not delta:
+                continue
+            period_sum = select(func.coalesce(func.sum(Expense.amount), 0)).where(
+                Expense.user_id == user_id,
+                Expense.is_deleted == False,
+                Expense.expense_date >= budget.period_start,
+                Expense.expense_date <= budget.period_end
+            ).scalar_subquery()
+            stmt = insert(table).values(
+                budget_id=budget.id,
+                user_id=user_id,
+                spent=period_sum,
+                level='green',
+                updated_at=func.now()
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.budget_id],
+                set_={'spent': table.c.spent + delta, 'updated_at': func.now()}
+            )
+            db.session.execute(stmt)
+
+    @staticmethod
+    def evaluate_threshold(user_id, today=None):
+        """
+        Re-evaluate the traffic light of the user's current budget from its spend
+        counter. Returns (risk_indicator, crossed) where crossed means the level
+        went up (green->yellow->red) since the last evaluation; the caller commits.
+        """
+        today = today or date.today()
+        row = db.session.query(
+            BudgetSpendCounter,
+            Budget.total_amount,
+            Budget.period_start,
+            Budget.period_end,
+            UserProfile.risk_thresholds
+        ).join(
+            Budget, Budget.id == BudgetSpendCounter.budget_id
+        ).outerjoin(
+            UserProfile, UserProfile.user_id == Budget.user_id
+        ).filter(
+            Budget.user_id == user_id,
+            Budget.is_active == True,
+            Budget.period_start <= today,
+            Budget.period_end >= today
+        ).with_for_update(of=BudgetSpendCounter).first()
+
+        if row is None:
+            return None, False
+
+        counter = row[0]
+        thresholds = {'yellow': 60, 'red': 85, **(row.risk_thresholds or {})}
+        risk_indicator = BudgetService._build_risk_indicator(
+            Decimal(str(counter.spent)), row.total_amount, thresholds, row.period_start, row.period_end
+        )
+        crossed = LEVEL_RANK[risk_indicator['level']] > LEVEL_RANK.get(counter.level, 0)
+        counter.level = risk_indicator['level']
+        return risk_indicator, crossed
+
+    @staticmethod
+    def reconcile_spend_counters(today):
+        """
+        Recompute the counters of all current budgets from the expenses table in
+        one statement; returns how many counters were created or corrected.
+        """
+        spent = db.session.query(
+            Budget.id.label('budget_id'),
+            Budget.user_id.label('user_id'),
+            func.coalesce(func.sum(Expense.amount), 0).label('spent'),
+            literal('green').label('level'),
+            func.now().label('updated_at')
+        ).outerjoin(
+            Expense,
+            and_(
+                Expense.user_id == Budget.user_id,
+                Expense.is_deleted == False,
+                Expense.expense_date >= Budget.period_start,
+                Expense.expense_date <= Budget.period_end
+            )
+        ).filter(
+            Budget.is_active == True,
+            Budget.period_start <= today,
+            Budget.period_end >= today
+        ).group_by(Budget.id, Budget.user_id)
+
+        table = BudgetSpendCounter.__table__
+        stmt = insert(table).from_select(['budget_id', 'user_id', 'spent', 'level', 'updated_at'], spent)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.budget_id],
+            set_={'spent': stmt.excluded.spent, 'updated_at': stmt.excluded.updated_at},
+            where=table.c.spent != stmt.excluded.spent
+        )
+        return db.session.execute(stmt).rowcount
+
+    @staticmethod
+    def get_threshold_alerts(today):
+        """
+        Re-evaluate in one query every current budget whose traffic light no
+        longer matches its counter's level, store the new levels and return the
+        risk indicators of users that crossed a threshold upwards and have
+        threshold alerts enabled; users without a profile get the default
+        thresholds and alerts. The caller commits.
+        """
+        yellow = func.coalesce(UserProfile.risk_thresholds['yellow'].as_float(), 60)
+        red = func.coalesce(UserProfile.risk_thresholds['red'].as_float(), 85)
+        percentage = BudgetSpendCounter.spent * 100 / Budget.total_amount
+        level = case((percentage >= red, 'red'), (percentage >= yellow, 'yellow'), else_='green')
+
+        rows = db.session.query(
+            BudgetSpendCounter.budget_id,
+            BudgetSpendCounter.spent,
+            BudgetSpendCounter.level,
+            Budget.user_id,
+            Budget.total_amount,
+            Budget.period_start,
+            Budget.period_end,
+            yellow.label('yellow'),
+            red.label('red'),
+            func.coalesce(
+                UserProfile.notification_preferences['threshold_alerts'].as_boolean(), True
+            ).label('alerts_enabled')
+        ).join(
+            Budget, Budget.id == BudgetSpendCounter.budget_id
+        ).outerjoin(
+            UserProfile, UserProfile.user_id == Budget.user_id
+        ).filter(
+            Budget.is_active == True,
+            Budget.period_start <= today,
+            Budget.period_end >= today,
+            level != BudgetSpendCounter.level
+        ).all()
+
+        alerts = []
+        levels = []
+        for row in rows:
+            risk_indicator = BudgetService._build_risk_indicator(
+                Decimal(str(row.spent)), row.total_amount,
+                {'yellow': row.yellow, 'red': row.red}, row.period_start, row.period_end
+            )
+            levels.append({'budget_id': row.budget_id, 'level': risk_indicator['level']})
+            if row.alerts_enabled and LEVEL_RANK[risk_indicator['level']] > LEVEL_RANK.get(row.level, 0):
+                alerts.append({'user_id': row.user_id, **risk_indicator})
+
+        db.session.bulk_update_mappings(BudgetSpendCounter, levels)
+        return alerts
+
+    @staticmethod
+    def _build_risk_indicator(spent, total_amount, thresholds, period_start, period_end):
+        percentage = float((spent / total_amount) * 100)
+        level, message = BudgetService.classify_risk(percentage, thresholds)
+        return {
+            'level': level,
+            'percentage': round(percentage, 2),
+            'spent': float(spent),
+            'budget': float(total_amount),
+            'remaining': float(total_amount - spent),
+            'message': message,
+            'period_start': period_start.isoformat(),
+            'period_end': period_end.isoformat()
+        }
+
     @staticmethod
     def create_weekly_budget(user_id, amount, allocations=None):
         """Create a new weekly budget"""
@@ -1,10 +1,51 @@
-import json
 import logging
-import urllib.error
-import urllib.request
-from typing import Optional
+import os
+import threading
+import time
+from typing import Dict, List, Optional
 
-from flask import current_app
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+
+from app.task_metrics import provider_metrics
+
+logger = logging.getLogger(__name__)
+
+# Statuses that reject a request for reasons unrelated to its recipients
+# (API key, account, rate limit); splitting the batch would not help.
+REQUEST_WIDE_ERRORS = (401, 402, 403, 429)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _http_session(pool_size: int) -> requests.Session:
+    """Keep-alive session shared by every EmailService of this process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _reset_session():
+    # Workers forked from a preloaded parent (gunicorn --preload) must not
+    # share the parent's sockets.
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_session)
+
+
+def _config(name: str, default=None):
+    return current_app.config.get(name, default) if has_app_context() else default
 
 
 class EmailService:
@@ -16,50 +57,120 @@ class EmailService:
         from_email: Optional[str] = None,
         from_name: Optional[str] = None,
         api_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        pool_size: Optional[int] = None,
     ):
-        self.api_key = api_key or current_app.config.get("BREVO_API_KEY")
-        self.from_email = from_email or current_app.config.get("BREVO_FROM_EMAIL", "noreply@unifinanzas.com")
-        self.from_name = from_name or current_app.config.get("BREVO_FROM_NAME", "UniFinanzas")
-        self.api_url = api_url or current_app.config.get("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
+        self.api_key = api_key or _config("BREVO_API_KEY")
+        self.from_email = from_email or _config("BREVO_FROM_EMAIL", "noreply@unifinanzas.com")
+        self.from_name = from_name or _config("BREVO_FROM_NAME", "UniFinanzas")
+        self.api_url = api_url or _config("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
+        self.timeout = timeout or _config("BREVO_TIMEOUT", 10)
+        self.batch_size = batch_size or _config("BREVO_BATCH_SIZE", 100)
+        self.session = _http_session(pool_size or _config("BREVO_POOL_SIZE", 10))
 
     def send_email(self, to_email: str, subject: str, html_content: str, text_content: Optional[str] = None) -> bool:
         """Send a basic email through Brevo. Returns True on success, False otherwise."""
         if not self.api_key:
-            current_app.logger.warning("Brevo API key not configured; skipping email send")
+            logger.warning("Brevo API key not configured; skipping email send")
             return False
 
         payload = {
-            "sender": {
-                "email": self.from_email,
-                "name": self.from_name,
-            },
+            "sender": self._sender(),
             "to": [
                 {"email": to_email}
             ],
             "subject": subject,
             "htmlContent": html_content,
-            "textContent": text_content or html_content,
         }
+        if text_content:
+            payload["textContent"] = text_content
 
-        data = json.dumps(payload).encode("utf-8")
-        request = urllib.request.Request(
-            self.api_url,
-            data=data,
-            method="POST",
-            headers={
-                "api-key": self.api_key,
-                "content-type": "application/json",
-                "accept": "application/json",
-            },
-        )
+        status = self._post(payload, recipients=1, target=to_email)
+        return status is not None and 200 <= status < 300
 
+    def send_batch(self, messages: List[Dict]) -> List[bool]:
+        """
+        Send personalised emails with Brevo messageVersions, batch_size
+        messages per request. Each message is {"to", "subject", "html_content"}
+        with an optional "text_content"; fields equal to the first message of
+        the request are sent once. Brevo rejects a whole request over one bad
+        message, so a request refused with a 4xx is split in halves until the
+        offending messages are isolated. Returns one success flag per message.
+        """
+        if not self.api_key:
+            logger.warning("Brevo API key not configured; skipping email send")
+            return [False] * len(messages)
+
+        results: List[bool] = []
+        for start in range(0, len(messages), self.batch_size):
+            results.extend(self._send_versions(messages[start:start + self.batch_size]))
+        return results
+
+    def _send_versions(self, chunk: List[Dict]) -> List[bool]:
+        status = self._post(self._versions_payload(chunk), recipients=len(chunk), target=f"{len(chunk)} recipients")
+        if status is not None and 200 <= status < 300:
+            return [True] * len(chunk)
+        # Transport errors, 5xx and account-wide 4xx fail every message alike
+        if len(chunk) == 1 or status is None or not 400 <= status < 500 or status in REQUEST_WIDE_ERRORS:
+            return [False] * len(chunk)
+        middle = len(chunk) // 2
+        return self._send_versions(chunk[:middle]) + self._send_versions(chunk[middle:])
+
+    def _versions_payload(self, chunk: List[Dict]) -> Dict:
+        base = chunk[0]
+        payload = {
+            "sender": self._sender(),
+            "subject": base["subject"],
+            "htmlContent": base["html_content"],
+            "messageVersions": [],
+        }
+        # A top-level textContent is inherited by every version that does not
+        # override it, so it is only shared when all messages carry the same one.
+        text_contents = {message.get("text_content") for message in chunk}
+        shared_text = text_contents.pop() if len(text_contents) == 1 else None
+        if shared_text:
+            payload["textContent"] = shared_text
+
+        for message in chunk:
+            version = {"to": [{"email": message["to"]}]}
+            if message["subject"] != base["subject"]:
+                version["subject"] = message["subject"]
+            if message["html_content"] != base["html_content"]:
+                version["htmlContent"] = message["html_content"]
+            if message.get("text_content") and not shared_text:
+                version["textContent"] = message["text_content"]
+            payload["messageVersions"].append(version)
+        return payload
+
+    def _sender(self) -> Dict[str, str]:
+        return {
+            "email": self.from_email,
+            "name": self.from_name,
+        }
+
+    def _post(self, payload: Dict, recipients: int, target: str) -> Optional[int]:
+        """POST to Brevo; returns the HTTP status, or None if the request itself failed."""
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            with urllib.request.urlopen(request, timeout=10) as response:
-                return 200 <= response.status < 300
-        except urllib.error.HTTPError as exc:
-            body = exc.read().decode("utf-8", errors="ignore")
-            logging.error(f"Brevo returned status {exc.code}: {body}")
-            return False
-        except Exception as exc:
-            logging.exception(f"Error sending email to {to_email}: {exc}")
-            return False
+            response = self.session.post(
+                self.api_url,
+                json=payload,
+                headers={
+                    "api-key": self.api_key,
+                    "accept": "application/json",
+                },
+                timeout=self.timeout,
+            )
+            if 200 <= response.status_code < 300:
+                outcome = "success"
+            else:
+                outcome = "failure"
+                logger.error(f"Brevo returned status {response.status_code}: {response.text[:500]}")
+            return response.status_code
+        except requests.RequestException as exc:
+            logger.exception(f"Error sending email to {target}: {exc}")
+            return None
+        finally:
+            provider_metrics.observe("brevo", time.perf_counter() - started, outcome, recipients)
@@ -0,0 +1,259 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Notification, NotificationOutbox, User, UserProfile
+from app.utils.helpers import pref_enabled
+
+# Channels delivered through the outbox ('db' is the Notification row itself)
+OUTBOX_CHANNELS = ('push', 'email')
+
+# Set in Session.info when a transaction stages outbox rows; the commit hook
+# below starts a delivery run once they are visible to other connections.
+OUTBOX_PENDING_FLAG = 'notification_outbox_pending'
+
+FINISHED_STATES = ('sent', 'skipped', 'failed')
+
+# Notification types gated by their own preference on top of push/email_enabled
+TYPE_PREFERENCES = {
+    'threshold_alert': 'threshold_alerts',
+    'weekly_summary': 'weekly_summary',
+}
+
+
+class NotificationOutboxService:
+    """Transactional outbox for push/email delivery (one row per channel)."""
+
+    @staticmethod
+    def add(
+        user_id: str,
+        title: str,
+        message: str,
+        notification_type: str,
+        data: Optional[Dict],
+        channels: Iterable[str],
+        notification: Optional[Notification] = None,
+    ) -> List[NotificationOutbox]:
+        """Stage one row per external channel in the current session (no commit)."""
+        rows = [
+            NotificationOutbox(
+                notification=notification,
+                user_id=user_id,
+                channel=channel,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                data=data or {},
+            )
+            for channel in OUTBOX_CHANNELS
+            if channel in channels
+        ]
+        if rows:
+            db.session.add_all(rows)
+            db.session.info[OUTBOX_PENDING_FLAG] = True
+        return rows
+
+    @staticmethod
+    def add_many(rows: List[Dict], batch_size: int = 1000) -> int:
+        """Insert prepared outbox rows with one executemany per batch_size rows (no commit)."""
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(sa.insert(NotificationOutbox), rows[start:start + batch_size])
+        if rows:
+            db.session.info[OUTBOX_PENDING_FLAG] = True
+        return len(rows)
+
+    @staticmethod
+    def expire_stale(max_attempts: int, now: Optional[datetime] = None) -> int:
+        """
+        Release rows whose lease ran out mid-delivery (the worker died) so they
+        are claimed again right away. The claim already counted the attempt;
+        rows that used up max_attempts are failed instead. Delivery is
+        at-least-once: a send the provider accepted before the crash is repeated.
+        """
+        now = now or datetime.now(timezone.utc)
+        table = NotificationOutbox.__table__
+        result = db.session.execute(
+            sa.update(table)
+            .where(table.c.status == 'sending', table.c.locked_until < now)
+            .values(
+                status=sa.case((table.c.attempts < max_attempts, 'pending'), else_='failed'),
+                next_attempt_at=now,
+                locked_until=None,
+                last_error='lease expired mid-delivery',
+            )
+        )
+        return result.rowcount or 0
+
+    @staticmethod
+    def claim(limit: int, lease_seconds: float, now: Optional[datetime] = None) -> List[Dict]:
+        """Lease up to limit due rows (FOR UPDATE SKIP LOCKED); commit before delivering."""
+        now = now or datetime.now(timezone.utc)
+        table = NotificationOutbox.__table__
+        claimable = (
+            sa.select(table.c.id)
+            .where(table.c.status == 'pending', table.c.next_attempt_at <= now)
+            .order_by(table.c.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            sa.update(table)
+            .where(table.c.id.in_(claimable.scalar_subquery()))
+            .values(
+                status='sending',
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=table.c.attempts + 1,
+            )
+            .returning(
+                table.c.id, table.c.notification_id, table.c.user_id, table.c.channel,
+                table.c.notification_type, table.c.title, table.c.message, table.c.data,
+                table.c.attempts,
+            )
+        )
+        return [dict(row) for row in db.session.execute(stmt).mappings()]
+
+    @staticmethod
+    def recipients(user_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Email, FCM token and preferences for a batch of users in one query."""
+        rows = db.session.query(
+            User.id,
+            User.email,
+            UserProfile.fcm_token,
+            UserProfile.notification_preferences
+        ).outerjoin(
+            UserProfile, UserProfile.user_id == User.id
+        ).filter(
+            User.id.in_(list(set(user_ids)))
+        ).all()
+        return {
+            row.id: {
+                'email': row.email,
+                'fcm_token': row.fcm_token,
+                'prefs': row.notification_preferences or {},
+            }
+            for row in rows
+        }
+
+    @staticmethod
+    def destination(row: Dict, recipient: Optional[Dict]) -> Optional[str]:
+        """FCM token or email address for the row, or None if the user opted out."""
+        if not recipient:
+            return None
+        prefs = recipient['prefs']
+        type_pref = TYPE_PREFERENCES.get(row['notification_type'])
+        if type_pref and not pref_enabled(prefs, type_pref, True):
+            return None
+        if row['channel'] == 'push':
+            return recipient['fcm_token'] if pref_enabled(prefs, 'push_enabled', True) else None
+        return recipient['email'] if pref_enabled(prefs, 'email_enabled', True) else None
+
+    @staticmethod
+    def record(
+        results: List[Tuple[Dict, str, Optional[str]]],
+        max_attempts: int,
+        retry_delay: float,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, int]:
+        """
+        Store (row, outcome, error) results, outcome being 'sent', 'skipped' or
+        'failed'. Failed rows are retried with exponential backoff until
+        max_attempts; delivered channels are folded into Notification.sent_via.
+        """
+        now = now or datetime.now(timezone.utc)
+        counts = {'sent': 0, 'skipped': 0, 'retry': 0, 'failed': 0}
+        mappings = []
+        delivered: Dict[str, set] = {}
+
+        for row, outcome, error in results:
+            mapping = {'id': row['id'], 'status': outcome, 'locked_until': None, 'last_error': error}
+            if outcome == 'sent':
+                mapping['sent_at'] = now
+                if row['notification_id']:
+                    delivered.setdefault(row['notification_id'], set()).add(row['channel'])
+            elif outcome == 'failed' and row['attempts'] < max_attempts:
+                outcome = mapping['status'] = 'pending'
+                mapping['next_attempt_at'] = now + timedelta(seconds=retry_delay * 2 ** (row['attempts'] - 1))
+                counts['retry'] += 1
+            if outcome != 'pending':
+                counts[outcome] += 1
+            mappings.append(mapping)
+
+        if mappings:
+            db.session.bulk_update_mappings(NotificationOutbox, mappings)
+
+        # Channels of one notification may be delivered by different batches
+        by_value: Dict[str, List[str]] = {}
+        for notification_id, channels in delivered.items():
+            value = 'both' if len(channels) == 2 else next(iter(channels))
+            by_value.setdefault(value, []).append(notification_id)
+        for value, notification_ids in by_value.items():
+            if value != 'both':
+                value = sa.case(
+                    (sa.or_(Notification.sent_via.is_(None), Notification.sent_via.in_(('none', value))), value),
+                    else_='both'
+                )
+            Notification.query.filter(Notification.id.in_(notification_ids)).update({
+                Notification.sent_via: value,
+                Notification.sent_at: sa.func.coalesce(Notification.sent_at, now),
+            }, synchronize_session=False)
+
+        return counts
+
+    @staticmethod
+    def purge(
+        older_than_days: int,
+        batch_size: int = 1000,
+        pause: float = 0.2,
+        check_cancelled: Optional[Callable[[], None]] = None,
+    ) -> int:
+        """
+        Delete finished rows older than the retention window, batch_size rows
+        per committed transaction (keyset walk over the primary key) with a
+        pause between batches, like NotificationRetentionService.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        purged = 0
+        last_id = ''
+        while True:
+            ids = [
+                row.id for row in db.session.query(NotificationOutbox.id).filter(
+                    NotificationOutbox.id > last_id,
+                    NotificationOutbox.status.in_(FINISHED_STATES),
+                    NotificationOutbox.created_at < cutoff
+                ).order_by(NotificationOutbox.id).limit(batch_size)
+            ]
+            if not ids:
+                return purged
+            last_id = ids[-1]
+            if check_cancelled is not None:
+                check_cancelled()
+
+            try:
+                purged += NotificationOutbox.query.filter(
+                    NotificationOutbox.id.in_(ids)
+                ).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            if pause:
+                time.sleep(pause)
+
+
+@event.listens_for(Session, 'after_commit')
+def _start_delivery(session):
+    if session.info.pop(OUTBOX_PENDING_FLAG, False):
+        from app.tasks.notification_tasks import deliver_notification_outbox
+
+        deliver_notification_outbox.delay()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_delivery(session):
+    session.info.pop(OUTBOX_PENDING_FLAG, None)
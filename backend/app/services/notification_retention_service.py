@@ -0,0 +1,140 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, insert, literal, select
+
+from app.extensions import db
+from app.models import Notification, NotificationArchive
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationRetentionService:
+    """Prune notifications in short, bounded transactions (one per batch)."""
+
+    @staticmethod
+    def run(
+        read_days: int,
+        unread_days: int,
+        max_per_user: int,
+        batch_size: int = 1000,
+        pause: float = 0.2,
+        archive: bool = False,
+        check_cancelled: Optional[Callable[[], None]] = None,
+        on_batch: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict:
+        """
+        Apply the retention rules in order: read older than read_days, unread
+        older than unread_days, then keep only the newest max_per_user per
+        user. A rule with a falsy limit is skipped. Returns totals per rule.
+        """
+        now = datetime.utcnow()
+        runner = _RetentionRun(batch_size, pause, archive, check_cancelled, on_batch)
+
+        if read_days:
+            runner.purge_by_id_range('read', [
+                Notification.is_read == True,
+                Notification.created_at < now - timedelta(days=read_days),
+            ])
+        if unread_days:
+            runner.purge_by_id_range('unread', [
+                Notification.is_read == False,
+                Notification.created_at < now - timedelta(days=unread_days),
+            ])
+        if max_per_user:
+            runner.purge_over_cap(max_per_user)
+
+        return runner.summary()
+
+
+class _RetentionRun:
+    def __init__(self, batch_size, pause, archive, check_cancelled, on_batch):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.archive = archive
+        self.check_cancelled = check_cancelled
+        self.on_batch = on_batch
+        self.rules: Dict[str, Dict] = {}
+
+    def purge_by_id_range(self, rule: str, criteria: List):
+        # Keyset walk over the primary key: each batch starts after the last
+        # id of the previous one, so no batch rescans what was already checked.
+        last_id = ''
+        while True:
+            ids = [
+                row.id for row in db.session.query(Notification.id).filter(
+                    Notification.id > last_id, *criteria
+                ).order_by(Notification.id).limit(self.batch_size)
+            ]
+            if not ids:
+                return
+            last_id = ids[-1]
+            self._delete(rule, ids)
+
+    def purge_over_cap(self, max_per_user: int):
+        user_ids = [
+            row.user_id for row in db.session.query(Notification.user_id).group_by(
+                Notification.user_id
+            ).having(func.count(Notification.id) > max_per_user)
+        ]
+        for user_id in user_ids:
+            while True:
+                ids = [
+                    row.id for row in db.session.query(Notification.id).filter(
+                        Notification.user_id == user_id
+                    ).order_by(
+                        Notification.created_at.desc(), Notification.id.desc()
+                    ).offset(max_per_user).limit(self.batch_size)
+                ]
+                if not ids:
+                    break
+                self._delete('per_user_cap', ids)
+
+    def summary(self) -> Dict:
+        return {
+            'deleted': sum(stats['rows'] for stats in self.rules.values()),
+            'archive': self.archive,
+            'rules': self.rules,
+        }
+
+    def _delete(self, rule: str, ids: List[str]):
+        if self.check_cancelled is not None:
+            self.check_cancelled()
+
+        started = time.monotonic()
+        try:
+            if self.archive:
+                db.session.execute(insert(NotificationArchive).from_select(
+                    ['id', 'user_id', 'notification_type', 'title', 'is_read', 'created_at', 'archived_at'],
+                    select(
+                        Notification.id,
+                        Notification.user_id,
+                        Notification.notification_type,
+                        Notification.title,
+                        Notification.is_read,
+                        Notification.created_at,
+                        literal(datetime.utcnow())
+                    ).where(Notification.id.in_(ids))
+                ))
+            deleted = Notification.query.filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        elapsed = time.monotonic() - started
+
+        stats = self.rules.setdefault(rule, {'rows': 0, 'batches': 0, 'seconds': 0.0, 'max_batch_seconds': 0.0})
+        stats['rows'] += deleted
+        stats['batches'] += 1
+        stats['seconds'] = round(stats['seconds'] + elapsed, 3)
+        stats['max_batch_seconds'] = round(max(stats['max_batch_seconds'], elapsed), 3)
+
+        batch = {'rule': rule, 'rows': deleted, 'seconds': round(elapsed, 3)}
+        logger.info(f"Notification retention batch: {batch}")
+        if self.on_batch is not None:
+            self.on_batch(batch)
+
+        if self.pause:
+            time.sleep(self.pause)
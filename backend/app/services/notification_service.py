@@ -1,17 +1,124 @@
-from datetime import datetime
-from typing import Dict, Iterable, Optional
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
 
 from flask import current_app
+from sqlalchemy import insert
 
 from app.extensions import db
 from app.models import Notification, UserProfile, User
 from app.services.email_service import EmailService
+from app.services.notification_outbox_service import OUTBOX_CHANNELS, NotificationOutboxService
 from app.services.push_service import PushService
 
 
 class NotificationService:
     """Centralized notification dispatch (DB record + push/email)."""
 
+    @staticmethod
+    def enqueue(
+        user_id: str,
+        title: str,
+        message: str,
+        notification_type: str = "general",
+        data: Optional[Dict] = None,
+        channels: Iterable[str] = ("push", "email", "db"),
+    ) -> Optional[Notification]:
+        """
+        Stage the notification record and its push/email outbox rows in the
+        current transaction. Nothing is sent until the caller commits; the
+        outbox worker (deliver_notification_outbox) then delivers each channel.
+        """
+        notification = None
+        if "db" in channels:
+            notification = Notification(
+                user_id=user_id,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                data=data or {},
+                sent_via="none",
+            )
+            db.session.add(notification)
+
+        NotificationOutboxService.add(
+            user_id, title, message, notification_type, data, channels, notification=notification
+        )
+        return notification
+
+    @staticmethod
+    def send_bulk(
+        notifications: Iterable[Tuple[str, str, str, Optional[Dict]]],
+        notification_type: str = "general",
+        channels: Iterable[str] = ("push", "email", "db"),
+        batch_size: int = 1000,
+        push: Optional[Tuple[str, str, Optional[Dict]]] = None,
+    ) -> int:
+        """
+        Stage many (user_id, title, message, data) notifications in the current
+        transaction. Users and profiles are read in one query; Notification and
+        outbox rows are inserted with one executemany per batch_size rows.
+        Unknown users and channels the user turned off are dropped up front.
+        A shared push (title, message, data) replaces the per-user text on the
+        push channel so the outbox can deliver it as one FCM multicast.
+        Returns the number of notifications staged.
+        """
+        items = list(notifications)
+        if not items:
+            return 0
+
+        recipients = NotificationOutboxService.recipients(item[0] for item in items)
+        now = datetime.now(timezone.utc)
+        notification_rows = []
+        outbox_rows = []
+        staged = 0
+
+        for user_id, title, message, data in items:
+            recipient = recipients.get(user_id)
+            if recipient is None:
+                continue
+            staged += 1
+
+            notification_id = None
+            if "db" in channels:
+                notification_id = str(uuid.uuid4())
+                notification_rows.append({
+                    "id": notification_id,
+                    "user_id": user_id,
+                    "title": title,
+                    "message": message,
+                    "notification_type": notification_type,
+                    "data": data or {},
+                    "is_read": False,
+                    "sent_via": "none",
+                    "created_at": now,
+                })
+
+            for channel in OUTBOX_CHANNELS:
+                target = {"channel": channel, "notification_type": notification_type}
+                if channel not in channels or not NotificationOutboxService.destination(target, recipient):
+                    continue
+                content = push if channel == "push" and push else (title, message, data)
+                outbox_rows.append({
+                    "id": str(uuid.uuid4()),
+                    "notification_id": notification_id,
+                    "user_id": user_id,
+                    "channel": channel,
+                    "notification_type": notification_type,
+                    "title": content[0],
+                    "message": content[1],
+                    "data": content[2] or {},
+                    "status": "pending",
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                    "created_at": now,
+                })
+
+        for start in range(0, len(notification_rows), batch_size):
+            db.session.execute(insert(Notification), notification_rows[start:start + batch_size])
+        NotificationOutboxService.add_many(outbox_rows, batch_size)
+        return staged
+
     @staticmethod
     def send_notification(
         user_id: str,
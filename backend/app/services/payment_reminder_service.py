@@ -0,0 +1,59 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+from app.extensions import db
+from app.models import Payment, PaymentReminder, UserProfile
+from app.utils.helpers import get_zone, parse_time_of_day, pref_enabled
+
+# Días antes del vencimiento -> flag que marca el recordatorio como enviado
+REMINDER_OFFSETS = {
+    7: 'reminder_7_sent',
+    3: 'reminder_3_sent',
+    0: 'reminder_0_sent',
+}
+
+
+class PaymentReminderService:
+
+    @staticmethod
+    def schedule(payment, profile=None, now=None):
+        """Replace the pending reminder rows of a payment (call after flush)"""
+        PaymentReminder.query.filter_by(payment_id=payment.id).delete(synchronize_session=False)
+        if payment.is_paid:
+            return
+
+        if profile is None:
+            profile = UserProfile.query.filter_by(user_id=payment.user_id).first()
+        prefs = (profile.notification_preferences if profile else None) or {}
+        if not pref_enabled(prefs, 'payment_reminders', True):
+            return
+
+        zone = get_zone(profile.timezone if profile else None)
+        reminder_time = time(*parse_time_of_day(prefs.get('payment_reminder_time', '18:00'), default=(18, 0)))
+        now = now or datetime.now(timezone.utc)
+
+        for days_before, flag_name in REMINDER_OFFSETS.items():
+            if getattr(payment, flag_name):
+                continue
+            fire_day = payment.due_date - timedelta(days=days_before)
+            # Se puede enviar desde la hora configurada hasta el fin del día local
+            expires_at = datetime.combine(fire_day + timedelta(days=1), time(0), tzinfo=zone).astimezone(timezone.utc)
+            if expires_at <= now:
+                continue
+            db.session.add(PaymentReminder(
+                payment_id=payment.id,
+                days_before=days_before,
+                user_id=payment.user_id,
+                fire_at=datetime.combine(fire_day, reminder_time, tzinfo=zone).astimezone(timezone.utc),
+                expires_at=expires_at
+            ))
+
+    @staticmethod
+    def reschedule_user(profile):
+        """Rebuild the schedule of a user's unpaid payments (timezone or preferences changed)"""
+        payments = Payment.query.filter(
+            Payment.user_id == profile.user_id,
+            Payment.is_paid == False,
+            Payment.due_date >= date.today() - timedelta(days=1)
+        ).all()
+        for payment in payments:
+            PaymentReminderService.schedule(payment, profile)
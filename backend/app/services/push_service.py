@@ -1,36 +1,124 @@
 import logging
-from typing import Dict, Optional
+import os
+import threading
+import time
+from typing import Dict, List, Optional
 
-from flask import current_app
+from flask import current_app, has_app_context
 from pyfcm import FCMNotification
 
+from app.task_metrics import provider_metrics
+
+logger = logging.getLogger(__name__)
+
+# registration_ids accepted by FCM per request
+FCM_MAX_TOKENS = 1000
+
+# Per-token errors meaning the token will never work again
+INVALID_TOKEN_ERRORS = ("NotRegistered", "InvalidRegistration")
+
+# pyfcm keeps the responses of the call in progress on the client instance,
+# so each thread gets its own client instead of sharing one.
+_local = threading.local()
+
+
+def _fcm_client(server_key: str) -> FCMNotification:
+    """FCM client (and its keep-alive session) shared by every PushService of this thread."""
+    clients = getattr(_local, "clients", None)
+    if clients is None:
+        clients = _local.clients = {}
+    client = clients.get(server_key)
+    if client is None:
+        client = clients[server_key] = FCMNotification(api_key=server_key)
+    return client
+
+
+def _reset_clients():
+    # Workers forked from a preloaded parent (gunicorn --preload) must not
+    # share the parent's sockets.
+    global _local
+    _local = threading.local()
+
+
+os.register_at_fork(after_in_child=_reset_clients)
+
 
 class PushService:
     """Wrapper around FCM (pyfcm) to send push notifications."""
 
-    def __init__(self, server_key: Optional[str] = None):
-        self.server_key = server_key or current_app.config.get("FCM_SERVER_KEY")
-        self.client = FCMNotification(api_key=self.server_key) if self.server_key else None
+    def __init__(self, server_key: Optional[str] = None, batch_size: Optional[int] = None):
+        config = current_app.config if has_app_context() else {}
+        self.server_key = server_key or config.get("FCM_SERVER_KEY")
+        self.batch_size = min(batch_size or config.get("FCM_BATCH_SIZE", FCM_MAX_TOKENS), FCM_MAX_TOKENS)
+        self.client = _fcm_client(self.server_key) if self.server_key else None
 
     def send_push(self, token: str, title: str, body: str, data: Optional[Dict] = None) -> bool:
         """Send a push notification to a single device token."""
+        return self.send_push_multicast([token], title, body, data)[0] is None
+
+    def send_push_multicast(
+        self,
+        tokens: List[str],
+        title: str,
+        body: str,
+        data: Optional[Dict] = None,
+        prune_invalid: bool = True,
+    ) -> List[Optional[str]]:
+        """
+        Send the same notification to many device tokens, batch_size (max
+        1000) per FCM request. Returns one error per token, None when FCM
+        accepted it. Tokens FCM reports as unregistered or invalid are cleared
+        from UserProfile.fcm_token with one UPDATE (committed by the caller).
+        """
         if not self.client:
-            current_app.logger.warning("FCM server key not configured; skipping push send")
-            return False
+            logger.warning("FCM server key not configured; skipping push send")
+            return ["push provider not configured"] * len(tokens)
+
+        errors: List[Optional[str]] = []
+        for start in range(0, len(tokens), self.batch_size):
+            errors.extend(self._send_chunk(tokens[start:start + self.batch_size], title, body, data))
+
+        invalid = [token for token, error in zip(tokens, errors) if error in INVALID_TOKEN_ERRORS]
+        if invalid and prune_invalid:
+            PushService.prune_tokens(invalid)
+        return errors
+
+    @staticmethod
+    def prune_tokens(tokens: List[str]) -> int:
+        """Clear FCM tokens that no longer reach a device (no commit)."""
+        from app.models import UserProfile
+
+        pruned = UserProfile.query.filter(UserProfile.fcm_token.in_(set(tokens))).update(
+            {UserProfile.fcm_token: None}, synchronize_session=False
+        )
+        logger.info(f"Pruned {pruned} invalid FCM tokens")
+        return pruned
 
+    def _send_chunk(self, tokens: List[str], title: str, body: str, data: Optional[Dict]) -> List[Optional[str]]:
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            result = self.client.notify_single_device(
-                registration_id=token,
+            response = self.client.notify_multiple_devices(
+                registration_ids=tokens,
                 message_title=title,
                 message_body=body,
                 data_message=data or {},
                 sound="default",
                 badge=1,
             )
-            if result.get("failure") == 0:
-                return True
-            logging.error(f"FCM send failure: {result}")
-            return False
+            results = response.get("results") or []
+            errors = [
+                None if "message_id" in result else (result.get("error") or "unknown FCM error")
+                for result in results
+            ]
+            # A short results list means FCM did not report on those tokens
+            errors += ["missing FCM result"] * (len(tokens) - len(errors))
+            outcome = "success" if not any(errors) else "failure"
+            if outcome == "failure":
+                logger.error(f"FCM rejected {sum(1 for error in errors if error)} of {len(tokens)} tokens")
+            return errors
         except Exception as exc:
-            logging.exception(f"Error sending push to token {token}: {exc}")
-            return False
+            logger.exception(f"Error sending push to {len(tokens)} tokens: {exc}")
+            return [str(exc)[:500] or exc.__class__.__name__] * len(tokens)
+        finally:
+            provider_metrics.observe("fcm", time.perf_counter() - started, outcome, len(tokens))
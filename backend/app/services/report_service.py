@@ -42,8 +42,21 @@ class ReportService:
         return value.strftime('%d/%m/%Y')
 
     @staticmethod
-    def generate_pdf_report(user_id, report_type, start_date, end_date):
-        """Generate a detailed PDF report"""
+    def render_pdf_bytes(user_id, report_type, start_date, end_date):
+        """Render a PDF report and return its raw bytes (picklable for worker processes)."""
+        return ReportService.generate_pdf_report(user_id, report_type, start_date, end_date).getvalue()
+
+    @staticmethod
+    def generate_pdf_report(user_id, report_type, start_date, end_date, cancel_token=None):
+        """Generate a detailed PDF report.
+
+        ``cancel_token`` (a task CancellationToken) is checked between rows and
+        on every rendered page so a cancelled task stops early.
+        """
+        def checkpoint(*_):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(
             buffer,
@@ -181,6 +194,8 @@ class ReportService:
 
         elements.append(Spacer(1, 18))
 
+        checkpoint()
+
         daily_totals = {}
         for exp in expenses:
             daily_totals[exp.expense_date] = daily_totals.get(exp.expense_date, 0) + float(exp.amount)
@@ -214,6 +229,7 @@ class ReportService:
             max_rows = 200
 
             for exp in expenses[:max_rows]:
+                checkpoint()
                 description = exp.description or ''
                 if len(description) > 60:
                     description = f"{description[:57]}..."
@@ -258,6 +274,6 @@ class ReportService:
             meta_style
         ))
 
-        doc.build(elements)
+        doc.build(elements, onFirstPage=checkpoint, onLaterPages=checkpoint)
         buffer.seek(0)
         return buffer
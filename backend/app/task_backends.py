@@ -0,0 +1,213 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATE_NAMES = ("SUCCESS", "FAILURE", "REVOKED", "TIMEOUT")
+
+
+class ResultBackend(ABC):
+    # Shared store of task snapshots so any web worker can answer
+    # GET /api/v1/tasks/<id>. Snapshots are plain dicts:
+    # {id, name, state, result, info, retries, updated_at}.
+    @abstractmethod
+    def save_many(self, snapshots: List[Dict[str, Any]]):
+        ...
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    def close(self):
+        pass
+
+
+class InMemoryResultBackend(ResultBackend):
+    def __init__(self):
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def save_many(self, snapshots: List[Dict[str, Any]]):
+        with self._lock:
+            for snapshot in snapshots:
+                self._snapshots[snapshot["id"]] = snapshot
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            snapshot = self._snapshots.get(task_id)
+            return dict(snapshot) if snapshot else None
+
+
+class RedisResultBackend(ResultBackend):
+    def __init__(self, url: str, ttl: int = 86400, prefix: str = "task_queue:result:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def save_many(self, snapshots: List[Dict[str, Any]]):
+        pipe = self._client.pipeline(transaction=False)
+        for snapshot in snapshots:
+            pipe.set(self.prefix + snapshot["id"], _dumps(snapshot), ex=self.ttl)
+        pipe.execute()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._client.get(self.prefix + task_id)
+        return json.loads(raw) if raw else None
+
+    def close(self):
+        self._client.close()
+
+
+class DatabaseResultBackend(ResultBackend):
+    def __init__(self, app, ttl: int = 86400, purge_interval: float = 300.0):
+        self._app = app
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    def save_many(self, snapshots: List[Dict[str, Any]]):
+        from sqlalchemy.dialects.postgresql import insert
+        from app.extensions import db
+        from app.models.task_result import TaskResult
+
+        table = TaskResult.__table__
+        rows = [
+            {
+                "id": snapshot["id"],
+                "name": snapshot["name"],
+                "state": snapshot["state"],
+                "result": _dumps(snapshot["result"]),
+                "info": _dumps(snapshot["info"]),
+                "retries": snapshot["retries"],
+                "updated_at": datetime.fromtimestamp(snapshot["updated_at"], timezone.utc),
+            }
+            for snapshot in snapshots
+        ]
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={column: stmt.excluded[column] for column in ("state", "result", "info", "retries", "updated_at")},
+            # Batches from different workers may arrive out of order.
+            where=table.c.updated_at <= stmt.excluded.updated_at,
+        )
+        with self._app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(stmt)
+                if time.time() - self._last_purge >= self.purge_interval:
+                    self._last_purge = time.time()
+                    cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+                    conn.execute(
+                        table.delete().where(table.c.updated_at < cutoff, table.c.state.in_(TERMINAL_STATE_NAMES))
+                    )
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        from app.extensions import db
+        from app.models.task_result import TaskResult
+
+        table = TaskResult.__table__
+        with self._app.app_context():
+            with db.engine.connect() as conn:
+                row = conn.execute(table.select().where(table.c.id == task_id)).mappings().first()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "state": row["state"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "info": json.loads(row["info"]) if row["info"] else None,
+            "retries": row["retries"],
+            "updated_at": row["updated_at"].timestamp(),
+        }
+
+
+class WriteBehindPublisher:
+    # Buffers state transitions and writes them to the backend in batches from
+    # one background thread. Only the latest snapshot per task is kept, so a
+    # PENDING -> STARTED -> SUCCESS burst inside one interval is a single write.
+    def __init__(self, backend: ResultBackend, flush_interval: float = 0.5, batch_size: int = 200):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.flushed = 0
+        self.errors = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def publish(self, snapshot: Dict[str, Any]):
+        with self._cond:
+            self._pending[snapshot["id"]] = snapshot
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="task-results", daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def pending(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            snapshot = self._pending.get(task_id)
+            return dict(snapshot) if snapshot else None
+
+    def flush(self):
+        with self._cond:
+            batch = list(self._pending.values())
+            self._pending.clear()
+        if not batch:
+            return
+        try:
+            for start in range(0, len(batch), self.batch_size):
+                self.backend.save_many(batch[start:start + self.batch_size])
+            self.flushed += len(batch)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"Task result backend write failed ({len(batch)} snapshots): {exc}")
+            with self._cond:
+                for snapshot in batch:
+                    self._pending.setdefault(snapshot["id"], snapshot)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            buffered = len(self._pending)
+        return {"buffered": buffered, "flushed": self.flushed, "errors": self.errors}
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopped:
+                    return
+            self.flush()
+
+
+def create_backend(app, kind: Optional[str]) -> Optional[ResultBackend]:
+    ttl = app.config.get("TASK_QUEUE_RESULT_TTL", 86400)
+    if not kind or kind == "none":
+        return None
+    if kind == "memory":
+        return InMemoryResultBackend()
+    if kind == "redis":
+        return RedisResultBackend(app.config.get("TASK_QUEUE_RESULT_REDIS_URL") or app.config["REDIS_URL"], ttl=ttl)
+    if kind == "database":
+        return DatabaseResultBackend(app, ttl=ttl)
+    raise ValueError(f"Unknown task result backend: {kind}")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str)
+
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import sqlalchemy as sa
+
+
+class JobTable:
+    # Postgres-backed job queue shared by the web tier (inserts) and
+    # `python -m app.worker` processes (claim with FOR UPDATE SKIP LOCKED).
+    def __init__(self, app, max_attempts: int = 5):
+        self._app = app
+        self.max_attempts = max_attempts
+
+    def insert(self, task_id: str, name: str, args, kwargs, run_at: Optional[float] = None):
+        from app.models.task_job import TaskJob
+
+        now = datetime.now(timezone.utc)
+        self._execute(sa.insert(TaskJob.__table__).values(
+            id=task_id,
+            name=name,
+            args=list(args),
+            kwargs=dict(kwargs),
+            state="queued",
+            run_at=datetime.fromtimestamp(run_at, timezone.utc) if run_at is not None else now,
+            attempts=0,
+            created_at=now,
+        ))
+
+    def claim(self, worker_id: str, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        from app.models.task_job import TaskJob
+
+        if limit <= 0:
+            return []
+        table = TaskJob.__table__
+        now = sa.func.now()
+        # Due jobs plus running jobs whose worker stopped renewing its lease.
+        claimable = (
+            sa.select(table.c.id)
+            .where(
+                sa.or_(
+                    sa.and_(table.c.state == "queued", table.c.run_at <= now),
+                    sa.and_(table.c.state == "running", table.c.locked_until < now),
+                ),
+                table.c.attempts < self.max_attempts,
+            )
+            .order_by(table.c.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            sa.update(table)
+            .where(table.c.id.in_(claimable.scalar_subquery()))
+            .values(
+                state="running",
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=table.c.attempts + 1,
+            )
+            .returning(table.c.id, table.c.name, table.c.args, table.c.kwargs, table.c.attempts)
+        )
+        return [dict(row) for row in self._execute(stmt, fetch=True)]
+
+    def drop_exhausted(self) -> List[Dict[str, Any]]:
+        # Running jobs whose lease expired after their last allowed attempt;
+        # claim() skips them, so without this they would stay in the table.
+        from app.models.task_job import TaskJob
+
+        table = TaskJob.__table__
+        stmt = (
+            sa.delete(table)
+            .where(
+                table.c.state == "running",
+                table.c.locked_until < sa.func.now(),
+                table.c.attempts >= self.max_attempts,
+            )
+            .returning(table.c.id, table.c.name, table.c.attempts, table.c.locked_by)
+        )
+        return [dict(row) for row in self._execute(stmt, fetch=True)]
+
+    def renew(self, worker_id: str, job_ids: List[str], lease_seconds: float):
+        from app.models.task_job import TaskJob
+
+        if not job_ids:
+            return
+        table = TaskJob.__table__
+        self._execute(
+            sa.update(table)
+            .where(table.c.id.in_(job_ids), table.c.locked_by == worker_id)
+            .values(locked_until=sa.func.now() + timedelta(seconds=lease_seconds))
+        )
+
+    def complete(self, job_ids: List[str]):
+        from app.models.task_job import TaskJob
+
+        if not job_ids:
+            return
+        table = TaskJob.__table__
+        self._execute(sa.delete(table).where(table.c.id.in_(job_ids)))
+
+    def release(self, worker_id: str, job_ids: List[str]):
+        # Hand unfinished jobs back on shutdown so another worker picks them up.
+        from app.models.task_job import TaskJob
+
+        if not job_ids:
+            return
+        table = TaskJob.__table__
+        self._execute(
+            sa.update(table)
+            .where(table.c.id.in_(job_ids), table.c.locked_by == worker_id)
+            .values(state="queued", locked_by=None, locked_until=None, attempts=table.c.attempts - 1)
+        )
+
+    def _execute(self, stmt, fetch: bool = False):
+        from app.extensions import db
+
+        with self._app.app_context():
+            with db.engine.begin() as conn:
+                result = conn.execute(stmt)
+                return result.mappings().all() if fetch else None
@@ -0,0 +1,257 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, shared by the wait and run histograms.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+OUTCOMES = ("success", "failure", "retry", "revoked", "timeout")
+
+# Cron ticks: fired a run, skipped because the previous run was still going,
+# or missed by APScheduler beyond misfire_grace_time.
+TICK_OUTCOMES = ("fired", "skipped", "missed")
+
+# Outbound provider requests (Brevo, FCM): accepted, rejected by the provider
+# (non-2xx / per-message failure) or transport error (timeout, connection).
+PROVIDER_OUTCOMES = ("success", "failure", "error")
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        value = max(value, 0.0)
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th observation.
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        rows = []
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            rows.append((_format_bound(bound), seen))
+        rows.append(("+Inf", self.count))
+        return rows
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 6) if self.count else None,
+        }
+
+
+class _TaskStats:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.wait = Histogram(buckets)
+        self.run = Histogram(buckets)
+        self.outcomes = {outcome: 0 for outcome in OUTCOMES}
+
+
+class _ScheduledStats:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.run = Histogram(buckets)
+        self.ticks = {outcome: 0 for outcome in TICK_OUTCOMES}
+        self.last_run_seconds: Optional[float] = None
+
+
+class TaskMetrics:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._tasks: Dict[str, _TaskStats] = {}
+        self._scheduled: Dict[str, _ScheduledStats] = {}
+        self._lock = threading.Lock()
+
+    def observe_wait(self, name: str, seconds: float):
+        with self._lock:
+            self._stats(name).wait.observe(seconds)
+
+    def observe_run(self, name: str, seconds: float):
+        with self._lock:
+            self._stats(name).run.observe(seconds)
+
+    def count(self, name: str, outcome: str):
+        with self._lock:
+            self._stats(name).outcomes[outcome] += 1
+
+    def count_tick(self, job_id: str, outcome: str):
+        with self._lock:
+            self._scheduled_stats(job_id).ticks[outcome] += 1
+
+    def observe_scheduled_run(self, job_id: str, seconds: float):
+        with self._lock:
+            stats = self._scheduled_stats(job_id)
+            stats.run.observe(seconds)
+            stats.last_run_seconds = round(seconds, 6)
+
+    def scheduled_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                job_id: {
+                    "run_seconds": stats.run.summary(),
+                    "last_run_seconds": stats.last_run_seconds,
+                    **stats.ticks,
+                }
+                for job_id, stats in self._scheduled.items()
+            }
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    "wait_seconds": stats.wait.summary(),
+                    "run_seconds": stats.run.summary(),
+                    **stats.outcomes,
+                }
+                for name, stats in self._tasks.items()
+            }
+
+    def render_prometheus(self, gauges: Dict[str, Dict[str, int]]) -> str:
+        # gauges: {"pending": {lane: n}, "running": {lane: n}, "delayed": {"": n}, ...}
+        lines: List[str] = []
+        with self._lock:
+            tasks = sorted(self._tasks.items())
+            _render_histogram(lines, "task_queue_wait_seconds", "Time from enqueue (or eta) to start.",
+                              "task", [(name, stats.wait) for name, stats in tasks])
+            _render_histogram(lines, "task_queue_run_seconds", "Task execution time.",
+                              "task", [(name, stats.run) for name, stats in tasks])
+
+            lines.append("# HELP task_queue_tasks_total Finished task runs by outcome.")
+            lines.append("# TYPE task_queue_tasks_total counter")
+            for name, stats in tasks:
+                for outcome, value in stats.outcomes.items():
+                    lines.append(f'task_queue_tasks_total{{task="{_escape(name)}",outcome="{outcome}"}} {value}')
+
+            scheduled = sorted(self._scheduled.items())
+            if scheduled:
+                _render_histogram(lines, "task_scheduler_run_seconds", "Duration of scheduled job runs.",
+                                  "job", [(job_id, stats.run) for job_id, stats in scheduled])
+                lines.append("# HELP task_scheduler_ticks_total Cron ticks by outcome.")
+                lines.append("# TYPE task_scheduler_ticks_total counter")
+                for job_id, stats in scheduled:
+                    for outcome, value in stats.ticks.items():
+                        lines.append(f'task_scheduler_ticks_total{{job="{_escape(job_id)}",outcome="{outcome}"}} {value}')
+
+        for gauge, values in sorted(gauges.items()):
+            metric = f"task_queue_{gauge}"
+            lines.append(f"# HELP {metric} Current number of {gauge} tasks.")
+            lines.append(f"# TYPE {metric} gauge")
+            for lane, value in sorted(values.items()):
+                labels = f'{{lane="{_escape(lane)}"}}' if lane else ""
+                lines.append(f"{metric}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _stats(self, name: str) -> _TaskStats:
+        stats = self._tasks.get(name)
+        if stats is None:
+            stats = self._tasks[name] = _TaskStats(self.buckets)
+        return stats
+
+    def _scheduled_stats(self, job_id: str) -> _ScheduledStats:
+        stats = self._scheduled.get(job_id)
+        if stats is None:
+            stats = self._scheduled[job_id] = _ScheduledStats(self.buckets)
+        return stats
+
+
+class _ProviderStats:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.latency = Histogram(buckets)
+        self.outcomes = {outcome: 0 for outcome in PROVIDER_OUTCOMES}
+        self.recipients = 0
+
+
+class ProviderMetrics:
+    # One observation per provider request; a batch request counts all of its
+    # recipients, so recipients / count is the effective batch size.
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._providers: Dict[str, _ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, provider: str, seconds: float, outcome: str, recipients: int = 1):
+        with self._lock:
+            stats = self._providers.get(provider)
+            if stats is None:
+                stats = self._providers[provider] = _ProviderStats(self.buckets)
+            stats.latency.observe(seconds)
+            stats.outcomes[outcome] += 1
+            stats.recipients += recipients
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                provider: {
+                    "request_seconds": stats.latency.summary(),
+                    "recipients": stats.recipients,
+                    **stats.outcomes,
+                }
+                for provider, stats in self._providers.items()
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            providers = sorted(self._providers.items())
+            if not providers:
+                return ""
+            _render_histogram(lines, "provider_request_seconds", "Latency of outbound provider requests.",
+                              "provider", [(name, stats.latency) for name, stats in providers])
+            lines.append("# HELP provider_requests_total Provider requests by outcome.")
+            lines.append("# TYPE provider_requests_total counter")
+            for name, stats in providers:
+                for outcome, value in stats.outcomes.items():
+                    lines.append(f'provider_requests_total{{provider="{_escape(name)}",outcome="{outcome}"}} {value}')
+            lines.append("# HELP provider_recipients_total Recipients covered by provider requests.")
+            lines.append("# TYPE provider_recipients_total counter")
+            for name, stats in providers:
+                lines.append(f'provider_recipients_total{{provider="{_escape(name)}"}} {stats.recipients}')
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every EmailService / PushService of this process.
+provider_metrics = ProviderMetrics()
+
+
+def _render_histogram(lines: List[str], metric: str, help_text: str, label_name: str,
+                      series: List[Tuple[str, Histogram]]):
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} histogram")
+    for name, histogram in series:
+        label = f'{label_name}="{_escape(name)}"'
+        for bound, value in histogram.cumulative():
+            lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {value}')
+        lines.append(f"{metric}_sum{{{label}}} {histogram.sum:.6f}")
+        lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+
+
+def _format_bound(bound: float) -> str:
+    return f"{bound:g}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,10 +1,28 @@
+import heapq
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+import signal
 import threading
 import time
 import uuid
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Type
+
+from app.task_backends import ResultBackend, WriteBehindPublisher, create_backend
+from app.task_jobs import JobTable
+from app.task_metrics import TaskMetrics
+
+logger = logging.getLogger(__name__)
 
 
 class TaskState(str, Enum):
@@ -14,6 +32,27 @@ class TaskState(str, Enum):
     FAILURE = "FAILURE"
     RETRY = "RETRY"
     REVOKED = "REVOKED"
+    TIMEOUT = "TIMEOUT"
+
+
+TERMINAL_STATES = frozenset({TaskState.SUCCESS, TaskState.FAILURE, TaskState.REVOKED, TaskState.TIMEOUT})
+
+# Seconds a record is kept after its last update; None keeps it until capacity eviction.
+DEFAULT_RECORD_TTLS: Dict[TaskState, Optional[float]] = {
+    TaskState.SUCCESS: 3600,
+    TaskState.FAILURE: 86400,
+    TaskState.REVOKED: 3600,
+    TaskState.TIMEOUT: 86400,
+}
+
+DEFAULT_LANE = "default"
+
+# Worker threads per lane; the default lane is sized by TASK_QUEUE_MAX_WORKERS.
+DEFAULT_LANES: Dict[str, int] = {
+    "interactive": 2,
+    "bulk": 2,
+    "cpu": 1,
+}
 
 
 class RetryTask(Exception):
@@ -23,12 +62,72 @@ class RetryTask(Exception):
         self.countdown = countdown
 
 
+# Cooperative interruptions derive from BaseException so per-item
+# ``except Exception`` handlers inside fan-out loops do not swallow them.
+class TaskCancelled(BaseException):
+    pass
+
+
+class SoftTimeLimitExceeded(TaskCancelled):
+    pass
+
+
+class TimeLimitExceeded(Exception):
+    pass
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._error_type: Type[TaskCancelled] = TaskCancelled
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "Task cancelled", error_type: Type[TaskCancelled] = TaskCancelled):
+        if self._event.is_set():
+            return
+        self.reason = reason
+        self._error_type = error_type
+        self._event.set()
+        for callback in self._callbacks:
+            callback()
+
+    def add_callback(self, callback: Callable[[], None]):
+        self._callbacks.append(callback)
+        if self._event.is_set():
+            callback()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def error_type(self) -> Optional[Type[TaskCancelled]]:
+        return self._error_type if self._event.is_set() else None
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise self._error_type(self.reason)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+
 @dataclass
 class TaskMeta:
     name: Optional[str] = None
     bind: bool = False
     max_retries: int = 0
     default_retry_delay: int = 0
+    lane: str = DEFAULT_LANE
+    max_concurrency: Optional[int] = None
+    retry_jitter: float = 0.0
+    time_limit: Optional[float] = None
+    soft_time_limit: Optional[float] = None
+    isolate: bool = False
+    coalesce_key: Optional[Callable[..., Any]] = None
+    coalesce_window: float = 0.0
+    coalesce_merge: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None
 
 
 @dataclass
@@ -42,21 +141,340 @@ class TaskRecord:
     max_retries: int = 0
     future: Any = None
     cancel_requested: bool = False
+    eta: Optional[float] = None
+    run: Any = None
+    started_at: Optional[float] = None
+    # Enqueue time of the current attempt (its eta when delayed); wait metrics start here.
+    enqueued_at: float = 0.0
     created_at: float = 0.0
     updated_at: float = 0.0
 
 
+class TaskRecordStore:
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttls: Optional[Dict[TaskState, Optional[float]]] = None,
+        sweep_batch: int = 64,
+    ):
+        self._records: "OrderedDict[str, TaskRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.ttls: Dict[TaskState, Optional[float]] = dict(DEFAULT_RECORD_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.sweep_batch = sweep_batch
+        self.expired = 0
+        self.evicted = 0
+
+    def configure(self, max_entries: Optional[int] = None, ttls: Optional[Dict[str, Optional[float]]] = None):
+        with self._lock:
+            if isinstance(max_entries, int) and max_entries > 0:
+                self.max_entries = max_entries
+            for state, ttl in (ttls or {}).items():
+                self.ttls[TaskState(state)] = ttl
+
+    def put(self, record: TaskRecord):
+        with self._lock:
+            self._records[record.id] = record
+            self._records.move_to_end(record.id)
+            self._sweep_locked(time.time())
+
+    def get(self, task_id: str) -> Optional[TaskRecord]:
+        with self._lock:
+            record = self._records.get(task_id)
+            if record is None:
+                return None
+            if self._is_expired(record, time.time()):
+                del self._records[task_id]
+                self.expired += 1
+                return None
+            self._records.move_to_end(task_id)
+            return record
+
+    def remove(self, task_id: str):
+        with self._lock:
+            self._records.pop(task_id, None)
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._sweep_locked(time.time())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "live": len(self._records),
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "max_entries": self.max_entries,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+    def _is_expired(self, record: TaskRecord, now: float) -> bool:
+        ttl = self.ttls.get(record.state)
+        return ttl is not None and now - record.updated_at > ttl
+
+    def _sweep_locked(self, now: float) -> int:
+        # At most sweep_batch records from the least recently used end are
+        # inspected per call, so eviction cost is amortized across puts. An
+        # unexpired record does not end the scan: states have different TTLs,
+        # so expired records can sit behind a longer-lived one.
+        removed = 0
+        rotate = []
+        for task_id, record in list(itertools.islice(self._records.items(), self.sweep_batch)):
+            if self._is_expired(record, now):
+                del self._records[task_id]
+                self.expired += 1
+                removed += 1
+            elif len(self._records) <= self.max_entries:
+                continue
+            elif record.state in TERMINAL_STATES:
+                del self._records[task_id]
+                self.evicted += 1
+                removed += 1
+            else:
+                # Live tasks are never dropped for capacity; rotate them past newer records.
+                rotate.append(task_id)
+        for task_id in rotate:
+            self._records.move_to_end(task_id)
+        return removed
+
+
+class TaskLane:
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"task-{name}")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._active: Dict[str, int] = {}
+        self._parked: Dict[str, Deque[Tuple[Future, Callable, Optional[str]]]] = {}
+
+    def submit(self, fn: Callable, key: Optional[str] = None, limit: Optional[int] = None) -> Future:
+        future: Future = Future()
+        item = (future, fn, key)
+        with self._lock:
+            if key is not None and limit and self._active.get(key, 0) >= limit:
+                # Over the per-name cap: park without occupying a worker thread.
+                self._parked.setdefault(key, deque()).append(item)
+                return future
+            if key is not None:
+                self._active[key] = self._active.get(key, 0) + 1
+            self._queued += 1
+        self._executor.submit(self._run, item)
+        return future
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._queued + sum(len(items) for items in self._parked.values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self._queued,
+                "parked": sum(len(items) for items in self._parked.values()),
+                "running": self._running,
+            }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, item):
+        future, fn, key = item
+        with self._lock:
+            self._queued -= 1
+        try:
+            if not future.set_running_or_notify_cancel():
+                return
+            with self._lock:
+                self._running += 1
+            try:
+                future.set_result(fn())
+            except BaseException as exc:
+                future.set_exception(exc)
+            finally:
+                with self._lock:
+                    self._running -= 1
+        finally:
+            self._release(key)
+
+    def _release(self, key: Optional[str]):
+        if key is None:
+            return
+        with self._lock:
+            parked = self._parked.get(key)
+            if not parked:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+                return
+            # Hand the slot straight to the next parked task for the same name.
+            item = parked.popleft()
+            if not parked:
+                del self._parked[key]
+            self._queued += 1
+        self._executor.submit(self._run, item)
+
+
+class ProcessLane(TaskLane):
+    # Dispatcher threads wait on a pool of spawned worker processes that keep
+    # their own app and DB engine, so CPU-bound tasks do not share the GIL
+    # with request threads.
+    def __init__(self, name: str, max_workers: int, config_name: Optional[str] = None):
+        super().__init__(name, max_workers)
+        self.config_name = config_name
+        self.restarts = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pids = None
+        self._manager = None
+        self._pool_lock = threading.Lock()
+        # Held by synchronous calls (TaskQueue.call) while they occupy a worker.
+        self.slots = threading.BoundedSemaphore(max_workers)
+
+    def pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                context = multiprocessing.get_context("spawn")
+                self._pids = context.SimpleQueue()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_pool_worker,
+                    initargs=(self.config_name, self._pids),
+                )
+            return self._pool
+
+    def cancel_event(self):
+        with self._pool_lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+            return self._manager.Event()
+
+    def restart(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            pids, self._pids = self._pids, None
+            self.restarts += 1
+        if pool is None:
+            return
+        # ProcessPoolExecutor cannot kill its workers, so each one reports its
+        # pid at startup. Once one dies the executor is broken and terminates
+        # the rest; their futures fail with BrokenProcessPool.
+        while not pids.empty():
+            try:
+                os.kill(pids.get(), signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        pool.shutdown(wait=False, cancel_futures=True)
+        pids.close()
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats["processes"] = self.max_workers
+        stats["restarts"] = self.restarts
+        return stats
+
+    def shutdown(self, wait: bool = False):
+        super().shutdown(wait=wait)
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            manager, self._manager = self._manager, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+        if manager is not None:
+            manager.shutdown()
+
+
+class DelayedScheduler:
+    def __init__(self, name: str = "task-delayed"):
+        self.name = name
+        # (eta, seq, kind, callback); kind tells delayed submissions apart from
+        # coalesce windows and time-limit watchdogs sharing the heap.
+        self._heap: List[Tuple[float, int, str, Callable]] = []
+        self._cond = threading.Condition()
+        self._counter = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, eta: float, callback: Callable, kind: str = "submit"):
+        with self._cond:
+            heapq.heappush(self._heap, (eta, next(self._counter), kind, callback))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+            # Only wake the loop when the new entry becomes the earliest deadline.
+            if self._heap[0][3] is callback:
+                self._cond.notify()
+
+    def pending(self, kind: Optional[str] = None) -> int:
+        with self._cond:
+            if kind is None:
+                return len(self._heap)
+            return sum(1 for entry in self._heap if entry[2] == kind)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                eta, _, _, callback = self._heap[0]
+                remaining = eta - time.time()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                heapq.heappop(self._heap)
+            try:
+                callback()
+            except Exception:
+                logger.exception("Delayed task submission failed")
+
+
 class TaskRequest:
     def __init__(self, retries: int):
         self.retries = retries
 
 
 class TaskContext:
-    def __init__(self, task_id: str, max_retries: int, default_retry_delay: int, retries: int):
+    def __init__(
+        self,
+        task_id: str,
+        max_retries: int,
+        default_retry_delay: int,
+        retries: int,
+        cancel_token: Optional[CancellationToken] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
         self.id = task_id
         self.max_retries = max_retries
         self.default_retry_delay = default_retry_delay
         self.request = TaskRequest(retries)
+        self.cancel_token = cancel_token or CancellationToken()
+        self._on_progress = on_progress
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+    @property
+    def soft_time_limit_exceeded(self) -> bool:
+        error_type = self.cancel_token.error_type
+        return error_type is not None and issubclass(error_type, SoftTimeLimitExceeded)
+
+    def check_cancelled(self):
+        self.cancel_token.raise_if_cancelled()
+
+    def check_time_limit(self):
+        if self.soft_time_limit_exceeded:
+            self.cancel_token.raise_if_cancelled()
+
+    def update_progress(self, done: int, total: int, **extra):
+        # Shown as `progress` by GET /api/v1/tasks/<id> while the task runs.
+        if self._on_progress is not None:
+            self._on_progress({"done": done, "total": total, **extra})
 
     def retry(self, exc: Optional[Exception] = None, countdown: Optional[int] = None):
         if self.request.retries >= self.max_retries:
@@ -65,43 +483,253 @@ class TaskContext:
         return RetryTask(exc=exc, countdown=delay)
 
 
+class _LinkedCancellationToken(CancellationToken):
+    # Child-side token that also observes a cancel event owned by the parent.
+    def __init__(self, remote_event):
+        super().__init__()
+        self._remote = remote_event
+
+    def _sync(self):
+        if not self._event.is_set() and self._remote.is_set():
+            self.cancel("Task cancelled")
+
+    @property
+    def cancelled(self) -> bool:
+        self._sync()
+        return self._event.is_set()
+
+    @property
+    def error_type(self) -> Optional[Type[TaskCancelled]]:
+        self._sync()
+        return super().error_type
+
+    def raise_if_cancelled(self):
+        self._sync()
+        super().raise_if_cancelled()
+
+
+@dataclass
+class _PendingCall:
+    # Arguments of a coalesced task still waiting out its window; later calls
+    # with the same key update them in place.
+    task_id: str
+    args: tuple
+    kwargs: Dict[str, Any]
+    merged: int = 0
+
+
+class _TaskRun:
+    def __init__(self):
+        self.token = CancellationToken()
+        self.process = None
+        self.finished = False
+        self.timed_out = False
+
+
+def _resolve_task(module: str, qualname: str) -> Callable:
+    target: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target
+
+
+def _invoke_in_child(app, module, qualname, context_kwargs, soft_time_limit, token, args, kwargs) -> Dict[str, Any]:
+    # Runs a task inside a child process and reports a picklable outcome. Tasks
+    # enqueued by the child are relayed back so they run (and retry) in the
+    # parent queue.
+    relayed: List[tuple] = []
+    outcome: Dict[str, Any] = {}
+    timer = None
+    try:
+        func = _resolve_task(module, qualname)
+        if soft_time_limit:
+            timer = threading.Timer(soft_time_limit, token.cancel, ("Soft time limit exceeded", SoftTimeLimitExceeded))
+            timer.daemon = True
+            timer.start()
+
+        def call():
+            if context_kwargs is not None:
+                return func(TaskContext(cancel_token=token, **context_kwargs), *args, **kwargs)
+            return func(*args, **kwargs)
+
+        if app is not None:
+            from app.extensions import task_queue
+            task_queue._relay = relayed
+            with app.app_context():
+                result = call()
+        else:
+            result = call()
+        outcome = {"status": "success", "result": result}
+    except RetryTask as exc:
+        outcome = {"status": "retry", "info": str(exc.exc) if exc.exc else None, "countdown": exc.countdown}
+    except SoftTimeLimitExceeded as exc:
+        outcome = {"status": "soft_timeout", "info": str(exc)}
+    except TaskCancelled as exc:
+        outcome = {"status": "cancelled", "info": str(exc)}
+    except Exception as exc:
+        outcome = {"status": "failure", "info": str(exc)}
+    finally:
+        if timer is not None:
+            timer.cancel()
+        outcome["relayed"] = relayed
+    return outcome
+
+
+def _run_isolated(conn, config_name, module, qualname, context_kwargs, soft_time_limit, args, kwargs):
+    # Entry point of the one-off child process used by isolate=True tasks.
+    os.environ["TASK_QUEUE_CHILD_PROCESS"] = "1"
+    app = None
+    try:
+        if config_name:
+            from app import create_app
+            app = create_app(config_name)
+        outcome = _invoke_in_child(app, module, qualname, context_kwargs, soft_time_limit,
+                                   CancellationToken(), args, kwargs)
+    except Exception as exc:
+        outcome = {"status": "failure", "info": str(exc), "relayed": []}
+    conn.send(outcome)
+    conn.close()
+
+
+_pool_app = None
+
+
+def _init_pool_worker(config_name, pids):
+    global _pool_app
+    os.environ["TASK_QUEUE_CHILD_PROCESS"] = "1"
+    pids.put(os.getpid())
+    if config_name:
+        from app import create_app
+        _pool_app = create_app(config_name)
+
+
+def _run_pooled(module, qualname, context_kwargs, soft_time_limit, cancel_event, args, kwargs):
+    token = _LinkedCancellationToken(cancel_event) if cancel_event is not None else CancellationToken()
+    return _invoke_in_child(_pool_app, module, qualname, context_kwargs, soft_time_limit, token, args, kwargs)
+
+
+def _call_pooled(module, qualname, args, kwargs):
+    func = _resolve_task(module, qualname)
+    if _pool_app is None:
+        return func(*args, **kwargs)
+    with _pool_app.app_context():
+        return func(*args, **kwargs)
+
+
 class LocalAsyncResult:
     def __init__(self, task_id: str, queue: "TaskQueue"):
         self.id = task_id
         self._queue = queue
+        self._remote: Optional[Dict[str, Any]] = None
 
     @property
     def state(self) -> str:
         record = self._queue._get_record(self.id)
-        return record.state.value if record else TaskState.PENDING.value
+        if record:
+            return record.state.value
+        remote = self._remote_snapshot()
+        return remote["state"] if remote else TaskState.PENDING.value
 
     @property
     def result(self):
         record = self._queue._get_record(self.id)
-        return record.result if record else None
+        if record:
+            return record.result
+        remote = self._remote_snapshot()
+        return remote["result"] if remote else None
 
     @property
     def info(self):
         record = self._queue._get_record(self.id)
-        return record.info if record else None
+        if record:
+            return record.info
+        remote = self._remote_snapshot()
+        return remote["info"] if remote else None
+
+    def _remote_snapshot(self) -> Optional[Dict[str, Any]]:
+        # Tasks enqueued by another worker process are only visible through the
+        # shared result backend; a finished snapshot is fetched only once.
+        if self._remote is not None:
+            return self._remote
+        snapshot = self._queue._fetch_snapshot(self.id)
+        if snapshot and TaskState(snapshot["state"]) in TERMINAL_STATES:
+            self._remote = snapshot
+        return snapshot
+
+    def ready(self) -> bool:
+        return TaskState(self.state) in TERMINAL_STATES
+
+    @property
+    def runtime(self) -> Optional[float]:
+        # Seconds from the start of the last attempt to completion (local tasks only).
+        record = self._queue._get_record(self.id)
+        if not record or record.started_at is None or record.state not in TERMINAL_STATES:
+            return None
+        return record.updated_at - record.started_at
 
     def revoke(self, terminate: bool = False):
-        self._queue.revoke(self.id)
+        self._queue.revoke(self.id, terminate=terminate)
 
 
 class TaskQueue:
-    def __init__(self, max_workers: int = 4):
-        self._executor = ThreadPoolExecutor(max_workers=max_workers)
-        self._tasks: Dict[str, TaskRecord] = {}
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_records: int = 10000,
+        lanes: Optional[Dict[str, int]] = None,
+        process_lanes: Optional[Dict[str, int]] = None,
+    ):
+        self._lanes: Dict[str, TaskLane] = {}
+        self._configure_lanes(max_workers, lanes if lanes is not None else DEFAULT_LANES, process_lanes or {})
+        self._tasks = TaskRecordStore(max_entries=max_records)
+        self._timers = DelayedScheduler()
         self._lock = threading.Lock()
+        self._timeouts: Dict[str, Dict[str, int]] = {}
+        self._coalescing: Dict[Tuple[str, Any], _PendingCall] = {}
+        self._coalesced = 0
+        self.metrics = TaskMetrics()
+        self._results: Optional[WriteBehindPublisher] = None
+        self._registry: Dict[str, Tuple[Callable, TaskMeta]] = {}
+        self._jobs: Optional[JobTable] = None
+        self._relay: Optional[List[tuple]] = None
         self._app = None
 
     def init_app(self, app):
         self._app = app
         max_workers = app.config.get("TASK_QUEUE_MAX_WORKERS")
-        if isinstance(max_workers, int) and max_workers > 0:
-            self._executor.shutdown(wait=False)
-            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        lanes = app.config.get("TASK_QUEUE_LANES")
+        process_lanes = app.config.get("TASK_QUEUE_PROCESS_LANES")
+        if (isinstance(max_workers, int) and max_workers > 0) or lanes is not None or process_lanes is not None:
+            default_workers = max_workers if isinstance(max_workers, int) and max_workers > 0 \
+                else self._lanes[DEFAULT_LANE].max_workers
+            self._configure_lanes(
+                default_workers,
+                lanes if lanes is not None else DEFAULT_LANES,
+                process_lanes or {},
+                config_name=app.config.get("CONFIG_NAME"),
+            )
+        self._tasks.configure(
+            max_entries=app.config.get("TASK_QUEUE_MAX_RECORDS"),
+            ttls=app.config.get("TASK_QUEUE_RECORD_TTLS"),
+        )
+        # In external mode the web tier only inserts job rows; `python -m
+        # app.worker` processes claim and run them.
+        self._jobs = None
+        if (app.config.get("TASK_QUEUE_MODE") == "external"
+                and not os.environ.get("TASK_QUEUE_WORKER_PROCESS")
+                and not os.environ.get("TASK_QUEUE_CHILD_PROCESS")):
+            self._jobs = JobTable(app, max_attempts=app.config.get("TASK_QUEUE_JOB_MAX_ATTEMPTS", 5))
+        # Worker processes of a process lane never own task records.
+        if not os.environ.get("TASK_QUEUE_CHILD_PROCESS"):
+            self.use_result_backend(
+                create_backend(app, app.config.get("TASK_QUEUE_RESULT_BACKEND")),
+                flush_interval=app.config.get("TASK_QUEUE_RESULT_FLUSH_INTERVAL", 0.5),
+            )
+
+    def use_result_backend(self, backend: Optional[ResultBackend], flush_interval: float = 0.5):
+        if self._results:
+            self._results.stop()
+        self._results = WriteBehindPublisher(backend, flush_interval=flush_interval) if backend else None
 
     def task(self, *dargs, **dkwargs):
         def decorator(func: Callable):
@@ -110,55 +738,416 @@ class TaskQueue:
                 bind=dkwargs.get("bind", False),
                 max_retries=dkwargs.get("max_retries", 0),
                 default_retry_delay=dkwargs.get("default_retry_delay", 0),
+                lane=dkwargs.get("lane", DEFAULT_LANE),
+                max_concurrency=dkwargs.get("max_concurrency"),
+                retry_jitter=dkwargs.get("retry_jitter", 0.0),
+                time_limit=dkwargs.get("time_limit"),
+                soft_time_limit=dkwargs.get("soft_time_limit"),
+                isolate=dkwargs.get("isolate", False),
+                coalesce_key=dkwargs.get("coalesce_key"),
+                coalesce_window=dkwargs.get("coalesce_window", 0.0),
+                coalesce_merge=dkwargs.get("coalesce_merge"),
             )
 
             def delay(*args, **kwargs):
                 return self.enqueue(func, meta, args, kwargs)
 
+            def apply_async(args=None, kwargs=None, countdown=None, eta=None):
+                return self.enqueue(func, meta, tuple(args or ()), dict(kwargs or {}), countdown=countdown, eta=eta)
+
             func.delay = delay
-            func.apply_async = delay
+            func.apply_async = apply_async
             func._task_meta = meta
+            self._registry[self._task_name(func, meta)] = (func, meta)
             return func
 
         if dargs and callable(dargs[0]):
             return decorator(dargs[0])
         return decorator
 
-    def enqueue(self, func: Callable, meta: TaskMeta, args, kwargs) -> LocalAsyncResult:
-        task_id = str(uuid.uuid4())
-        name = meta.name or getattr(func, "__name__", "task")
+    def enqueue(
+        self,
+        func: Callable,
+        meta: TaskMeta,
+        args,
+        kwargs,
+        countdown: Optional[float] = None,
+        eta: Optional[datetime] = None,
+        task_id: Optional[str] = None,
+        coalesce: bool = True,
+    ) -> LocalAsyncResult:
+        # coalesce=False runs the call under task_id even if its key matches a
+        # pending call (jobs claimed by app.worker were debounced when inserted).
+        task_id = task_id or str(uuid.uuid4())
+        if self._relay is not None:
+            self._relay.append((task_id, func.__module__, func.__qualname__, args, kwargs, countdown, eta))
+            return LocalAsyncResult(task_id, self)
+        name = self._task_name(func, meta)
+        if coalesce and meta.coalesce_key is not None and countdown is None and eta is None:
+            key = meta.coalesce_key(*args, **kwargs)
+            if key is not None:
+                return self._enqueue_coalesced(func, meta, name, (name, key), args, kwargs, task_id)
         now = time.time()
+        if self._jobs is not None:
+            self._jobs.insert(task_id, name, args, kwargs, run_at=self._resolve_eta(now, countdown, eta))
+            return LocalAsyncResult(task_id, self)
+        run_at = self._resolve_eta(now, countdown, eta)
         record = TaskRecord(
             id=task_id,
             name=name,
             state=TaskState.PENDING,
             retries=0,
             max_retries=meta.max_retries,
+            eta=run_at,
+            enqueued_at=run_at or now,
             created_at=now,
             updated_at=now,
         )
-        with self._lock:
-            self._tasks[task_id] = record
-        self._submit(task_id, func, meta, args, kwargs, retries=0)
+        self._tasks.put(record)
+        self._publish(record)
+        if run_at is None:
+            self._submit(task_id, func, meta, args, kwargs, retries=0)
+        else:
+            self._submit_later(run_at, task_id, func, meta, args, kwargs, retries=0)
         return LocalAsyncResult(task_id, self)
 
     def AsyncResult(self, task_id: str) -> LocalAsyncResult:
         return LocalAsyncResult(task_id, self)
 
-    def revoke(self, task_id: str):
+    def registered(self, name: str) -> Optional[Tuple[Callable, TaskMeta]]:
+        return self._registry.get(name)
+
+    def call(self, lane_name: str, func: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        # Synchronously run a module-level function on a process lane and return
+        # its (picklable) result; thread lanes run it inline in the caller. Give
+        # synchronous callers a lane of their own: a timeout recycles the pool.
+        lane = self._lanes.get(lane_name)
+        if not isinstance(lane, ProcessLane):
+            return func(*args, **kwargs)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        # Submit only once a worker is free, so a call that times out while
+        # waiting is dropped without touching the processes.
+        if not lane.slots.acquire(timeout=remaining()):
+            raise TimeLimitExceeded(f"Time limit of {timeout}s exceeded")
+        try:
+            for attempt in range(2):
+                future = lane.pool().submit(_call_pooled, func.__module__, func.__qualname__, args, kwargs)
+                try:
+                    return future.result(timeout=remaining())
+                except FutureTimeoutError:
+                    lane.restart()
+                    raise TimeLimitExceeded(f"Time limit of {timeout}s exceeded")
+                except BrokenProcessPool:
+                    # Another call on this lane timed out; run once more on the new pool.
+                    if attempt:
+                        raise
+        finally:
+            lane.slots.release()
+
+    def revoke(self, task_id: str, terminate: bool = False):
         record = self._get_record(task_id)
         if not record:
             return
         with self._lock:
             record.cancel_requested = True
-            if record.future and record.future.cancel():
+            revoked = record.eta is not None or (record.future and record.future.cancel())
+            if revoked:
                 record.state = TaskState.REVOKED
                 record.info = "Task cancelled before execution"
                 record.updated_at = time.time()
+                self.metrics.count(record.name, "revoked")
+            run = record.run
+        if revoked:
+            self._publish(record)
+            return
+        if run is None:
+            return
+        # Running tasks see the token at their next checkpoint (pooled tasks via a
+        # shared event); isolated tasks can also be killed outright.
+        run.token.cancel("Task cancelled")
+        if terminate and run.process is not None:
+            run.process.kill()
+
+    def lane_depths(self) -> Dict[str, int]:
+        return {name: lane.depth() for name, lane in self._lanes.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "records": self._tasks.stats(),
+            "lanes": {name: lane.stats() for name, lane in self._lanes.items()},
+            "delayed": self._timers.pending("submit"),
+            "timeouts": self._timeout_counts(),
+            "coalesced": self._coalesced,
+            "results": self._results.stats() if self._results else None,
+        }
+
+    def gauges(self) -> Dict[str, Dict[str, int]]:
+        lanes = {name: lane.stats() for name, lane in self._lanes.items()}
+        return {
+            "pending": {name: stats["queued"] + stats["parked"] for name, stats in lanes.items()},
+            "running": {name: stats["running"] for name, stats in lanes.items()},
+            # Countdown/eta submissions and retry backoffs only
+            "delayed": {"": self._timers.pending("submit")},
+        }
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        return {"tasks": self.metrics.snapshot(), "scheduled": self.metrics.scheduled_snapshot(), **self.gauges()}
+
+    def metrics_text(self) -> str:
+        return self.metrics.render_prometheus(self.gauges())
+
+    def shutdown(self, wait: bool = False):
+        for lane in self._lanes.values():
+            lane.shutdown(wait=wait)
+        if self._results:
+            self._results.stop()
+
+    def _configure_lanes(
+        self,
+        default_workers: int,
+        lanes: Dict[str, int],
+        process_lanes: Dict[str, int],
+        config_name: Optional[str] = None,
+    ):
+        previous = self._lanes
+        configured: Dict[str, TaskLane] = {DEFAULT_LANE: TaskLane(DEFAULT_LANE, default_workers)}
+        for name, workers in lanes.items():
+            if name != DEFAULT_LANE and isinstance(workers, int) and workers > 0:
+                configured[name] = TaskLane(name, workers)
+        for name, workers in process_lanes.items():
+            if name != DEFAULT_LANE and isinstance(workers, int) and workers > 0:
+                configured[name] = ProcessLane(name, workers, config_name=config_name)
+        self._lanes = configured
+        for lane in previous.values():
+            lane.shutdown(wait=False)
+
+    @staticmethod
+    def _task_name(func: Callable, meta: TaskMeta) -> str:
+        return meta.name or getattr(func, "__name__", "task")
+
+    def _lane_for(self, meta: TaskMeta) -> TaskLane:
+        return self._lanes.get(meta.lane) or self._lanes[DEFAULT_LANE]
+
+    @staticmethod
+    def _resolve_eta(now: float, countdown: Optional[float], eta: Optional[datetime]) -> Optional[float]:
+        if eta is not None:
+            if eta.tzinfo is None:
+                eta = eta.replace(tzinfo=timezone.utc)
+            run_at = eta.timestamp()
+        elif countdown:
+            run_at = now + countdown
+        else:
+            return None
+        return run_at if run_at > now else None
+
+    @staticmethod
+    def _jittered(delay: float, jitter: float) -> float:
+        if not jitter or delay <= 0:
+            return delay
+        return max(0.0, random.uniform(delay * (1 - jitter), delay * (1 + jitter)))
+
+    def _submit_later(self, run_at: float, task_id: str, func: Callable, meta: TaskMeta, args, kwargs, retries: int):
+        def fire():
+            record = self._get_record(task_id)
+            if not record or record.cancel_requested:
+                return
+            record.eta = None
+            self._submit(task_id, func, meta, args, kwargs, retries=retries)
+
+        self._timers.schedule(run_at, fire)
+
+    def _enqueue_coalesced(self, func: Callable, meta: TaskMeta, name: str, key: Tuple[str, Any],
+                           args, kwargs, task_id: str) -> LocalAsyncResult:
+        with self._lock:
+            pending = self._coalescing.get(key)
+            record = self._get_record(pending.task_id) if pending else None
+            if record is not None and record.eta is not None and not record.cancel_requested:
+                if meta.coalesce_merge is not None:
+                    kwargs = meta.coalesce_merge(pending.kwargs, kwargs)
+                pending.args, pending.kwargs = args, kwargs
+                pending.merged += 1
+                self._coalesced += 1
+                return LocalAsyncResult(pending.task_id, self)
+
+            now = time.time()
+            run_at = now + meta.coalesce_window
+            pending = _PendingCall(task_id, args, kwargs)
+            self._coalescing[key] = pending
+            record = TaskRecord(
+                id=task_id,
+                name=name,
+                state=TaskState.PENDING,
+                retries=0,
+                max_retries=meta.max_retries,
+                eta=run_at,
+                enqueued_at=now,
+                created_at=now,
+                updated_at=now,
+            )
+            self._tasks.put(record)
+        self._publish(record)
+
+        def fire():
+            with self._lock:
+                if self._coalescing.get(key) is pending:
+                    del self._coalescing[key]
+            record = self._get_record(task_id)
+            if not record or record.cancel_requested:
+                return
+            record.eta = None
+            if pending.merged:
+                logger.debug(f"Task {name} [{task_id}] absorbed {pending.merged} duplicate calls")
+            if self._jobs is not None:
+                # The merged call is handed to the worker tier once the window closes.
+                self._tasks.remove(task_id)
+                self._jobs.insert(task_id, name, pending.args, pending.kwargs)
+                return
+            self._submit(task_id, func, meta, pending.args, pending.kwargs, retries=0)
+
+        self._timers.schedule(run_at, fire, kind="coalesce")
+        return LocalAsyncResult(task_id, self)
 
     def _get_record(self, task_id: str) -> Optional[TaskRecord]:
+        return self._tasks.get(task_id)
+
+    def _publish(self, record: TaskRecord):
+        if self._results is None:
+            return
+        self._results.publish({
+            "id": record.id,
+            "name": record.name,
+            "state": record.state.value,
+            "result": record.result,
+            "info": record.info if record.info is None or isinstance(record.info, dict) else str(record.info),
+            "retries": record.retries,
+            "updated_at": record.updated_at,
+        })
+
+    def _fetch_snapshot(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if self._results is None:
+            return None
+        try:
+            return self._results.pending(task_id) or self._results.backend.get(task_id)
+        except Exception as exc:
+            logger.warning(f"Task result backend read failed for {task_id}: {exc}")
+            return None
+
+    def _timeout_counts(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._timeouts.items()}
+
+    def _record_timeout(self, record: TaskRecord, kind: str, info: str):
         with self._lock:
-            return self._tasks.get(task_id)
+            counts = self._timeouts.setdefault(record.name, {"soft": 0, "hard": 0})
+            counts[kind] += 1
+        record.state = TaskState.TIMEOUT
+        record.info = info
+        record.updated_at = time.time()
+        self.metrics.count(record.name, "timeout")
+        self._publish(record)
+        logger.warning(f"Task {record.name} [{record.id}] timed out ({kind} limit)")
+
+    def _arm_time_limits(self, record: TaskRecord, meta: TaskMeta, run: _TaskRun, out_of_process: bool):
+        # Child processes arm their own soft limit and are killed on the hard one.
+        if out_of_process:
+            return
+        started = time.time()
+        if meta.soft_time_limit:
+            self._timers.schedule(
+                started + meta.soft_time_limit,
+                lambda: run.token.cancel("Soft time limit exceeded", SoftTimeLimitExceeded),
+                kind="time_limit",
+            )
+        if meta.time_limit:
+            def expire():
+                with self._lock:
+                    if run.finished:
+                        return
+                    run.timed_out = True
+                run.token.cancel(f"Time limit of {meta.time_limit}s exceeded")
+                # The thread cannot be killed; its eventual result is discarded.
+                self._record_timeout(record, "hard", f"Time limit of {meta.time_limit}s exceeded")
+
+            self._timers.schedule(started + meta.time_limit, expire, kind="time_limit")
+
+    def _execute_isolated(self, func: Callable, meta: TaskMeta, run: _TaskRun, args, kwargs, context_kwargs):
+        ctx = multiprocessing.get_context("spawn")
+        reader, writer = ctx.Pipe(duplex=False)
+        config_name = self._app.config.get("CONFIG_NAME") if self._app else None
+        process = ctx.Process(
+            target=_run_isolated,
+            args=(writer, config_name, func.__module__, func.__qualname__, context_kwargs,
+                  meta.soft_time_limit, args, kwargs),
+            daemon=True,
+        )
+        process.start()
+        run.process = process
+        writer.close()
+        try:
+            if not reader.poll(meta.time_limit):
+                process.kill()
+                raise TimeLimitExceeded(f"Time limit of {meta.time_limit}s exceeded")
+            try:
+                outcome = reader.recv()
+            except EOFError:
+                process.join()
+                if run.token.cancelled:
+                    raise TaskCancelled("Task terminated")
+                raise Exception(f"Task process exited with code {process.exitcode}")
+        finally:
+            reader.close()
+            process.join(timeout=5)
+
+        return self._unwrap_outcome(outcome)
+
+    def _execute_pooled(self, lane: ProcessLane, func: Callable, meta: TaskMeta, run: _TaskRun,
+                        args, kwargs, context_kwargs):
+        cancel_event = None
+        if context_kwargs is not None:
+            cancel_event = lane.cancel_event()
+            run.token.add_callback(cancel_event.set)
+        future = lane.pool().submit(
+            _run_pooled, func.__module__, func.__qualname__, context_kwargs,
+            meta.soft_time_limit, cancel_event, args, kwargs,
+        )
+        try:
+            outcome = future.result(timeout=meta.time_limit)
+        except FutureTimeoutError:
+            # Killing a pool worker means recycling the pool; other in-flight
+            # tasks on this lane get retried below.
+            lane.restart()
+            raise TimeLimitExceeded(f"Time limit of {meta.time_limit}s exceeded")
+        except BrokenProcessPool:
+            if run.token.cancelled:
+                raise TaskCancelled("Task terminated")
+            raise RetryTask(exc=Exception("Worker process pool was restarted"), countdown=1)
+        return self._unwrap_outcome(outcome)
+
+    def _unwrap_outcome(self, outcome: Dict[str, Any]):
+        self._enqueue_relayed(outcome["relayed"])
+        status = outcome["status"]
+        if status == "success":
+            return outcome["result"]
+        if status == "retry":
+            info = outcome["info"]
+            raise RetryTask(exc=Exception(info) if info else None, countdown=outcome["countdown"])
+        if status == "soft_timeout":
+            raise SoftTimeLimitExceeded(outcome["info"])
+        if status == "cancelled":
+            raise TaskCancelled(outcome["info"])
+        raise Exception(outcome["info"])
+
+    def _enqueue_relayed(self, relayed: List[tuple]):
+        for task_id, module, qualname, args, kwargs, countdown, eta in relayed:
+            try:
+                func = _resolve_task(module, qualname)
+                self.enqueue(func, func._task_meta, args, kwargs, countdown=countdown, eta=eta, task_id=task_id)
+            except Exception:
+                logger.exception(f"Could not enqueue task {module}.{qualname} relayed from child process")
 
     def _submit(self, task_id: str, func: Callable, meta: TaskMeta, args, kwargs, retries: int):
         def runner():
@@ -169,41 +1158,81 @@ class TaskQueue:
                 record.state = TaskState.REVOKED
                 record.info = "Task cancelled"
                 record.updated_at = time.time()
+                self.metrics.count(record.name, "revoked")
+                self._publish(record)
                 return
 
+            started = time.time()
+            # Includes the coalesce window and time parked behind max_concurrency.
+            self.metrics.observe_wait(record.name, started - record.enqueued_at)
             record.state = TaskState.STARTED
-            record.updated_at = time.time()
+            record.started_at = started
+            record.updated_at = started
+            self._publish(record)
+            lane = self._lane_for(meta)
+            pooled = isinstance(lane, ProcessLane)
+            run = _TaskRun()
+            record.run = run
+            self._arm_time_limits(record, meta, run, out_of_process=pooled or meta.isolate)
 
             def execute():
+                context_kwargs = None
                 if meta.bind:
-                    context = TaskContext(
+                    context_kwargs = dict(
                         task_id=task_id,
                         max_retries=meta.max_retries,
                         default_retry_delay=meta.default_retry_delay,
                         retries=retries,
                     )
-                    return func(context, *args, **kwargs)
+                if pooled:
+                    return self._execute_pooled(lane, func, meta, run, args, kwargs, context_kwargs)
+                if meta.isolate:
+                    return self._execute_isolated(func, meta, run, args, kwargs, context_kwargs)
+                if context_kwargs is not None:
+                    return func(
+                        TaskContext(cancel_token=run.token, on_progress=report_progress, **context_kwargs),
+                        *args,
+                        **kwargs,
+                    )
                 return func(*args, **kwargs)
 
+            def report_progress(progress: Dict[str, Any]):
+                if record.state == TaskState.STARTED:
+                    record.info = progress
+                    record.updated_at = time.time()
+                    self._publish(record)
+
+            def finish() -> bool:
+                with self._lock:
+                    run.finished = True
+                    return not run.timed_out
+
             try:
-                if self._app:
+                if self._app and not (pooled or meta.isolate):
                     with self._app.app_context():
                         result = execute()
                 else:
                     result = execute()
 
+                if not finish():
+                    return
                 record.result = result
                 if record.cancel_requested:
                     record.state = TaskState.REVOKED
                     record.info = "Task cancelled"
+                    self.metrics.count(record.name, "revoked")
                 else:
                     record.state = TaskState.SUCCESS
+                    self.metrics.count(record.name, "success")
                 record.updated_at = time.time()
             except RetryTask as retry_exc:
+                if not finish():
+                    return
                 if record.cancel_requested:
                     record.state = TaskState.REVOKED
                     record.info = "Task cancelled"
                     record.updated_at = time.time()
+                    self.metrics.count(record.name, "revoked")
                     return
                 next_retry = retries + 1
                 record.retries = next_retry
@@ -215,19 +1244,47 @@ class TaskQueue:
                     record.state = TaskState.FAILURE
                     record.info = str(retry_exc.exc) if retry_exc.exc else "Max retries exceeded"
                     record.updated_at = time.time()
+                    self.metrics.count(record.name, "failure")
                     return
 
+                self.metrics.count(record.name, "retry")
+
                 delay = retry_exc.countdown if retry_exc.countdown is not None else meta.default_retry_delay
-                threading.Timer(
-                    delay,
-                    lambda: self._submit(task_id, func, meta, args, kwargs, retries=next_retry)
-                ).start()
+                delay = self._jittered(delay, meta.retry_jitter)
+                if delay > 0:
+                    record.eta = record.enqueued_at = time.time() + delay
+                    self._submit_later(record.eta, task_id, func, meta, args, kwargs, retries=next_retry)
+                else:
+                    record.enqueued_at = time.time()
+                    self._submit(task_id, func, meta, args, kwargs, retries=next_retry)
+            except SoftTimeLimitExceeded as exc:
+                if finish():
+                    self._record_timeout(record, "soft", str(exc))
+            except TimeLimitExceeded as exc:
+                if finish():
+                    self._record_timeout(record, "hard", str(exc))
+            except TaskCancelled as exc:
+                if finish():
+                    record.state = TaskState.REVOKED
+                    record.info = str(exc)
+                    record.updated_at = time.time()
+                    self.metrics.count(record.name, "revoked")
             except Exception as exc:
+                if not finish():
+                    return
                 record.state = TaskState.FAILURE
                 record.info = str(exc)
                 record.updated_at = time.time()
+                self.metrics.count(record.name, "failure")
+            finally:
+                self.metrics.observe_run(record.name, time.time() - started)
+                record.run = None
+                if record.state in TERMINAL_STATES:
+                    record.future = None
+                if not run.timed_out:
+                    self._publish(record)
 
-        future = self._executor.submit(runner)
+        future = self._lane_for(meta).submit(runner, key=self._task_name(func, meta), limit=meta.max_concurrency)
         record = self._get_record(task_id)
-        if record:
+        if record and record.state not in TERMINAL_STATES:
             record.future = future
@@ -1,8 +1,14 @@
+import atexit
+import logging
 import os
+import threading
 
+from apscheduler.events import EVENT_JOB_MISSED
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
+from app.extensions import task_queue
 from app.tasks.periodic_tasks import (
     send_weekly_summary,
     send_daily_reminders,
@@ -10,6 +16,186 @@ from app.tasks.periodic_tasks import (
     cleanup_old_notifications,
     send_payment_reminders,
 )
+from app.tasks.notification_tasks import deliver_notification_outbox
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every process of this app (pg_try_advisory_lock key).
+SCHEDULER_LOCK_KEY = 7302461001
+
+
+class PostgresLeaderLock:
+    # Session-level advisory lock held on a dedicated connection; Postgres
+    # releases it automatically if this process (or its connection) dies.
+    def __init__(self, app):
+        self._app = app
+        self._conn = None
+
+    def try_acquire(self) -> bool:
+        from app.extensions import db
+
+        with self._app.app_context():
+            self._conn = db.engine.connect()
+        try:
+            acquired = bool(self._conn.execute(
+                db.text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LOCK_KEY}
+            ).scalar())
+            self._conn.commit()
+        except Exception:
+            self._close()
+            raise
+        if not acquired:
+            self._close()
+        return acquired
+
+    def still_held(self) -> bool:
+        from app.extensions import db
+
+        if self._conn is None:
+            return False
+        try:
+            self._conn.execute(db.text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception:
+            self._close()
+            return False
+
+    def release(self):
+        from app.extensions import db
+
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(db.text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEDULER_LOCK_KEY})
+            self._conn.commit()
+        except Exception:
+            pass
+        self._close()
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.invalidate()  # never return a lock-holding connection to the pool
+            finally:
+                conn.close()
+
+
+class FileLeaderLock:
+    # flock-based fallback for single-host setups without Postgres.
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        import fcntl
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        handle = open(self.path, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._file = handle
+        return True
+
+    def still_held(self) -> bool:
+        return self._file is not None
+
+    def release(self):
+        import fcntl
+
+        handle, self._file = self._file, None
+        if handle is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+
+class SchedulerLeader:
+    # Every process runs the election job; only the holder of the lock fires
+    # the cron triggers. A follower takes over within one election interval
+    # after the leader dies.
+    def __init__(self, lock):
+        self.lock = lock
+        self._leader = False
+        self._guard = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader
+
+    def elect(self):
+        with self._guard:
+            try:
+                if self._leader:
+                    if not self.lock.still_held():
+                        self._leader = False
+                        logger.warning("Scheduler leadership lost")
+                elif self.lock.try_acquire():
+                    self._leader = True
+                    logger.info(f"Scheduler leadership acquired (pid {os.getpid()})")
+            except Exception as exc:
+                self._leader = False
+                logger.warning(f"Scheduler election failed: {exc}")
+
+    def resign(self):
+        with self._guard:
+            if self._leader:
+                self.lock.release()
+                self._leader = False
+
+
+def _leader_lock(app):
+    kind = app.config.get("TASK_QUEUE_SCHEDULER_LOCK", "auto")
+    if kind == "auto":
+        uri = app.config.get("SQLALCHEMY_DATABASE_URI") or ""
+        kind = "postgres" if uri.startswith("postgres") else "file"
+    if kind == "postgres":
+        return PostgresLeaderLock(app)
+    return FileLeaderLock(app.config.get("TASK_QUEUE_SCHEDULER_LOCK_FILE", "/tmp/unifinanzas/scheduler.lock"))
+
+
+class SingleFlightJob:
+    # Cron callback that enqueues the task only on the leader and only when the
+    # previous run has finished; otherwise the tick is skipped and counted.
+    def __init__(self, job_id, task, leader, metrics):
+        self.job_id = job_id
+        self.task = task
+        self.leader = leader
+        self.metrics = metrics
+        self._last = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if not self.leader.is_leader:
+            return
+        with self._lock:
+            if self._last is not None:
+                if not self._last.ready():
+                    self.metrics.count_tick(self.job_id, "skipped")
+                    logger.warning(f"Scheduled job {self.job_id} skipped: previous run still in progress")
+                    return
+                self._collect_locked()
+            self._last = self.task.delay()
+            self.metrics.count_tick(self.job_id, "fired")
+
+    def collect(self):
+        with self._lock:
+            if self._last is not None and self._last.ready():
+                self._collect_locked()
+
+    def _collect_locked(self):
+        runtime = self._last.runtime
+        if runtime is not None:
+            self.metrics.observe_scheduled_run(self.job_id, runtime)
+            logger.info(f"Scheduled job {self.job_id} finished in {runtime:.1f}s ({self._last.state})")
+        self._last = None
 
 
 def start_scheduler(app):
@@ -17,44 +203,101 @@ def start_scheduler(app):
         app.logger.info("Task scheduler disabled")
         return None
 
-    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+    worker_process = bool(os.environ.get("TASK_QUEUE_WORKER_PROCESS"))
+
+    # With external workers the cron triggers run in `python -m app.worker`.
+    if app.config.get("TASK_QUEUE_MODE") == "external" and not worker_process:
+        return None
+
+    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true" and not worker_process:
+        return None
+
+    # Child processes spawned for isolated tasks never run cron triggers.
+    if os.environ.get("TASK_QUEUE_CHILD_PROCESS"):
         return None
 
     scheduler = BackgroundScheduler(
-        timezone=app.config.get("TASK_QUEUE_TIMEZONE", "UTC")
+        timezone=app.config.get("TASK_QUEUE_TIMEZONE", "UTC"),
+        job_defaults={
+            # A late tick runs once (not once per missed minute), never in
+            # parallel with itself, and is dropped past the grace period.
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": app.config.get("TASK_QUEUE_SCHEDULER_MISFIRE_GRACE", 30),
+        },
     )
+    leader = SchedulerLeader(_leader_lock(app))
+    leader.elect()
+    jobs = {
+        job_id: SingleFlightJob(job_id, task, leader, task_queue.metrics)
+        for job_id, task in (
+            ("send_weekly_summary", send_weekly_summary),
+            ("send_daily_reminders", send_daily_reminders),
+            ("check_all_budgets", check_all_budgets),
+            ("cleanup_old_notifications", cleanup_old_notifications),
+            ("send_payment_reminders", send_payment_reminders),
+            ("deliver_notification_outbox", deliver_notification_outbox),
+        )
+    }
+
+    def housekeeping():
+        leader.elect()
+        for job in jobs.values():
+            job.collect()
+
+    def on_missed(event):
+        if event.job_id in jobs:
+            task_queue.metrics.count_tick(event.job_id, "missed")
 
+    scheduler.add_listener(on_missed, EVENT_JOB_MISSED)
     scheduler.add_job(
-        lambda: send_weekly_summary.delay(),
+        housekeeping,
+        IntervalTrigger(seconds=app.config.get("TASK_QUEUE_SCHEDULER_ELECTION_INTERVAL", 15)),
+        id="scheduler_leader_election",
+        replace_existing=True,
+    )
+
+    scheduler.add_job(
+        jobs["send_weekly_summary"],
         CronTrigger(day_of_week="sun", hour=20, minute=0),
         id="send_weekly_summary",
         replace_existing=True,
     )
     scheduler.add_job(
-        lambda: send_daily_reminders.delay(),
+        jobs["send_daily_reminders"],
         CronTrigger(minute="*"),
         id="send_daily_reminders",
         replace_existing=True,
     )
     scheduler.add_job(
-        lambda: check_all_budgets.delay(),
+        jobs["check_all_budgets"],
         CronTrigger(minute="*/30"),
         id="check_all_budgets",
         replace_existing=True,
     )
     scheduler.add_job(
-        lambda: cleanup_old_notifications.delay(),
+        jobs["cleanup_old_notifications"],
         CronTrigger(hour=3, minute=0),
         id="cleanup_old_notifications",
         replace_existing=True,
     )
     scheduler.add_job(
-        lambda: send_payment_reminders.delay(),
+        jobs["send_payment_reminders"],
         CronTrigger(minute="*"),
         id="send_payment_reminders",
         replace_existing=True,
     )
+    # Commits that stage outbox rows start a delivery right away; this tick
+    # picks up retries whose backoff expired.
+    scheduler.add_job(
+        jobs["deliver_notification_outbox"],
+        CronTrigger(minute="*"),
+        id="deliver_notification_outbox",
+        replace_existing=True,
+    )
 
     scheduler.start()
-    app.logger.info("Task scheduler started")
+    scheduler.leader = leader
+    atexit.register(leader.resign)
+    app.logger.info(f"Task scheduler started (leader={leader.is_leader})")
     return scheduler
@@ -4,6 +4,7 @@ from app.tasks.email_tasks import send_email_task
 from app.tasks.notification_tasks import (
     send_push_notification_task,
     send_notification_task,
+    deliver_notification_outbox,
     check_budget_threshold_task
 )
 from app.tasks.report_tasks import generate_pdf_report_task
@@ -12,6 +13,7 @@ __all__ = [
     'send_email_task',
     'send_push_notification_task',
     'send_notification_task',
+    'deliver_notification_outbox',
     'check_budget_threshold_task',
     'generate_pdf_report_task',
 ]
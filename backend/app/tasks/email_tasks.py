@@ -14,7 +14,8 @@ logger = logging.getLogger(__name__)
     bind=True,
     name='app.tasks.email_tasks.send_email_task',
     max_retries=3,
-    default_retry_delay=60  # 1 minuto
+    default_retry_delay=60,  # 1 minuto
+    retry_jitter=0.2  # evita reintentos sincronizados durante caídas de Brevo
 )
 def send_email_task(self, to_email: str, subject: str, html_content: str, text_content: Optional[str] = None):
     """
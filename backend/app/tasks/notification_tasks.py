@@ -1,15 +1,16 @@
 """
 Notification tasks - Asynchronous push/email notifications
 """
+import json
 import logging
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 from app.extensions import task_queue, db
-from app.models.notification import Notification
 from app.models.user import User, UserProfile
 from app.services.email_service import EmailService
-from app.services.push_service import PushService
+from app.services.notification_outbox_service import NotificationOutboxService
+from app.services.notification_service import NotificationService
+from app.services.push_service import INVALID_TOKEN_ERRORS, PushService
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +19,16 @@ logger = logging.getLogger(__name__)
     bind=True,
     name='app.tasks.notification_tasks.send_push_notification_task',
     max_retries=3,
-    default_retry_delay=30
+    default_retry_delay=30,
+    retry_jitter=0.2
 )
 def send_push_notification_task(self, token: str, title: str, body: str, data: Optional[Dict] = None):
     """Envía push notification de forma asíncrona"""
     try:
         push_service = PushService()
         success = push_service.send_push(token, title, body, data)
+        # Guarda la limpieza del token si FCM lo reportó como inválido
+        db.session.commit()
 
         if success:
             logger.info(f"Push notification sent to token: {token[:10]}...")
@@ -52,10 +56,13 @@ def send_notification_task(
     channels: Optional[List[str]] = None
 ):
     """
-    Envía notificación completa (DB + push + email) de forma asíncrona.
+    Registra una notificación (DB + push/email) de forma asíncrona.
 
-    Esta es la tarea principal que reemplaza a NotificationService.send_notification()
-    para operaciones asíncronas.
+    No llama a los proveedores: guarda la notificación y sus filas de
+    notification_outbox en una sola transacción y deliver_notification_outbox
+    entrega cada canal tras el commit. Si el evento que origina la notificación
+    ya tiene una transacción abierta, usar NotificationService.enqueue para que
+    ambos se confirmen juntos.
     """
     try:
         if channels is None:
@@ -66,71 +73,157 @@ def send_notification_task(
             logger.error(f"User {user_id} not found")
             return {'status': 'error', 'message': 'User not found'}
 
-        profile = UserProfile.query.filter_by(user_id=user_id).first()
-        prefs = profile.notification_preferences if profile else {}
-
-        # Channel gating based on preferences
-        push_allowed = prefs.get("push_enabled", True) and profile and profile.fcm_token
-        email_allowed = prefs.get("email_enabled", True) and user.email
-
-        if notification_type == "threshold_alert":
-            push_allowed = push_allowed and prefs.get("threshold_alerts", True)
-            email_allowed = email_allowed and prefs.get("threshold_alerts", True)
-        elif notification_type == "weekly_summary":
-            push_allowed = push_allowed and prefs.get("weekly_summary", True)
-            email_allowed = email_allowed and prefs.get("weekly_summary", True)
-
-        send_push = push_allowed and "push" in channels
-        send_email = email_allowed and "email" in channels
-        save_db = "db" in channels
-
-        sent_via = []
-        sent_at = None
-
-        # Enviar push
-        if send_push:
-            push_service = PushService()
-            if push_service.send_push(profile.fcm_token, title, message, data):
-                sent_via.append("push")
-                sent_at = sent_at or datetime.utcnow()
-
-        # Enviar email
-        if send_email:
-            email_service = EmailService()
-            html = _build_email_html(title, message, data)
-            if email_service.send_email(user.email, title, html):
-                sent_via.append("email")
-                sent_at = sent_at or datetime.utcnow()
-
-        # Guardar en DB
-        notification = None
-        if save_db:
-            notification = Notification(
-                user_id=user_id,
-                title=title,
-                message=message,
-                notification_type=notification_type,
-                data=data or {},
-                sent_via="both" if len(sent_via) == 2 else (sent_via[0] if sent_via else "none"),
-                sent_at=sent_at,
-            )
-            db.session.add(notification)
-            db.session.commit()
+        notification = NotificationService.enqueue(
+            user_id=user_id,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            data=data,
+            channels=channels
+        )
+        db.session.commit()
 
-        logger.info(f"Notification sent to user {user_id} via {sent_via}")
+        logger.info(f"Notification queued for user {user_id} via {channels}")
 
         return {
-            'status': 'success',
-            'sent_via': sent_via,
+            'status': 'queued',
+            'channels': list(channels),
             'notification_id': notification.id if notification else None
         }
 
     except Exception as exc:
-        logger.exception(f"Error sending notification to user {user_id}: {exc}")
+        logger.exception(f"Error queueing notification for user {user_id}: {exc}")
         db.session.rollback()
         raise self.retry(exc=exc)
 
 
+@task_queue.task(
+    bind=True,
+    name='app.tasks.notification_tasks.deliver_notification_outbox',
+    # Cada commit que agrega filas pide una entrega; una ráfaga se agrupa en una sola
+    coalesce_key=lambda **_: 'outbox',
+    coalesce_window=1
+)
+def deliver_notification_outbox(self):
+    """
+    Entrega por lotes las filas pendientes de notification_outbox.
+
+    Se ejecuta: tras cada commit que agrega filas y cada minuto (task_scheduler.py)
+    Cada lote se reclama con FOR UPDATE SKIP LOCKED y un lease, así que varias
+    instancias pueden drenar en paralelo. Cada canal tiene su propio estado:
+    'sent' es definitivo y un rechazo del proveedor se reintenta con backoff hasta
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS. Una fila cuyo lease venció a mitad de envío
+    (el worker murió) vuelve a 'pending' y cuenta como intento, así que ninguna
+    notificación se pierde (al menos una entrega por canal).
+    """
+    from flask import current_app
+
+    config = current_app.config
+    batch_size = config.get('NOTIFICATION_OUTBOX_BATCH_SIZE', 100)
+    lease = config.get('NOTIFICATION_OUTBOX_LEASE', 120)
+    max_attempts = config.get('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5)
+    retry_delay = config.get('NOTIFICATION_OUTBOX_RETRY_DELAY', 30)
+
+    try:
+        totals = {'sent': 0, 'skipped': 0, 'retry': 0, 'failed': 0}
+        expired = NotificationOutboxService.expire_stale(max_attempts)
+        db.session.commit()
+
+        while True:
+            self.check_cancelled()
+            rows = NotificationOutboxService.claim(batch_size, lease)
+            # El lease queda visible antes de llamar a los proveedores
+            db.session.commit()
+            if not rows:
+                break
+
+            counts = NotificationOutboxService.record(_deliver_outbox_rows(rows), max_attempts, retry_delay)
+            db.session.commit()
+            for outcome, value in counts.items():
+                totals[outcome] += value
+
+            if len(rows) < batch_size:
+                break
+
+        if any(totals.values()) or expired:
+            logger.info(f"Notification outbox delivered: {totals}, expired leases: {expired}")
+        return {'status': 'success', 'expired': expired, **totals}
+
+    except Exception as exc:
+        logger.exception(f"Error delivering notification outbox: {exc}")
+        db.session.rollback()
+        return {'status': 'error', 'message': str(exc)}
+
+
+def _deliver_outbox_rows(rows: List[Dict]) -> List[Tuple[Dict, str, Optional[str]]]:
+    """Agrupa el lote por canal, envía cada grupo y devuelve (fila, resultado, error)"""
+    recipients = NotificationOutboxService.recipients(row['user_id'] for row in rows)
+    by_channel = {'push': [], 'email': []}
+    results = []
+
+    for row in rows:
+        destination = NotificationOutboxService.destination(row, recipients.get(row['user_id']))
+        if not destination:
+            results.append((row, 'skipped', 'disabled by user preferences or no destination'))
+            continue
+        by_channel[row['channel']].append((row, destination))
+
+    if by_channel['push']:
+        results.extend(_send_push_batch(by_channel['push']))
+    if by_channel['email']:
+        results.extend(_send_email_batch(by_channel['email']))
+    return results
+
+
+def _send_push_batch(items: List[Tuple[Dict, str]]) -> List[Tuple[Dict, str, Optional[str]]]:
+    """Envía un grupo de push (fila, token): un multicast por contenido idéntico"""
+    push_service = PushService()
+    if not push_service.client:
+        return [(row, 'skipped', 'push provider not configured') for row, _ in items]
+
+    groups = {}
+    for row, token in items:
+        key = (row['title'], row['message'], json.dumps(row['data'] or {}, sort_keys=True, default=str))
+        groups.setdefault(key, []).append((row, token))
+
+    results = []
+    for group in groups.values():
+        first = group[0][0]
+        errors = push_service.send_push_multicast(
+            [token for _, token in group], first['title'], first['message'], first['data']
+        )
+        for (row, _), error in zip(group, errors):
+            if error is None:
+                results.append((row, 'sent', None))
+            elif error in INVALID_TOKEN_ERRORS:
+                # El token ya se limpió del perfil; no tiene sentido reintentar
+                results.append((row, 'skipped', f"invalid FCM token ({error})"))
+            else:
+                results.append((row, 'failed', error))
+    return results
+
+
+def _send_email_batch(items: List[Tuple[Dict, str]]) -> List[Tuple[Dict, str, Optional[str]]]:
+    """Envía un grupo de emails (fila, dirección) en peticiones multi-destinatario de Brevo"""
+    email_service = EmailService()
+    if not email_service.api_key:
+        return [(row, 'skipped', 'email provider not configured') for row, _ in items]
+
+    messages = [
+        {
+            'to': email,
+            'subject': row['title'],
+            'html_content': _build_email_html(row['title'], row['message'], row['data']),
+        }
+        for row, email in items
+    ]
+    delivered = email_service.send_batch(messages)
+    return [
+        (row, 'sent', None) if ok else (row, 'failed', "email provider rejected the request")
+        for (row, _), ok in zip(items, delivered)
+    ]
+
+
 def _build_email_html(title: str, message: str, data: Optional[Dict]) -> str:
     """Construye HTML para emails de notificaciones con diseño mejorado"""
 
@@ -447,35 +540,44 @@ def _build_generic_html(title: str, message: str, data: Optional[Dict]) -> str:
 @task_queue.task(
     bind=True,
     name='app.tasks.notification_tasks.check_budget_threshold_task',
-    max_retries=1
+    max_retries=1,
+    lane='interactive',
+    # Una carga masiva de gastos del mismo usuario dispara una sola verificación
+    coalesce_key=lambda user_id, **_: user_id,
+    coalesce_window=2,
+    coalesce_merge=lambda pending, new: {**new, 'expense_amount': pending['expense_amount'] + new['expense_amount']}
 )
 def check_budget_threshold_task(self, user_id: str, expense_amount: float):
     """
-    Verifica umbrales de presupuesto después de crear un gasto.
+    Verifica umbrales de presupuesto después de crear, editar o eliminar un gasto.
 
-    Esta tarea se dispara automáticamente cuando se crea un gasto.
-    Calcula el nuevo porcentaje de gasto y envía alertas si se superan umbrales.
+    Esta tarea se dispara automáticamente con cada cambio de gastos.
+    Lee el contador incremental del periodo (budget_spend_counters) y envía una
+    alerta solo si el nivel subió (verde -> amarillo -> rojo) desde la última
+    evaluación.
     """
     try:
         from app.services.budget_service import BudgetService
 
-        # Obtener indicador de riesgo actualizado
-        risk_indicator = BudgetService.get_risk_indicator(user_id)
+        # Nivel actualizado a partir del contador (sin recalcular la suma)
+        risk_indicator, crossed = BudgetService.evaluate_threshold(user_id)
 
-        if not risk_indicator or risk_indicator['level'] == 'grey':
+        if not risk_indicator:
             # No hay presupuesto activo
+            db.session.commit()
             return {'status': 'no_budget'}
 
         level = risk_indicator['level']
         percentage = risk_indicator['percentage']
 
-        # Enviar alerta si superó umbral amarillo o rojo
-        if level in ['yellow', 'red']:
+        # Enviar alerta si cruzó el umbral amarillo o rojo
+        if crossed:
             profile = UserProfile.query.filter_by(user_id=user_id).first()
             prefs = profile.notification_preferences if profile else {}
 
             # Verificar si las alertas de umbral están habilitadas
             if not prefs.get('threshold_alerts', True):
+                db.session.commit()
                 return {'status': 'alerts_disabled'}
 
             if level == 'yellow':
@@ -485,8 +587,8 @@ def check_budget_threshold_task(self, user_id: str, expense_amount: float):
                 title = "Alerta Crítica de Presupuesto"
                 message = f"Has superado el {percentage:.1f}% de tu presupuesto semanal. ¡Atención urgente requerida!"
 
-            # Enviar notificación asíncrona
-            send_notification_task.delay(
+            # La alerta se confirma junto con el nuevo nivel del contador
+            NotificationService.enqueue(
                 user_id=user_id,
                 title=title,
                 message=message,
@@ -499,12 +601,15 @@ def check_budget_threshold_task(self, user_id: str, expense_amount: float):
                 },
                 channels=['push', 'email', 'db']
             )
+            db.session.commit()
 
-            logger.info(f"Budget threshold alert sent to user {user_id} (level={level})")
+            logger.info(f"Budget threshold alert queued for user {user_id} (level={level})")
             return {'status': 'alert_sent', 'level': level}
 
+        db.session.commit()
         return {'status': 'ok', 'level': level}
 
     except Exception as exc:
         logger.exception(f"Error checking budget threshold for user {user_id}: {exc}")
+        db.session.rollback()
         raise self.retry(exc=exc)
@@ -2,304 +2,455 @@
 Periodic tasks - Scheduled background jobs (APScheduler)
 """
 import logging
-from datetime import datetime, date, timedelta
-from zoneinfo import ZoneInfo
+from datetime import datetime, date, timedelta, timezone
+
+from sqlalchemy import tuple_
 
 from app.extensions import task_queue, db
 from app.models.user import User, UserProfile
-from app.models.notification import Notification
-from app.models.budget import Budget
-from app.models.payment import Payment
+from app.models.payment import Payment, PaymentReminder
+from app.models.task_checkpoint import TaskCheckpoint
 from app.services.budget_service import BudgetService
-from app.tasks.notification_tasks import send_notification_task
+from app.services.notification_outbox_service import NotificationOutboxService
+from app.services.notification_retention_service import NotificationRetentionService
+from app.services.notification_service import NotificationService
+from app.services.payment_reminder_service import REMINDER_OFFSETS
+from app.utils.helpers import get_zone, next_local_occurrence, parse_time_of_day, pref_enabled
 
 logger = logging.getLogger(__name__)
 
-def _pref_enabled(prefs, key, default=False):
-    value = prefs.get(key, default)
-    if isinstance(value, bool):
+DAILY_REMINDER_BATCH_SIZE = 500
+PAYMENT_REMINDER_BATCH_SIZE = 500
+
+
+class _ZoneClock:
+    """
+    Hora local por zona horaria, calculada una sola vez por zona en cada
+    ejecución. Los perfiles de una misma zona comparten el cálculo, así que el
+    trabajo por usuario es solo una búsqueda en el diccionario.
+    """
+
+    def __init__(self, now=None):
+        self.now = now or datetime.now(timezone.utc)
+        self._local = {}
+        self._next = {}
+
+    def local_now(self, timezone_name):
+        local = self._local.get(timezone_name)
+        if local is None:
+            local = self._local[timezone_name] = self.now.astimezone(get_zone(timezone_name))
+        return local
+
+    def today(self, timezone_name):
+        return self.local_now(timezone_name).date()
+
+    def next_occurrence(self, time_of_day, timezone_name):
+        key = (timezone_name, time_of_day)
+        value = self._next.get(key)
+        if value is None:
+            value = self._next[key] = next_local_occurrence(time_of_day, timezone_name, self.now)
         return value
-    if isinstance(value, str):
-        return value.strip().lower() in {"true", "1", "yes", "y", "on"}
-    return bool(value)
 
 
-@task_queue.task(name='app.tasks.periodic_tasks.send_weekly_summary')
-def send_weekly_summary():
+def _active_profiles_query():
+    return UserProfile.query.join(User).filter(User.is_active == True)
+
+
+def _user_id_ranges(chunk_size):
+    """
+    Divide los usuarios activos en rangos [lower, upper) de user_id de hasta
+    chunk_size usuarios. El primer y el último rango quedan abiertos para
+    cubrir usuarios creados después de calcular los límites.
+    """
+    user_ids = [
+        row.user_id for row in db.session.query(UserProfile.user_id).join(User).filter(
+            User.is_active == True
+        ).order_by(UserProfile.user_id)
+    ]
+    bounds = user_ids[::chunk_size] or [None]
+    ranges = []
+    for index in range(len(bounds)):
+        lower = bounds[index] if index > 0 else None
+        upper = bounds[index + 1] if index + 1 < len(bounds) else None
+        ranges.append((lower, upper))
+    return ranges
+
+
+def _weekly_summary_notification(summary, week_start, week_end):
+    total_spent = summary['total_spent']
+    budget_amount = summary['budget'] or 0
+
+    title = f"Resumen Semanal - {week_start.strftime('%d/%m')} a {week_end.strftime('%d/%m')}"
+
+    if summary['budget'] is not None:
+        percentage = (total_spent / budget_amount * 100) if budget_amount > 0 else 0
+        message = f"Gastaste ${total_spent:,.2f} de ${budget_amount:,.2f} ({percentage:.1f}%)"
+    else:
+        message = f"Gastaste ${total_spent:,.2f} esta semana"
+
+    data = {
+        'total_spent': total_spent,
+        'budget': budget_amount,
+        'week_start': week_start.isoformat(),
+        'week_end': week_end.isoformat(),
+        'top_categories': [
+            f"{cat['icon']} {cat['name']}: ${cat['total']:,.2f}"
+            for cat in summary['top_categories']
+        ]
+    }
+    return title, message, data
+
+
+@task_queue.task(bind=True, name='app.tasks.periodic_tasks.send_weekly_summary', lane='bulk', max_concurrency=1)
+def send_weekly_summary(self):
     """
     Envía resumen semanal a todos los usuarios que lo tengan habilitado.
 
     Se ejecuta: Domingos a las 20:00 (configurado en task_scheduler.py)
+    Divide a los usuarios en rangos de user_id y encola un subtask por rango.
+    Cada rango completado queda registrado en task_checkpoints, así que volver
+    a ejecutar la tarea en la misma semana solo encola los rangos pendientes.
     """
     logger.info("Starting weekly summary task")
 
     try:
-        # Obtener usuarios con resumen semanal habilitado
-        profiles = UserProfile.query.join(User).filter(
-            User.is_active == True
-        ).all()
+        from flask import current_app
+        chunk_size = current_app.config.get("WEEKLY_SUMMARY_CHUNK_SIZE", 1000)
 
         today = date.today()
         week_start = today - timedelta(days=today.weekday())
         week_end = week_start + timedelta(days=6)
+        run_key = f"weekly_summary:{week_start.isoformat()}"
 
-        sent_count = 0
+        checkpoints = TaskCheckpoint.query.filter_by(run_key=run_key).order_by(
+            TaskCheckpoint.chunk_index
+        ).all()
 
-        for profile in profiles:
-            try:
-                prefs = profile.notification_preferences or {}
-                if not _pref_enabled(prefs, "weekly_summary", True):
-                    continue
+        if not checkpoints:
+            # Limpiar checkpoints de corridas anteriores
+            TaskCheckpoint.query.filter(
+                TaskCheckpoint.run_key.like("weekly_summary:%"),
+                TaskCheckpoint.created_at < datetime.utcnow() - timedelta(days=60)
+            ).delete(synchronize_session=False)
+
+            checkpoints = [
+                TaskCheckpoint(run_key=run_key, chunk_index=index, lower_bound=lower, upper_bound=upper)
+                for index, (lower, upper) in enumerate(_user_id_ranges(chunk_size))
+            ]
+            db.session.add_all(checkpoints)
+            db.session.commit()
+
+        pending = [checkpoint for checkpoint in checkpoints if checkpoint.state != 'done']
+
+        for checkpoint in pending:
+            self.check_cancelled()
+            send_weekly_summary_chunk.delay(
+                run_key=run_key,
+                chunk_index=checkpoint.chunk_index,
+                lower_bound=checkpoint.lower_bound,
+                upper_bound=checkpoint.upper_bound,
+                week_start_str=week_start.isoformat(),
+                week_end_str=week_end.isoformat()
+            )
+
+        self.update_progress(len(checkpoints) - len(pending), len(checkpoints), run_key=run_key)
+        logger.info(
+            f"Weekly summary {run_key}: {len(pending)} of {len(checkpoints)} chunks enqueued"
+        )
+        return {
+            'status': 'success',
+            'run_key': run_key,
+            'chunks': len(checkpoints),
+            'enqueued_chunks': len(pending)
+        }
 
-                # Obtener datos del resumen
-                total_spent = BudgetService.get_period_expenses(
-                    profile.user_id,
-                    week_start,
-                    week_end
-                )
+    except Exception as exc:
+        logger.exception(f"Error in weekly summary task: {exc}")
+        db.session.rollback()
+        return {'status': 'error', 'message': str(exc)}
 
-                by_category = BudgetService.get_expenses_by_category(
-                    profile.user_id,
-                    week_start,
-                    week_end
-                )
 
-                budget = BudgetService.get_current_budget(profile.user_id)
-                budget_amount = float(budget.total_amount) if budget else 0
+@task_queue.task(
+    bind=True,
+    name='app.tasks.periodic_tasks.send_weekly_summary_chunk',
+    lane='bulk',
+    max_retries=2,
+    default_retry_delay=60
+)
+def send_weekly_summary_chunk(
+    self,
+    run_key: str,
+    chunk_index: int,
+    lower_bound: str,
+    upper_bound: str,
+    week_start_str: str,
+    week_end_str: str
+):
+    """
+    Envía el resumen semanal a los usuarios con lower_bound <= user_id < upper_bound.
 
-                # Construir mensaje
-                title = f"Resumen Semanal - {week_start.strftime('%d/%m')} a {week_end.strftime('%d/%m')}"
+    Los resúmenes del bloque salen de una sola consulta agregada
+    (BudgetService.get_period_summaries) y el bloque se marca como 'done' en
+    task_checkpoints al terminar.
+    """
+    try:
+        checkpoint = db.session.get(TaskCheckpoint, (run_key, chunk_index))
+        if checkpoint and checkpoint.state == 'done':
+            return {'status': 'skipped', 'chunk': chunk_index}
+
+        week_start = date.fromisoformat(week_start_str)
+        week_end = date.fromisoformat(week_end_str)
+
+        query = _active_profiles_query()
+        if lower_bound is not None:
+            query = query.filter(UserProfile.user_id >= lower_bound)
+        if upper_bound is not None:
+            query = query.filter(UserProfile.user_id < upper_bound)
+
+        profiles = [
+            profile for profile in query.all()
+            if pref_enabled(profile.notification_preferences or {}, "weekly_summary", True)
+        ]
+        summaries = BudgetService.get_period_summaries(
+            [profile.user_id for profile in profiles], week_start, week_end
+        )
 
-                if budget:
-                    percentage = (float(total_spent) / budget_amount * 100) if budget_amount > 0 else 0
-                    message = f"Gastaste ${float(total_spent):,.2f} de ${budget_amount:,.2f} ({percentage:.1f}%)"
-                else:
-                    message = f"Gastaste ${float(total_spent):,.2f} esta semana"
-
-                # Top 3 categorías
-                top_categories = sorted(by_category, key=lambda x: x['total'], reverse=True)[:3]
-
-                data = {
-                    'total_spent': float(total_spent),
-                    'budget': budget_amount,
-                    'week_start': week_start.isoformat(),
-                    'week_end': week_end.isoformat(),
-                    'top_categories': [
-                        f"{cat['icon']} {cat['name']}: ${cat['total']:,.2f}"
-                        for cat in top_categories
-                    ]
-                }
-
-                # Enviar notificación asíncrona
-                send_notification_task.delay(
-                    user_id=profile.user_id,
-                    title=title,
-                    message=message,
-                    notification_type='weekly_summary',
-                    data=data,
-                    channels=['push', 'email', 'db']
+        notifications = []
+        for index, profile in enumerate(profiles):
+            self.check_cancelled()
+            try:
+                title, message, data = _weekly_summary_notification(
+                    summaries[profile.user_id], week_start, week_end
                 )
-
-                sent_count += 1
+                notifications.append((profile.user_id, title, message, data))
 
             except Exception as user_exc:
-                logger.exception(f"Error sending weekly summary to user {profile.user_id}: {user_exc}")
+                logger.exception(f"Error building weekly summary for user {profile.user_id}: {user_exc}")
                 continue
 
-        logger.info(f"Weekly summary task completed. Sent to {sent_count} users")
-        return {'status': 'success', 'sent_count': sent_count}
+            if index % 100 == 0:
+                self.update_progress(index, len(profiles), chunk=chunk_index)
+
+        # Todo el bloque en unas pocas sentencias; se confirma junto con el checkpoint.
+        # El push es el mismo para todos (un multicast de FCM); el detalle va en
+        # la notificación y el email.
+        sent_count = NotificationService.send_bulk(
+            notifications,
+            notification_type='weekly_summary',
+            push=(
+                "Tu resumen semanal está listo",
+                "Revisa cuánto gastaste esta semana y tus categorías principales.",
+                {'week_start': week_start.isoformat(), 'week_end': week_end.isoformat()}
+            )
+        )
+
+        if checkpoint:
+            checkpoint.state = 'done'
+            checkpoint.processed = sent_count
+            checkpoint.completed_at = datetime.utcnow()
+        db.session.commit()
+
+        if checkpoint:
+            remaining = TaskCheckpoint.query.filter(
+                TaskCheckpoint.run_key == run_key,
+                TaskCheckpoint.state != 'done'
+            ).count()
+            if remaining == 0:
+                logger.info(f"Weekly summary {run_key} completed")
+
+        logger.info(f"Weekly summary chunk {run_key}#{chunk_index} sent to {sent_count} users")
+        return {'status': 'success', 'chunk': chunk_index, 'sent_count': sent_count}
 
     except Exception as exc:
-        logger.exception(f"Error in weekly summary task: {exc}")
-        return {'status': 'error', 'message': str(exc)}
+        logger.exception(f"Error in weekly summary chunk {run_key}#{chunk_index}: {exc}")
+        db.session.rollback()
+        raise self.retry(exc=exc)
 
 
-@task_queue.task(name='app.tasks.periodic_tasks.send_daily_reminders')
-def send_daily_reminders():
+@task_queue.task(bind=True, name='app.tasks.periodic_tasks.send_daily_reminders', lane='bulk', max_concurrency=1)
+def send_daily_reminders(self):
     """
     Envía recordatorios diarios a usuarios que lo tengan habilitado.
 
     Se ejecuta: Cada minuto (configurado en task_scheduler.py)
-    Filtra por hora/minuto según preferencia de cada usuario.
+    Solo lee los perfiles con next_reminder_at vencido (columna indexada que se
+    recalcula al cambiar las preferencias) y los reprograma en bloque, a la hora
+    local de cada usuario (UserProfile.timezone).
     """
     logger.info("Starting daily reminders task")
 
     try:
-        timezone_name = "UTC"
-        try:
-            from flask import current_app
-            timezone_name = current_app.config.get("TASK_QUEUE_TIMEZONE", "UTC")
-        except Exception:
-            timezone_name = "UTC"
-
-        # Obtener usuarios con recordatorios habilitados
-        profiles = UserProfile.query.join(User).filter(
-            User.is_active == True
-        ).all()
-
+        clock = _ZoneClock()
         sent_count = 0
+        # Recorrido por (next_reminder_at, id): un perfil reprogramado de nuevo
+        # dentro de la ventana no se vuelve a leer ni a enviar en esta ejecución.
+        last_key = None
+        handled = set()
+
+        while True:
+            self.check_cancelled()
+            query = db.session.query(
+                UserProfile.id,
+                UserProfile.user_id,
+                UserProfile.timezone,
+                UserProfile.notification_preferences,
+                UserProfile.next_reminder_at
+            ).join(User).filter(
+                User.is_active == True,
+                UserProfile.next_reminder_at <= clock.now
+            )
+            if last_key is not None:
+                query = query.filter(tuple_(UserProfile.next_reminder_at, UserProfile.id) > last_key)
+            rows = query.order_by(
+                UserProfile.next_reminder_at, UserProfile.id
+            ).limit(DAILY_REMINDER_BATCH_SIZE).all()
+
+            if not rows:
+                break
+            last_key = (rows[-1].next_reminder_at, rows[-1].id)
+            due = [row for row in rows if row.id not in handled]
+            handled.update(row.id for row in due)
+            if not due:
+                continue
 
-        for profile in profiles:
-            try:
-                prefs = profile.notification_preferences or {}
-                if not _pref_enabled(prefs, "daily_reminder", False):
-                    continue
-
-                user_now = datetime.now(ZoneInfo(timezone_name))
-
-                reminder_time = prefs.get('reminder_time', '20:00')
-                try:
-                    reminder_parts = reminder_time.split(":")
-                    reminder_hour = int(reminder_parts[0])
-                    reminder_minute = int(reminder_parts[1]) if len(reminder_parts) > 1 else 0
-                except (ValueError, TypeError):
-                    reminder_hour, reminder_minute = 20, 0
-
-                if (user_now.hour, user_now.minute) < (reminder_hour, reminder_minute):
-                    continue
-
-                day_start = user_now.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_start_utc = day_start.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
-                day_end_utc = (day_start + timedelta(days=1)).astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
-
-                already_sent = Notification.query.filter(
-                    Notification.user_id == profile.user_id,
-                    Notification.created_at >= day_start_utc,
-                    Notification.created_at < day_end_utc,
-                    Notification.title == "Recordatorio Diario"
-                ).first()
-
-                if already_sent:
+            # Solo se envía el recordatorio de hoy (en la zona del usuario); uno
+            # vencido de un día anterior (p. ej. el scheduler estuvo detenido)
+            # solo se reprograma. Un perfil que lo desactivó sin reprogramar no recibe nada.
+            by_day = {}
+            for row in due:
+                if not pref_enabled(row.notification_preferences or {}, "daily_reminder", False):
                     continue
-
-                # Obtener gasto del día
-                today = user_now.date()
-                daily_spent = BudgetService.get_period_expenses(profile.user_id, today, today)
-
-                title = "Recordatorio Diario"
-                message = f"Hoy has gastado ${float(daily_spent):,.2f}. ¿Registraste todos tus gastos?"
-
-                send_notification_task.delay(
-                    user_id=profile.user_id,
-                    title=title,
-                    message=message,
-                    notification_type='daily_reminder',
-                    data={'daily_spent': float(daily_spent)},
-                    channels=['push', 'email', 'db']
+                user_today = clock.today(row.timezone)
+                if row.next_reminder_at.astimezone(get_zone(row.timezone)).date() == user_today:
+                    by_day.setdefault(user_today, []).append(row)
+
+            notifications = []
+            for user_today, rows in by_day.items():
+                daily_spent = BudgetService.get_period_expenses_by_user(
+                    [row.user_id for row in rows], user_today, user_today
                 )
-
-                sent_count += 1
-
-            except Exception as user_exc:
-                logger.exception(f"Error sending reminder to user {profile.user_id}: {user_exc}")
-                continue
+                for row in rows:
+                    spent = float(daily_spent.get(row.user_id, 0))
+                    notifications.append((
+                        row.user_id,
+                        "Recordatorio Diario",
+                        f"Hoy has gastado ${spent:,.2f}. ¿Registraste todos tus gastos?",
+                        {'daily_spent': spent}
+                    ))
+            sent_count += NotificationService.send_bulk(notifications, notification_type='daily_reminder')
+
+            updates = []
+            for row in due:
+                prefs = row.notification_preferences or {}
+                next_reminder_at = None
+                if pref_enabled(prefs, "daily_reminder", False):
+                    next_reminder_at = clock.next_occurrence(
+                        parse_time_of_day(prefs.get('reminder_time', '20:00')), row.timezone
+                    )
+                updates.append({'id': row.id, 'next_reminder_at': next_reminder_at})
+            db.session.bulk_update_mappings(UserProfile, updates)
+            db.session.commit()
 
         logger.info(f"Daily reminders task completed. Sent to {sent_count} users")
         return {'status': 'success', 'sent_count': sent_count}
 
     except Exception as exc:
         logger.exception(f"Error in daily reminders task: {exc}")
+        db.session.rollback()
         return {'status': 'error', 'message': str(exc)}
 
 
-@task_queue.task(name='app.tasks.periodic_tasks.check_all_budgets')
-def check_all_budgets():
+@task_queue.task(bind=True, name='app.tasks.periodic_tasks.check_all_budgets', lane='bulk', max_concurrency=1)
+def check_all_budgets(self):
     """
     Verifica umbrales de presupuesto para todos los usuarios activos.
 
     Se ejecuta: Cada 30 minutos (configurado en task_scheduler.py)
-    Envía alertas si alguien superó umbrales desde la última verificación.
+    Las alertas se disparan con cada gasto (check_budget_threshold_task sobre
+    budget_spend_counters); este job solo reconcilia los contadores con la
+    tabla de gastos y envía las alertas de cruces que no se detectaron.
     """
     logger.info("Starting budget check task")
 
     try:
-        # Obtener presupuestos activos
-        budgets = Budget.query.filter_by(is_active=True).all()
+        today = date.today()
+        corrected = BudgetService.reconcile_spend_counters(today)
 
-        alerts_sent = 0
+        # Presupuestos cuyo nivel cambió desde la última evaluación
+        alerts = BudgetService.get_threshold_alerts(today)
+        notifications = []
+        for risk_indicator in alerts:
+            user_id = risk_indicator.pop('user_id')
+            level = risk_indicator['level']
+            percentage = risk_indicator['percentage']
 
-        for budget in budgets:
-            try:
-                profile = UserProfile.query.filter_by(user_id=budget.user_id).first()
-                if not profile:
-                    continue
+            if level == 'yellow':
+                title = "Advertencia de Presupuesto"
+                message = f"Has alcanzado el {percentage:.1f}% de tu presupuesto."
+            else:  # red
+                title = "Alerta Crítica de Presupuesto"
+                message = f"Has superado el {percentage:.1f}% de tu presupuesto. ¡Atención requerida!"
 
-                prefs = profile.notification_preferences
-                if not prefs.get('threshold_alerts', True):
-                    continue
+            notifications.append((user_id, title, message, risk_indicator))
 
-                # Calcular indicador de riesgo
-                risk_indicator = BudgetService.get_risk_indicator(budget.user_id)
+        alerts_sent = NotificationService.send_bulk(notifications, notification_type='threshold_alert')
 
-                if not risk_indicator or risk_indicator['level'] in ['grey', 'green']:
-                    continue
-
-                # Verificar si ya enviamos alerta reciente (últimas 6 horas)
-                recent_alert = Notification.query.filter(
-                    Notification.user_id == budget.user_id,
-                    Notification.notification_type == 'threshold_alert',
-                    Notification.created_at >= datetime.utcnow() - timedelta(hours=6)
-                ).first()
-
-                if recent_alert:
-                    continue  # Ya enviamos alerta reciente
-
-                # Enviar alerta
-                level = risk_indicator['level']
-                percentage = risk_indicator['percentage']
-
-                if level == 'yellow':
-                    title = "Advertencia de Presupuesto"
-                    message = f"Has alcanzado el {percentage:.1f}% de tu presupuesto."
-                else:  # red
-                    title = "Alerta Crítica de Presupuesto"
-                    message = f"Has superado el {percentage:.1f}% de tu presupuesto. ¡Atención requerida!"
-
-                send_notification_task.delay(
-                    user_id=budget.user_id,
-                    title=title,
-                    message=message,
-                    notification_type='threshold_alert',
-                    data=risk_indicator,
-                    channels=['push', 'email', 'db']
-                )
-
-                alerts_sent += 1
-
-            except Exception as budget_exc:
-                logger.exception(f"Error checking budget {budget.id}: {budget_exc}")
-                continue
+        # Los niveles nuevos y sus alertas se confirman en la misma transacción
+        db.session.commit()
 
-        logger.info(f"Budget check task completed. Alerts sent: {alerts_sent}")
-        return {'status': 'success', 'alerts_sent': alerts_sent}
+        logger.info(f"Budget check task completed. Counters corrected: {corrected}, alerts sent: {alerts_sent}")
+        return {'status': 'success', 'counters_corrected': corrected, 'alerts_sent': alerts_sent}
 
     except Exception as exc:
         logger.exception(f"Error in budget check task: {exc}")
+        db.session.rollback()
         return {'status': 'error', 'message': str(exc)}
 
 
-@task_queue.task(name='app.tasks.periodic_tasks.cleanup_old_notifications')
-def cleanup_old_notifications():
+@task_queue.task(bind=True, name='app.tasks.periodic_tasks.cleanup_old_notifications', lane='bulk', max_concurrency=1)
+def cleanup_old_notifications(self):
     """
-    Limpia notificaciones antiguas leídas (más de 30 días).
+    Aplica la retención de notificaciones por lotes (NOTIFICATION_RETENTION_*):
+    leídas de más de 30 días, no leídas de más de 180 días y, por usuario, solo
+    las 500 más recientes. Cada lote es una transacción corta con una pausa
+    entre lotes; opcionalmente se archivan en notification_archive. También
+    borra, con los mismos lotes y pausas, las filas terminadas de
+    notification_outbox (NOTIFICATION_OUTBOX_RETENTION_DAYS).
 
     Se ejecuta: Diariamente a las 3 AM (configurado en task_scheduler.py)
     """
     logger.info("Starting notification cleanup task")
 
     try:
-        cutoff_date = datetime.utcnow() - timedelta(days=30)
-
-        # Eliminar notificaciones leídas antiguas
-        deleted_count = Notification.query.filter(
-            Notification.is_read == True,
-            Notification.created_at < cutoff_date
-        ).delete()
-
-        db.session.commit()
-
-        logger.info(f"Notification cleanup completed. Deleted {deleted_count} old notifications")
-        return {'status': 'success', 'deleted_count': deleted_count}
+        from flask import current_app
+
+        config = current_app.config
+        progress = {'deleted': 0, 'batches': 0}
+
+        def on_batch(batch):
+            progress['deleted'] += batch['rows']
+            progress['batches'] += 1
+            self.update_progress(progress['deleted'], None, batches=progress['batches'], rule=batch['rule'])
+
+        result = NotificationRetentionService.run(
+            read_days=config.get('NOTIFICATION_RETENTION_READ_DAYS', 30),
+            unread_days=config.get('NOTIFICATION_RETENTION_UNREAD_DAYS', 180),
+            max_per_user=config.get('NOTIFICATION_RETENTION_MAX_PER_USER', 500),
+            batch_size=config.get('NOTIFICATION_RETENTION_BATCH_SIZE', 1000),
+            pause=config.get('NOTIFICATION_RETENTION_BATCH_PAUSE', 0.2),
+            archive=config.get('NOTIFICATION_RETENTION_ARCHIVE', False),
+            check_cancelled=self.check_cancelled,
+            on_batch=on_batch
+        )
+        result['outbox_purged'] = NotificationOutboxService.purge(
+            config.get('NOTIFICATION_OUTBOX_RETENTION_DAYS', 7),
+            batch_size=config.get('NOTIFICATION_RETENTION_BATCH_SIZE', 1000),
+            pause=config.get('NOTIFICATION_RETENTION_BATCH_PAUSE', 0.2),
+            check_cancelled=self.check_cancelled
+        )
+
+        logger.info(f"Notification cleanup completed. Deleted {result['deleted']} old notifications")
+        return {'status': 'success', 'deleted_count': result['deleted'], **result}
 
     except Exception as exc:
         logger.exception(f"Error in cleanup task: {exc}")
@@ -307,109 +458,111 @@ def cleanup_old_notifications():
         return {'status': 'error', 'message': str(exc)}
 
 
-@task_queue.task(name='app.tasks.periodic_tasks.send_payment_reminders')
-def send_payment_reminders():
+@task_queue.task(bind=True, name='app.tasks.periodic_tasks.send_payment_reminders', lane='bulk', max_concurrency=1)
+def send_payment_reminders(self):
     """
     Envia recordatorios de pagos (7 dias, 3 dias y el mismo dia).
 
     Se ejecuta: Cada minuto (configurado en task_scheduler.py)
-    Filtra por hora/minuto según preferencia de cada usuario.
+    Reclama por lotes las filas vencidas de payment_reminders (fire_at indexado,
+    FOR UPDATE SKIP LOCKED), envía las que siguen dentro de su día local y las
+    elimina. El calendario se mantiene en PaymentReminderService.
     """
     logger.info("Starting payment reminders task")
 
     try:
-        timezone_name = "UTC"
-        try:
-            from flask import current_app
-            timezone_name = current_app.config.get("TASK_QUEUE_TIMEZONE", "UTC")
-        except Exception:
-            timezone_name = "UTC"
-
-        today = date.today()
-        reminder_plan = [
-            (7, "reminder_7_sent"),
-            (3, "reminder_3_sent"),
-            (0, "reminder_0_sent"),
-        ]
-
+        now = datetime.now(timezone.utc)
         sent_count = 0
-        user_now = datetime.now(ZoneInfo(timezone_name))
-
-        for days_before, flag_name in reminder_plan:
-            target_date = today + timedelta(days=days_before)
-            payments = Payment.query.filter(
-                Payment.is_paid == False,
-                Payment.due_date == target_date
+        expired_count = 0
+
+        while True:
+            self.check_cancelled()
+            claimed = db.session.query(
+                PaymentReminder.payment_id,
+                PaymentReminder.days_before,
+                (PaymentReminder.expires_at <= now).label('expired'),
+                Payment.user_id,
+                Payment.name,
+                Payment.amount,
+                Payment.due_date,
+                Payment.is_paid,
+                UserProfile.notification_preferences
+            ).join(
+                Payment, Payment.id == PaymentReminder.payment_id
+            ).outerjoin(
+                # Sin perfil se usan las preferencias por defecto (como al programarlos)
+                UserProfile, UserProfile.user_id == Payment.user_id
+            ).filter(
+                PaymentReminder.fire_at <= now
+            ).order_by(
+                PaymentReminder.fire_at
+            ).limit(PAYMENT_REMINDER_BATCH_SIZE).with_for_update(
+                skip_locked=True, of=PaymentReminder
             ).all()
 
-            for payment in payments:
-                if getattr(payment, flag_name):
-                    continue
+            if not claimed:
+                break
 
-                # Verificar preferencias del usuario
-                profile = UserProfile.query.filter_by(user_id=payment.user_id).first()
-                if not profile:
-                    continue
+            sent = {flag_name: [] for flag_name in REMINDER_OFFSETS.values()}
+            notifications = []
 
-                prefs = profile.notification_preferences or {}
+            for reminder in claimed:
+                prefs = reminder.notification_preferences or {}
 
-                # Verificar si las notificaciones de pagos están habilitadas
-                if not _pref_enabled(prefs, "payment_reminders", True):
-                    continue
-
-                # Verificar hora configurada
-                payment_reminder_time = prefs.get('payment_reminder_time', '18:00')
-                try:
-                    reminder_parts = payment_reminder_time.split(":")
-                    reminder_hour = int(reminder_parts[0])
-                    reminder_minute = int(reminder_parts[1]) if len(reminder_parts) > 1 else 0
-                except (ValueError, TypeError):
-                    reminder_hour, reminder_minute = 18, 0
-
-                # Solo enviar a la hora configurada
-                if (user_now.hour, user_now.minute) != (reminder_hour, reminder_minute):
+                # Fuera de su día local (el job estuvo detenido), pagado o desactivado: solo se descarta
+                if (reminder.expired or reminder.is_paid
+                        or not pref_enabled(prefs, "payment_reminders", True)):
+                    expired_count += 1
                     continue
 
+                days_before = reminder.days_before
                 title = "Recordatorio de pago"
                 if days_before > 0:
                     message = (
-                        f"Tu pago '{payment.name}' vence en {days_before} dias "
-                        f"({payment.due_date.isoformat()})."
+                        f"Tu pago '{reminder.name}' vence en {days_before} dias "
+                        f"({reminder.due_date.isoformat()})."
                     )
                 else:
                     message = (
-                        f"Tu pago '{payment.name}' vence hoy "
-                        f"({payment.due_date.isoformat()})."
+                        f"Tu pago '{reminder.name}' vence hoy "
+                        f"({reminder.due_date.isoformat()})."
                     )
 
-                # Determinar canales según preferencias
-                channels = ["db"]
-                if _pref_enabled(prefs, "push_enabled", True):
-                    channels.append("push")
-                if _pref_enabled(prefs, "email_enabled", True):
-                    channels.append("email")
-
-                send_notification_task.delay(
-                    user_id=payment.user_id,
-                    title=title,
-                    message=message,
-                    notification_type="payment_reminder",
-                    data={
-                        "payment_id": payment.id,
-                        "payment_name": payment.name,
-                        "amount": float(payment.amount),
-                        "due_date": payment.due_date.isoformat(),
+                # Los canales se filtran por preferencias en send_bulk
+                notifications.append((
+                    reminder.user_id,
+                    title,
+                    message,
+                    {
+                        "payment_id": reminder.payment_id,
+                        "payment_name": reminder.name,
+                        "amount": float(reminder.amount),
+                        "due_date": reminder.due_date.isoformat(),
                         "days_before": days_before,
-                    },
-                    channels=channels
+                    }
+                ))
+                sent[REMINDER_OFFSETS[days_before]].append(reminder.payment_id)
+
+            sent_count += NotificationService.send_bulk(notifications, notification_type="payment_reminder")
+
+            PaymentReminder.query.filter(
+                tuple_(PaymentReminder.payment_id, PaymentReminder.days_before).in_(
+                    [(reminder.payment_id, reminder.days_before) for reminder in claimed]
                 )
+            ).delete(synchronize_session=False)
 
-                setattr(payment, flag_name, True)
-                sent_count += 1
+            # Marcar los recordatorios enviados del lote con un único UPDATE
+            sent_ids = [payment_id for ids in sent.values() for payment_id in ids]
+            if sent_ids:
+                Payment.query.filter(Payment.id.in_(sent_ids)).update({
+                    getattr(Payment, flag_name): getattr(Payment, flag_name) | Payment.id.in_(ids)
+                    for flag_name, ids in sent.items()
+                }, synchronize_session=False)
 
-        db.session.commit()
-        logger.info(f"Payment reminders task completed. Sent: {sent_count}")
-        return {"status": "success", "sent_count": sent_count}
+            db.session.commit()
+
+        logger.info(f"Payment reminders task completed. Sent: {sent_count}, expired: {expired_count}")
+        return {"status": "success", "sent_count": sent_count, "expired_count": expired_count}
 
     except Exception as exc:
         logger.exception(f"Error in payment reminders task: {exc}")
@@ -15,8 +15,9 @@ logger = logging.getLogger(__name__)
     bind=True,
     name='app.tasks.report_tasks.generate_pdf_report_task',
     max_retries=2,
+    lane='cpu',
     time_limit=120,  # 2 minutos max para PDFs
-    soft_time_limit=100
+    soft_time_limit=100  # el lane 'cpu' corre en procesos; al vencer time_limit se recicla el worker
 )
 def generate_pdf_report_task(
     self,
@@ -51,9 +52,12 @@ def generate_pdf_report_task(
             user_id=user_id,
             report_type=report_type,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            cancel_token=self.cancel_token
         )
 
+        self.check_cancelled()
+
         filename = f"reports/{user_id}/reporte_{report_type}_{start_date_str}_{end_date_str}.pdf"
 
         if send_email and user_email:
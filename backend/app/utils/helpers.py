@@ -1,5 +1,6 @@
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta, timezone
 from decimal import Decimal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 
 def get_week_bounds(reference_date=None, closing_day=0):
@@ -69,3 +70,48 @@ def days_between(start_date, end_date):
         end_date = date.fromisoformat(end_date)
 
     return (end_date - start_date).days
+
+
+def pref_enabled(prefs, key, default=False):
+    """Read a boolean notification preference (accepts 'true', '1', 'on'...)"""
+    value = prefs.get(key, default)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in {"true", "1", "yes", "y", "on"}
+    return bool(value)
+
+
+def parse_time_of_day(value, default=(20, 0)):
+    """Parse an 'HH:MM' preference into (hour, minute)"""
+    try:
+        parts = value.split(":")
+        hour = int(parts[0])
+        minute = int(parts[1]) if len(parts) > 1 else 0
+    except (ValueError, TypeError, AttributeError):
+        return default
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return default
+    return hour, minute
+
+
+def get_zone(timezone_name):
+    """ZoneInfo for a profile/config timezone, falling back to UTC"""
+    try:
+        return ZoneInfo(timezone_name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+
+def next_local_occurrence(time_of_day, timezone_name, after=None):
+    """Next UTC datetime strictly after `after` at the given local (hour, minute)"""
+    zone = get_zone(timezone_name)
+    after = after or datetime.now(timezone.utc)
+    local_after = after.astimezone(zone)
+    hour, minute = time_of_day
+    candidate = datetime.combine(local_after.date(), time(hour, minute), tzinfo=zone)
+    # Compare in UTC: an aware comparison within one zone ignores fold, so on a
+    # DST fall-back day the candidate could land before `after`.
+    if candidate.astimezone(timezone.utc) <= after:
+        candidate = datetime.combine(local_after.date() + timedelta(days=1), time(hour, minute), tzinfo=zone)
+    return candidate.astimezone(timezone.utc)
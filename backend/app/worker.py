@@ -0,0 +1,144 @@
+"""
+Dedicated task worker - claims jobs inserted by the web tier (TASK_QUEUE_MODE=external)
+
+Usage:
+    python -m app.worker [--config production] [--batch-size 8]
+
+Each worker claims due rows from task_jobs with SELECT ... FOR UPDATE SKIP LOCKED,
+runs them on its local TaskQueue lanes and deletes them once they finish. Claimed
+rows carry a lease that the worker keeps renewing; rows whose lease expires (the
+worker died) are claimed again by another worker.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    def __init__(self, app, queue, jobs, batch_size: int, poll_interval: float, lease_seconds: float):
+        self.app = app
+        self.queue = queue
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._inflight = set()
+        self._stop = threading.Event()
+        self._last_renewal = 0.0
+
+    def stop(self, *_):
+        logger.info(f"Worker {self.worker_id} stopping")
+        self._stop.set()
+
+    def run(self, shutdown_grace: float = 30.0):
+        logger.info(f"Worker {self.worker_id} started (batch={self.batch_size})")
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                self._reap_finished()
+                claimed = self._claim()
+                self._renew_leases()
+            except Exception as exc:
+                logger.exception(f"Worker loop error: {exc}")
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+
+        deadline = time.time() + shutdown_grace
+        while self._inflight and time.time() < deadline:
+            self._reap_finished()
+            self._renew_leases()
+            time.sleep(0.2)
+        if self._inflight:
+            logger.warning(f"Releasing {len(self._inflight)} unfinished jobs")
+            for task_id in self._inflight:
+                self.queue.revoke(task_id)
+            self.jobs.release(self.worker_id, list(self._inflight))
+        self.queue.shutdown()
+
+    def _claim(self) -> int:
+        for row in self.jobs.drop_exhausted():
+            logger.error(
+                f"Job {row['id']} ({row['name']}) lost its worker {row['locked_by']} on attempt "
+                f"{row['attempts']} of {self.jobs.max_attempts}; dropping it"
+            )
+        rows = self.jobs.claim(self.worker_id, self.batch_size - len(self._inflight), self.lease_seconds)
+        unknown = []
+        for row in rows:
+            registered = self.queue.registered(row["name"])
+            if registered is None:
+                logger.error(f"Job {row['id']} references unknown task {row['name']}; dropping it")
+                unknown.append(row["id"])
+                continue
+            func, meta = registered
+            self._inflight.add(row["id"])
+            self.queue.enqueue(
+                func, meta, tuple(row["args"] or ()), dict(row["kwargs"] or {}),
+                task_id=row["id"], coalesce=False,
+            )
+        self.jobs.complete(unknown)
+        return len(rows)
+
+    def _reap_finished(self):
+        finished = [task_id for task_id in self._inflight if self.queue.AsyncResult(task_id).ready()]
+        if finished:
+            self.jobs.complete(finished)
+            self._inflight.difference_update(finished)
+
+    def _renew_leases(self):
+        if time.time() - self._last_renewal < self.lease_seconds / 3:
+            return
+        self._last_renewal = time.time()
+        self.jobs.renew(self.worker_id, list(self._inflight), self.lease_seconds)
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="UniFinanzas task worker")
+    parser.add_argument("--config", default=os.environ.get("FLASK_ENV", "development"))
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="max jobs in flight (default: total lane workers)")
+    parser.add_argument("--poll-interval", type=float, default=None)
+    parser.add_argument("--lease", type=float, default=None, help="job lease in seconds")
+    options = parser.parse_args(argv)
+
+    # Must be set before create_app so the queue runs tasks locally instead of
+    # inserting them again, and so this process owns the cron scheduler.
+    os.environ["TASK_QUEUE_WORKER_PROCESS"] = "1"
+
+    from app import create_app
+    from app.extensions import task_queue
+    from app.task_jobs import JobTable
+    import app.tasks  # noqa: F401  registers tasks by name
+    import app.tasks.periodic_tasks  # noqa: F401
+
+    flask_app = create_app(options.config)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    batch_size = options.batch_size or sum(
+        lane["workers"] for lane in task_queue.stats()["lanes"].values()
+    )
+    worker = Worker(
+        flask_app,
+        task_queue,
+        JobTable(flask_app, max_attempts=flask_app.config.get("TASK_QUEUE_JOB_MAX_ATTEMPTS", 5)),
+        batch_size=batch_size,
+        poll_interval=options.poll_interval or flask_app.config.get("TASK_QUEUE_WORKER_POLL_INTERVAL", 1.0),
+        lease_seconds=options.lease or flask_app.config.get("TASK_QUEUE_JOB_LEASE", 300),
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Add shared task result table
+
+Revision ID: 20261017_0005
+Revises: 20260102_0004
+Create Date: 2026-10-17 10:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_0005"
+down_revision = "20260102_0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "task_results",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("state", sa.String(length=20), nullable=False),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("info", sa.Text(), nullable=True),
+        sa.Column("retries", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_task_results_updated_at", "task_results", ["updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_task_results_updated_at", table_name="task_results")
+    op.drop_table("task_results")
@@ -0,0 +1,38 @@
+"""Add durable task job table
+
+Revision ID: 20261017_0006
+Revises: 20261017_0005
+Create Date: 2026-10-17 11:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_0006"
+down_revision = "20261017_0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "task_jobs",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("args", sa.JSON(), nullable=True),
+        sa.Column("kwargs", sa.JSON(), nullable=True),
+        sa.Column("state", sa.String(length=20), nullable=False, server_default="queued"),
+        sa.Column("run_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("locked_by", sa.String(length=255), nullable=True),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_task_jobs_state_run_at", "task_jobs", ["state", "run_at"])
+
+
+def downgrade():
+    op.drop_index("ix_task_jobs_state_run_at", table_name="task_jobs")
+    op.drop_table("task_jobs")
@@ -0,0 +1,34 @@
+"""Add task checkpoint table for resumable fan-out jobs
+
+Revision ID: 20261017_0007
+Revises: 20261017_0006
+Create Date: 2026-10-17 12:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_0007"
+down_revision = "20261017_0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "task_checkpoints",
+        sa.Column("run_key", sa.String(length=100), primary_key=True),
+        sa.Column("chunk_index", sa.Integer(), primary_key=True),
+        sa.Column("lower_bound", sa.String(length=36), nullable=True),
+        sa.Column("upper_bound", sa.String(length=36), nullable=True),
+        sa.Column("state", sa.String(length=20), nullable=False, server_default="pending"),
+        sa.Column("processed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("task_checkpoints")
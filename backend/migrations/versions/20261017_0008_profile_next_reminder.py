@@ -0,0 +1,77 @@
+"""Add precomputed next daily reminder time to user profiles
+
+Revision ID: 20261017_0008
+Revises: 20261017_0007
+Create Date: 2026-10-17 12:00:00
+"""
+
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_0008"
+down_revision = "20261017_0007"
+branch_labels = None
+depends_on = None
+
+
+def _next_reminder_at(prefs, timezone_name, now):
+    enabled = prefs.get("daily_reminder", False)
+    if isinstance(enabled, str):
+        enabled = enabled.strip().lower() in {"true", "1", "yes", "y", "on"}
+    if not enabled:
+        return None
+    try:
+        parts = str(prefs.get("reminder_time", "20:00")).split(":")
+        reminder = time(int(parts[0]), int(parts[1]) if len(parts) > 1 else 0)
+    except (ValueError, TypeError):
+        reminder = time(20, 0)
+    try:
+        zone = ZoneInfo(timezone_name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = ZoneInfo("UTC")
+    local_now = now.astimezone(zone)
+    candidate = datetime.combine(local_now.date(), reminder, tzinfo=zone)
+    if candidate.astimezone(timezone.utc) <= now:
+        candidate = datetime.combine(local_now.date() + timedelta(days=1), reminder, tzinfo=zone)
+    return candidate.astimezone(timezone.utc)
+
+
+def upgrade():
+    op.add_column(
+        "user_profiles",
+        sa.Column("next_reminder_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_user_profiles_next_reminder_at", "user_profiles", ["next_reminder_at"])
+
+    # Backfill para perfiles que ya tienen el recordatorio diario activado.
+    profiles = sa.table(
+        "user_profiles",
+        sa.column("id", sa.String),
+        sa.column("timezone", sa.String),
+        sa.column("notification_preferences", sa.JSON),
+        sa.column("next_reminder_at", sa.DateTime(timezone=True)),
+    )
+    bind = op.get_bind()
+    now = datetime.now(timezone.utc)
+    updates = []
+    for row in bind.execute(sa.select(profiles.c.id, profiles.c.timezone, profiles.c.notification_preferences)):
+        next_reminder_at = _next_reminder_at(row.notification_preferences or {}, row.timezone, now)
+        if next_reminder_at is not None:
+            updates.append({"profile_id": row.id, "next_reminder_at": next_reminder_at})
+    if updates:
+        bind.execute(
+            profiles.update()
+            .where(profiles.c.id == sa.bindparam("profile_id"))
+            .values(next_reminder_at=sa.bindparam("next_reminder_at")),
+            updates,
+        )
+
+
+def downgrade():
+    op.drop_index("ix_user_profiles_next_reminder_at", table_name="user_profiles")
+    op.drop_column("user_profiles", "next_reminder_at")
@@ -0,0 +1,98 @@
+"""Add payment reminder schedule table
+
+Revision ID: 20261017_0009
+Revises: 20261017_0008
+Create Date: 2026-10-17 12:00:00
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_0009"
+down_revision = "20261017_0008"
+branch_labels = None
+depends_on = None
+
+REMINDER_OFFSETS = {7: "reminder_7_sent", 3: "reminder_3_sent", 0: "reminder_0_sent"}
+
+
+def _reminder_time(prefs):
+    try:
+        parts = str(prefs.get("payment_reminder_time", "18:00")).split(":")
+        return time(int(parts[0]), int(parts[1]) if len(parts) > 1 else 0)
+    except (ValueError, TypeError):
+        return time(18, 0)
+
+
+def upgrade():
+    op.create_table(
+        "payment_reminders",
+        sa.Column("payment_id", sa.String(length=36), sa.ForeignKey("payments.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("days_before", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.String(length=36), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("fire_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_payment_reminders_fire_at", "payment_reminders", ["fire_at"])
+    op.create_index("ix_payment_reminders_user_id", "payment_reminders", ["user_id"])
+
+    # Backfill de los pagos pendientes existentes; sin perfil se usan las
+    # preferencias por defecto en UTC (como PaymentReminderService.schedule)
+    bind = op.get_bind()
+    now = datetime.now(timezone.utc)
+    rows = bind.execute(sa.text(
+        "SELECT p.id, p.user_id, p.due_date, p.reminder_7_sent, p.reminder_3_sent, p.reminder_0_sent, "
+        "up.timezone, up.notification_preferences "
+        "FROM payments p LEFT JOIN user_profiles up ON up.user_id = p.user_id "
+        "WHERE p.is_paid = false AND p.due_date >= :since"
+    ), {"since": date.today() - timedelta(days=1)}).mappings()
+
+    schedule = []
+    for row in rows:
+        prefs = row["notification_preferences"] or {}
+        enabled = prefs.get("payment_reminders", True)
+        if isinstance(enabled, str):
+            enabled = enabled.strip().lower() in {"true", "1", "yes", "y", "on"}
+        if not enabled:
+            continue
+        try:
+            zone = ZoneInfo(row["timezone"] or "UTC")
+        except (ZoneInfoNotFoundError, ValueError):
+            zone = ZoneInfo("UTC")
+        reminder_time = _reminder_time(prefs)
+        for days_before, flag_name in REMINDER_OFFSETS.items():
+            if row[flag_name]:
+                continue
+            fire_day = row["due_date"] - timedelta(days=days_before)
+            expires_at = datetime.combine(fire_day + timedelta(days=1), time(0), tzinfo=zone).astimezone(timezone.utc)
+            if expires_at <= now:
+                continue
+            schedule.append({
+                "payment_id": row["id"],
+                "days_before": days_before,
+                "user_id": row["user_id"],
+                "fire_at": datetime.combine(fire_day, reminder_time, tzinfo=zone).astimezone(timezone.utc),
+                "expires_at": expires_at,
+            })
+
+    if schedule:
+        reminders = sa.table(
+            "payment_reminders",
+            sa.column("payment_id", sa.String),
+            sa.column("days_before", sa.Integer),
+            sa.column("user_id", sa.String),
+            sa.column("fire_at", sa.DateTime(timezone=True)),
+            sa.column("expires_at", sa.DateTime(timezone=True)),
+        )
+        op.bulk_insert(reminders, schedule)
+
+
+def downgrade():
+    op.drop_index("ix_payment_reminders_user_id", table_name="payment_reminders")
+    op.drop_index("ix_payment_reminders_fire_at", table_name="payment_reminders")
+    op.drop_table("payment_reminders")
@@ -0,0 +1,62 @@
+"""Add incremental spend counters per budget period
+
+Revision ID: 20261017_0010
+Revises: 20261017_0009
+Create Date: 2026-10-17 12:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_0010"
+down_revision = "20261017_0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "budget_spend_counters",
+        sa.Column("budget_id", sa.String(length=36), sa.ForeignKey("budgets.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("user_id", sa.String(length=36), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("spent", sa.Numeric(12, 2), nullable=False, server_default="0"),
+        sa.Column("level", sa.String(length=10), nullable=False, server_default="green"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_budget_spend_counters_user_id", "budget_spend_counters", ["user_id"])
+
+    # Backfill de los presupuestos vigentes con su nivel actual, para no
+    # disparar alertas de cruces que ya ocurrieron antes del despliegue.
+    op.execute(
+        """
+        INSERT INTO budget_spend_counters (budget_id, user_id, spent, level, updated_at)
+        SELECT totals.budget_id, totals.user_id, totals.spent,
+               CASE
+                   WHEN totals.spent * 100 / totals.total_amount
+                        >= COALESCE((up.risk_thresholds ->> 'red')::float, 85) THEN 'red'
+                   WHEN totals.spent * 100 / totals.total_amount
+                        >= COALESCE((up.risk_thresholds ->> 'yellow')::float, 60) THEN 'yellow'
+                   ELSE 'green'
+               END,
+               now()
+        FROM (
+            SELECT b.id AS budget_id, b.user_id, b.total_amount, COALESCE(SUM(e.amount), 0) AS spent
+            FROM budgets b
+            LEFT JOIN expenses e
+                ON e.user_id = b.user_id
+               AND e.is_deleted = false
+               AND e.expense_date BETWEEN b.period_start AND b.period_end
+            WHERE b.is_active = true
+              AND CURRENT_DATE BETWEEN b.period_start AND b.period_end
+            GROUP BY b.id, b.user_id, b.total_amount
+        ) totals
+        LEFT JOIN user_profiles up ON up.user_id = totals.user_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("ix_budget_spend_counters_user_id", table_name="budget_spend_counters")
+    op.drop_table("budget_spend_counters")
@@ -0,0 +1,38 @@
+"""Add notification archive table and created_at index for retention
+
+Revision ID: 20261017_0011
+Revises: 20261017_0010
+Create Date: 2026-10-17 12:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_0011"
+down_revision = "20261017_0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notification_archive",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("user_id", sa.String(length=36), nullable=False),
+        sa.Column("notification_type", sa.String(length=50), nullable=False),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("is_read", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_notification_archive_user_id", "notification_archive", ["user_id"])
+    # Per-user cap keeps the newest N rows per user
+    op.create_index("ix_notifications_user_id_created_at", "notifications", ["user_id", "created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_notifications_user_id_created_at", table_name="notifications")
+    op.drop_index("ix_notification_archive_user_id", table_name="notification_archive")
+    op.drop_table("notification_archive")
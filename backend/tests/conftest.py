@@ -1,6 +1,8 @@
 import pytest
+from sqlalchemy.orm import scoped_session, sessionmaker
+
 from app import create_app
-from app.extensions import db as _db
+from app.extensions import db as _db, limiter
 
 @pytest.fixture(scope='session')
 def app():
@@ -22,20 +24,64 @@ def session(db):
     connection = db.engine.connect()
     transaction = connection.begin()
 
-    options = dict(bind=connection, binds={})
-    session = db.create_scoped_session(options=options)
+    # Commits and rollbacks in the code under test only release a savepoint;
+    # everything is undone with the outer transaction.
+    session = scoped_session(sessionmaker(bind=connection, join_transaction_mode='create_savepoint'))
 
+    app_session = db.session
     db.session = session
 
     yield session
 
+    session.remove()
+    db.session = app_session
     transaction.rollback()
     connection.close()
-    session.remove()
+
+@pytest.fixture
+def make_user(session):
+    """Factory for an active user, with a profile unless profile=False."""
+    from app.models import User, UserProfile
+
+    def make(email, profile=True, **profile_fields):
+        user = User(email=email)
+        user.set_password('Test1234!')
+        session.add(user)
+        session.flush()
+        if profile:
+            session.add(UserProfile(user_id=user.id, **profile_fields))
+            session.flush()
+        return user
+
+    return make
+
+@pytest.fixture
+def no_outbox_delivery(monkeypatch):
+    """Keep commits from starting an outbox delivery run in the background."""
+    from app.tasks.notification_tasks import deliver_notification_outbox
+    monkeypatch.setattr(deliver_notification_outbox, 'delay', lambda *args, **kwargs: None)
+
+@pytest.fixture
+def no_threshold_checks(monkeypatch):
+    """Keep expense changes from starting a threshold check in the background."""
+    from app.tasks.notification_tasks import check_budget_threshold_task
+    monkeypatch.setattr(check_budget_threshold_task, 'delay', lambda *args, **kwargs: None)
+
+@pytest.fixture
+def run_task():
+    """Run a bound task inline, without retries."""
+    from app.task_queue import TaskContext
+
+    def run(task, *args, **kwargs):
+        context = TaskContext(task_id='test', max_retries=0, default_retry_delay=0, retries=0)
+        return task(context, *args, **kwargs)
+
+    return run
 
 @pytest.fixture
 def client(app):
-    """Create test client."""
+    """Create test client with fresh rate limits."""
+    limiter.reset()
     return app.test_client()
 
 @pytest.fixture
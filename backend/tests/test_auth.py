@@ -1,5 +1,5 @@
 import pytest
-from app.models import User
+from app.models import User, Notification, NotificationOutbox
 
 def test_register_success(client, session):
     """Test successful user registration."""
@@ -14,6 +14,20 @@ def test_register_success(client, session):
     assert 'refresh_token' in data
     assert data['user']['email'] == 'newuser@test.com'
 
+def test_register_stages_welcome_notification_in_outbox(client, session):
+    """Test registration commits the welcome notification and its email outbox row."""
+    response = client.post('/api/v1/auth/register', json={
+        'email': 'welcome@test.com',
+        'password': 'Test1234!'
+    })
+
+    assert response.status_code == 201
+    user_id = response.get_json()['user']['id']
+    notification = Notification.query.filter_by(user_id=user_id).one()
+    outbox = NotificationOutbox.query.filter_by(user_id=user_id).all()
+    assert [row.channel for row in outbox] == ['email']
+    assert outbox[0].notification_id == notification.id
+
 def test_register_duplicate_email(client, session):
     """Test registration with duplicate email."""
     # First registration
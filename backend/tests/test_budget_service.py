@@ -0,0 +1,162 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app.models import Budget, BudgetSpendCounter, Category, Expense
+from app.services.budget_service import BudgetService
+
+
+def add_category(session, user, name, icon='tag'):
+    category = Category(user_id=user.id, name=name, icon=icon)
+    session.add(category)
+    session.flush()
+    return category
+
+
+def add_expense(session, user, category, amount, expense_date, is_deleted=False):
+    session.add(Expense(
+        user_id=user.id,
+        category_id=category.id,
+        amount=Decimal(amount),
+        expense_date=expense_date,
+        is_deleted=is_deleted
+    ))
+    session.flush()
+
+
+def add_budget(session, user, amount, period_start, period_end, is_active=True):
+    budget = Budget(user_id=user.id, total_amount=Decimal(amount), period_start=period_start,
+                    period_end=period_end, is_active=is_active)
+    session.add(budget)
+    session.flush()
+    return budget
+
+
+def per_user_summary(user_id, start_date, end_date):
+    """The per-user queries get_period_summaries replaces."""
+    by_category = BudgetService.get_expenses_by_category(user_id, start_date, end_date)
+    budget = BudgetService.get_current_budget(user_id)
+    return {
+        'total_spent': float(BudgetService.get_period_expenses(user_id, start_date, end_date)),
+        'budget': float(budget.total_amount) if budget else None,
+        'top_categories': [
+            {'name': cat['name'], 'icon': cat['icon'], 'total': cat['total']}
+            for cat in sorted(by_category, key=lambda x: x['total'], reverse=True)
+            if cat['total'] > 0
+        ][:3]
+    }
+
+
+def test_period_summaries_match_per_user_queries(session, make_user):
+    """Test the aggregated summaries equal the per-user totals, top categories and budgets."""
+    today = date.today()
+    start, end = today - timedelta(days=6), today
+
+    spender = make_user('summary-spender@test.com')
+    categories = [add_category(session, spender, name, icon) for name, icon in (
+        ('Comida', 'food'), ('Transporte', 'bus'), ('Ocio', 'game'), ('Salud', 'pill')
+    )]
+    for category, amount in zip(categories, ('40.00', '25.50', '12.25', '3.00')):
+        add_expense(session, spender, category, amount, today)
+    add_expense(session, spender, categories[0], '15.00', today - timedelta(days=1))
+    add_expense(session, spender, categories[3], '99.00', today - timedelta(days=10))
+    add_expense(session, spender, categories[2], '50.00', today, is_deleted=True)
+    add_budget(session, spender, '200.00', start, today + timedelta(days=1))
+
+    budget_only = make_user('summary-budget@test.com')
+    add_budget(session, budget_only, '80.00', start, today)
+    add_budget(session, budget_only, '500.00', start - timedelta(days=30), start - timedelta(days=1))
+
+    no_budget = make_user('summary-nobudget@test.com')
+    add_expense(session, no_budget, add_category(session, no_budget, 'Casa'), '7.75', today)
+
+    idle = make_user('summary-idle@test.com')
+
+    user_ids = [spender.id, budget_only.id, no_budget.id, idle.id]
+    summaries = BudgetService.get_period_summaries(user_ids, start, end)
+
+    assert summaries == {user_id: per_user_summary(user_id, start, end) for user_id in user_ids}
+    assert summaries[spender.id]['total_spent'] == 95.75
+    assert [cat['name'] for cat in summaries[spender.id]['top_categories']] == ['Comida', 'Transporte', 'Ocio']
+    assert summaries[budget_only.id] == {'total_spent': 0.0, 'budget': 80.0, 'top_categories': []}
+    assert summaries[no_budget.id]['budget'] is None
+    assert summaries[idle.id] == {'total_spent': 0.0, 'budget': None, 'top_categories': []}
+
+
+def test_period_summaries_without_users(session):
+    """Test an empty user list runs no query."""
+    assert BudgetService.get_period_summaries([], date.today(), date.today()) == {}
+
+
+def current_week():
+    today = date.today()
+    return today - timedelta(days=today.weekday()), today - timedelta(days=today.weekday()) + timedelta(days=6)
+
+
+def test_reconcile_spend_counters_matches_expense_sums(session, make_user):
+    """Test counters are created or corrected to the per-budget expense sums."""
+    today = date.today()
+    start, end = current_week()
+    budgets = {}
+    for name, spent, counter in (('fresh', '50.00', None), ('idle', None, None),
+                                 ('synced', '10.00', '10.00'), ('drifted', '5.00', '99.00')):
+        user = make_user(f'reconcile-{name}@test.com')
+        category = add_category(session, user, 'Comida')
+        budgets[name] = add_budget(session, user, '100.00', start, end)
+        if spent:
+            add_expense(session, user, category, spent, today)
+        add_expense(session, user, category, '40.00', today, is_deleted=True)
+        add_expense(session, user, category, '40.00', start - timedelta(days=1))
+        if counter:
+            session.add(BudgetSpendCounter(budget_id=budgets[name].id, user_id=user.id, spent=Decimal(counter)))
+    inactive = make_user('reconcile-inactive@test.com')
+    add_budget(session, inactive, '100.00', start, end, is_active=False)
+    session.flush()
+
+    corrected = BudgetService.reconcile_spend_counters(today)
+
+    assert corrected == 3
+    session.expire_all()
+    counters = {counter.budget_id: counter.spent for counter in BudgetSpendCounter.query.all()}
+    assert counters == {
+        budget.id: BudgetService.get_period_expenses(budget.user_id, budget.period_start, budget.period_end)
+        for budget in budgets.values()
+    }
+    assert BudgetService.reconcile_spend_counters(today) == 0
+
+
+def test_threshold_alerts_match_per_user_evaluation(session, make_user):
+    """Test the one-query evaluation stores new levels and alerts like the per-user path."""
+    today = date.today()
+    start, end = current_week()
+    cases = {
+        # name: (spent, stored level, profile fields)
+        'to-yellow': ('70.00', 'green', {}),
+        'to-red': ('55.00', 'yellow', {'risk_thresholds': {'yellow': 30, 'red': 50}}),
+        'muted': ('90.00', 'green', {'notification_preferences': {'threshold_alerts': False}}),
+        'recovered': ('10.00', 'yellow', {}),
+        'unchanged': ('20.00', 'green', {}),
+        'no-profile': ('90.00', 'yellow', {'profile': False}),
+    }
+    users = {}
+    for name, (spent, _, profile_fields) in cases.items():
+        user = users[name] = make_user(f'threshold-{name}@test.com', **profile_fields)
+        add_expense(session, user, add_category(session, user, 'Comida'), spent, today)
+        add_budget(session, user, '100.00', start, end)
+    BudgetService.reconcile_spend_counters(today)
+    for name, (_, level, _) in cases.items():
+        BudgetSpendCounter.query.filter_by(user_id=users[name].id).one().level = level
+    session.flush()
+
+    alerts = BudgetService.get_threshold_alerts(today)
+
+    assert sorted(alerts, key=lambda alert: (alert['level'], alert['user_id'])) == sorted(
+        ({'user_id': users[name].id, **BudgetService.get_risk_indicator(users[name].id)}
+         for name in ('to-red', 'to-yellow', 'no-profile')),
+        key=lambda alert: (alert['level'], alert['user_id'])
+    )
+    session.flush()
+    session.expire_all()
+    levels = {counter.user_id: counter.level for counter in BudgetSpendCounter.query.all()}
+    assert levels == {users[name].id: BudgetService.get_risk_indicator(users[name].id)['level'] for name in cases}
+    for user in users.values():
+        assert BudgetService.evaluate_threshold(user.id, today) == (BudgetService.get_risk_indicator(user.id), False)
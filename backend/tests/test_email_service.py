@@ -0,0 +1,162 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.email_service import EmailService
+from app.task_metrics import provider_metrics
+
+
+class StubBrevo(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubBrevoHandler)
+        self.requests = []
+        self.status = 201
+        self.invalid = set()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/v3/smtp/email'
+
+
+class StubBrevoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        payload = json.loads(body)
+        self.server.requests.append({
+            'client': self.client_address,
+            'api_key': self.headers['api-key'],
+            'payload': payload,
+        })
+        recipients = [version['to'][0]['email'] for version in payload.get('messageVersions', [])]
+        status = self.server.status
+        if self.server.invalid.intersection(recipients):
+            # Brevo refuses the whole request over a single bad recipient
+            status = 400
+        response = b'{"messageId": "stub"}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def brevo():
+    server = StubBrevo()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_service(brevo, **kwargs):
+    return EmailService(
+        api_key='test-key',
+        from_email='noreply@test.com',
+        from_name='Test',
+        api_url=brevo.url,
+        **kwargs
+    )
+
+
+def test_send_email_reuses_connection_without_text_copy(brevo):
+    """Test consecutive sends share one keep-alive connection and skip textContent."""
+    assert make_service(brevo).send_email('a@test.com', 'Hola', '<p>uno</p>')
+    assert make_service(brevo).send_email('b@test.com', 'Hola', '<p>dos</p>', 'dos')
+
+    first, second = brevo.requests
+    assert first['client'] == second['client']
+    assert first['api_key'] == 'test-key'
+    assert 'textContent' not in first['payload']
+    assert second['payload']['textContent'] == 'dos'
+
+
+def test_send_batch_uses_message_versions(brevo):
+    """Test a batch goes out as messageVersions, batch_size messages per request."""
+    messages = [
+        {'to': f'user{i}@test.com', 'subject': 'Resumen', 'html_content': '<p>base</p>' if i < 3 else f'<p>{i}</p>'}
+        for i in range(5)
+    ]
+
+    assert make_service(brevo, batch_size=4).send_batch(messages) == [True] * 5
+
+    assert len(brevo.requests) == 2
+    payload = brevo.requests[0]['payload']
+    assert payload['subject'] == 'Resumen'
+    assert payload['htmlContent'] == '<p>base</p>'
+    assert [version['to'][0]['email'] for version in payload['messageVersions']] == [
+        'user0@test.com', 'user1@test.com', 'user2@test.com', 'user3@test.com'
+    ]
+    assert 'htmlContent' not in payload['messageVersions'][1]
+    assert payload['messageVersions'][3]['htmlContent'] == '<p>3</p>'
+    assert len(brevo.requests[1]['payload']['messageVersions']) == 1
+
+
+def test_send_batch_shares_text_content_only_when_identical(brevo):
+    """Test a version without a text body never inherits another recipient's textContent."""
+    same = [{'to': f'same{i}@test.com', 'subject': 'S', 'html_content': '<p>x</p>', 'text_content': 'x'}
+            for i in range(2)]
+    mixed = [
+        {'to': 'first@test.com', 'subject': 'S', 'html_content': '<p>1</p>', 'text_content': 'solo para first'},
+        {'to': 'second@test.com', 'subject': 'S', 'html_content': '<p>2</p>'},
+        {'to': 'third@test.com', 'subject': 'S', 'html_content': '<p>3</p>', 'text_content': 'tres'},
+    ]
+
+    service = make_service(brevo)
+    assert service.send_batch(same) == [True] * 2
+    assert service.send_batch(mixed) == [True] * 3
+
+    shared, separate = (request['payload'] for request in brevo.requests)
+    assert shared['textContent'] == 'x'
+    assert all('textContent' not in version for version in shared['messageVersions'])
+    assert 'textContent' not in separate
+    assert [version.get('textContent') for version in separate['messageVersions']] == [
+        'solo para first', None, 'tres'
+    ]
+
+
+def test_send_batch_failure_marks_chunk_and_records_metrics(brevo):
+    """Test a request failing on the provider side fails all of its messages and is counted in the metrics."""
+    before = provider_metrics.snapshot().get('brevo', {'failure': 0, 'recipients': 0})
+    brevo.status = 500
+
+    messages = [{'to': f'user{i}@test.com', 'subject': 'S', 'html_content': '<p>x</p>'} for i in range(3)]
+    assert make_service(brevo).send_batch(messages) == [False, False, False]
+
+    after = provider_metrics.snapshot()['brevo']
+    assert after['failure'] == before['failure'] + 1
+    assert after['recipients'] == before['recipients'] + 3
+    assert after['request_seconds']['count'] >= 1
+
+
+def test_send_batch_isolates_recipients_rejected_with_4xx(brevo):
+    """Test a batch refused over one bad address is split so only that message fails."""
+    brevo.invalid = {'user5@test.com'}
+    messages = [{'to': f'user{i}@test.com', 'subject': 'S', 'html_content': '<p>x</p>'} for i in range(8)]
+
+    assert make_service(brevo).send_batch(messages) == [True] * 5 + [False] + [True] * 2
+
+    batches = [
+        [version['to'][0]['email'] for version in request['payload']['messageVersions']]
+        for request in brevo.requests
+    ]
+    delivered = [email for batch in batches if 'user5@test.com' not in batch for email in batch]
+    assert sorted(delivered) == sorted(f'user{i}@test.com' for i in range(8) if i != 5)
+    assert len(brevo.requests) == 7
+
+
+def test_send_batch_does_not_split_on_rate_limit(brevo):
+    """Test an account-wide 4xx (rate limit) fails the batch without extra requests."""
+    brevo.status = 429
+    messages = [{'to': f'user{i}@test.com', 'subject': 'S', 'html_content': '<p>x</p>'} for i in range(4)]
+
+    assert make_service(brevo).send_batch(messages) == [False] * 4
+    assert len(brevo.requests) == 1
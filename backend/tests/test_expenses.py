@@ -1,6 +1,8 @@
 import pytest
 from decimal import Decimal
 
+pytestmark = pytest.mark.usefixtures('no_threshold_checks')
+
 def create_test_user(client):
     """Helper to create and login test user."""
     response = client.post('/api/v1/auth/register', json={
@@ -97,3 +99,40 @@ def test_delete_expense_requires_reason(client, session):
 
     assert response.status_code == 400
     assert 'reason' in response.get_json()['error'].lower()
+
+def test_expense_changes_update_budget_counter(client, session):
+    """Test creating and deleting expenses applies deltas to the budget spend counter."""
+    from app.models import BudgetSpendCounter
+
+    token, user_id = create_test_user(client)
+
+    # Get categories
+    cat_response = client.get('/api/v1/categories', headers=get_auth_header(token))
+    categories = cat_response.get_json()['categories']
+
+    budget_response = client.post('/api/v1/budgets',
+        headers=get_auth_header(token),
+        json={'total_amount': 100}
+    )
+    budget_id = budget_response.get_json()['budget']['id']
+
+    create_response = client.post('/api/v1/expenses',
+        headers=get_auth_header(token),
+        json={
+            'amount': 70,
+            'category_id': categories[0]['id']
+        }
+    )
+    expense_id = create_response.get_json()['expense']['id']
+
+    counter = session.get(BudgetSpendCounter, budget_id)
+    assert counter.spent == Decimal('70.00')
+
+    client.delete(f'/api/v1/expenses/{expense_id}',
+        headers=get_auth_header(token),
+        json={'reason': 'Duplicado'}
+    )
+
+    # Each request closes the session it used; read the counter again
+    counter = session.get(BudgetSpendCounter, budget_id)
+    assert counter.spent == Decimal('0.00')
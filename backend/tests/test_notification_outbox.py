@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.models import Notification, NotificationOutbox
+from app.services.notification_outbox_service import NotificationOutboxService
+
+pytestmark = pytest.mark.usefixtures('no_outbox_delivery')
+
+NOW = datetime(2026, 3, 10, 15, 0, tzinfo=timezone.utc)
+
+
+def add_row(session, user, status='pending', attempts=0, next_attempt_at=NOW, channel='push', **fields):
+    row = NotificationOutbox(
+        user_id=user.id,
+        channel=channel,
+        notification_type='general',
+        title='Aviso',
+        message='Mensaje',
+        status=status,
+        attempts=attempts,
+        next_attempt_at=next_attempt_at,
+        **fields
+    )
+    session.add(row)
+    session.flush()
+    return row
+
+
+def add_notification(session, user, sent_via='none'):
+    notification = Notification(
+        user_id=user.id, title='Aviso', message='Mensaje', notification_type='general', sent_via=sent_via
+    )
+    session.add(notification)
+    session.flush()
+    return notification
+
+
+def claimed_row(row, notification=None):
+    return {'id': row.id, 'notification_id': notification.id if notification else None,
+            'channel': row.channel, 'attempts': row.attempts}
+
+
+def test_claim_leases_due_rows_oldest_first(session, make_user):
+    """Test claim leases due pending rows, counts the attempt and skips the rest."""
+    user = make_user('outbox-claim@test.com')
+    newer = add_row(session, user, next_attempt_at=NOW - timedelta(minutes=1))
+    older = add_row(session, user, next_attempt_at=NOW - timedelta(minutes=2), attempts=1)
+    future = add_row(session, user, next_attempt_at=NOW + timedelta(hours=1))
+    sent = add_row(session, user, status='sent', next_attempt_at=NOW - timedelta(hours=1))
+
+    first = NotificationOutboxService.claim(limit=1, lease_seconds=60, now=NOW)
+    second = NotificationOutboxService.claim(limit=10, lease_seconds=60, now=NOW)
+
+    assert [(row['id'], row['attempts']) for row in first] == [(older.id, 2)]
+    assert [(row['id'], row['attempts']) for row in second] == [(newer.id, 1)]
+    assert NotificationOutboxService.claim(limit=10, lease_seconds=60, now=NOW) == []
+
+    session.expire_all()
+    for row in (newer, older):
+        assert (row.status, row.locked_until) == ('sending', NOW + timedelta(seconds=60))
+    assert (future.status, future.attempts) == ('pending', 0)
+    assert (sent.status, sent.attempts) == ('sent', 0)
+
+
+def test_record_stores_outcomes_with_backoff(session, make_user):
+    """Test sent, skipped, retried and failed outcomes are stored as one batch."""
+    user = make_user('outbox-record@test.com')
+    notification = add_notification(session, user)
+    delivered = add_row(session, user, status='sending', attempts=1, notification=notification)
+    opted_out = add_row(session, user, status='sending', attempts=1, channel='email')
+    retried = add_row(session, user, status='sending', attempts=2)
+    exhausted = add_row(session, user, status='sending', attempts=3)
+
+    counts = NotificationOutboxService.record([
+        (claimed_row(delivered, notification), 'sent', None),
+        (claimed_row(opted_out), 'skipped', 'user opted out'),
+        (claimed_row(retried), 'failed', 'timeout'),
+        (claimed_row(exhausted), 'failed', 'timeout'),
+    ], max_attempts=3, retry_delay=10, now=NOW)
+
+    assert counts == {'sent': 1, 'skipped': 1, 'retry': 1, 'failed': 1}
+    session.expire_all()
+    assert (delivered.status, delivered.sent_at, delivered.locked_until) == ('sent', NOW, None)
+    assert (opted_out.status, opted_out.last_error) == ('skipped', 'user opted out')
+    assert (retried.status, retried.next_attempt_at, retried.last_error) == (
+        'pending', NOW + timedelta(seconds=20), 'timeout'
+    )
+    assert (exhausted.status, exhausted.last_error) == ('failed', 'timeout')
+    assert (notification.sent_via, notification.sent_at) == ('push', NOW)
+
+
+def test_record_folds_channels_into_sent_via(session, make_user):
+    """Test channels delivered in separate batches or together add up to 'both'."""
+    user = make_user('outbox-sent-via@test.com')
+    email_first = add_notification(session, user, sent_via='email')
+    together = add_notification(session, user)
+    late_push = add_row(session, user, status='sending', attempts=1, notification=email_first)
+    push = add_row(session, user, status='sending', attempts=1, notification=together)
+    email = add_row(session, user, status='sending', attempts=1, channel='email', notification=together)
+
+    NotificationOutboxService.record([
+        (claimed_row(late_push, email_first), 'sent', None),
+        (claimed_row(push, together), 'sent', None),
+        (claimed_row(email, together), 'sent', None),
+    ], max_attempts=3, retry_delay=10, now=NOW)
+
+    session.expire_all()
+    assert email_first.sent_via == 'both'
+    assert together.sent_via == 'both'
+
+
+def test_expire_stale_releases_or_fails_expired_leases(session, make_user):
+    """Test an expired lease goes back to pending unless it used up its attempts."""
+    user = make_user('outbox-stale@test.com')
+    released = add_row(session, user, status='sending', attempts=1, locked_until=NOW - timedelta(seconds=1))
+    exhausted = add_row(session, user, status='sending', attempts=3, locked_until=NOW - timedelta(seconds=1))
+    leased = add_row(session, user, status='sending', attempts=1, locked_until=NOW + timedelta(seconds=30))
+
+    assert NotificationOutboxService.expire_stale(max_attempts=3, now=NOW) == 2
+
+    session.expire_all()
+    assert (released.status, released.next_attempt_at, released.locked_until) == ('pending', NOW, None)
+    assert (exhausted.status, exhausted.last_error) == ('failed', 'lease expired mid-delivery')
+    assert (leased.status, leased.locked_until) == ('sending', NOW + timedelta(seconds=30))
+    assert [row['id'] for row in NotificationOutboxService.claim(limit=10, lease_seconds=60, now=NOW)] == [released.id]
+
+
+def test_purge_deletes_finished_rows_in_batches(session, make_user):
+    """Test only old finished rows are purged, batch_size rows per commit."""
+    user = make_user('outbox-purge@test.com')
+    old = datetime.now(timezone.utc) - timedelta(days=10)
+    for status in ('sent', 'sent', 'skipped', 'failed', 'failed'):
+        add_row(session, user, status=status, created_at=old)
+    pending_id = add_row(session, user, created_at=old).id
+    recent_id = add_row(session, user, status='sent').id
+    checks = []
+
+    purged = NotificationOutboxService.purge(7, batch_size=2, pause=0, check_cancelled=lambda: checks.append(1))
+
+    assert purged == 5
+    assert len(checks) == 3
+    assert sorted(row.id for row in NotificationOutbox.query.all()) == sorted([pending_id, recent_id])
+
+
+def test_default_next_attempt_is_due_in_any_database_timezone(session, make_user):
+    """Test a row staged with the default next_attempt_at is claimable right away."""
+    session.execute(text("SET LOCAL TimeZone = 'America/Lima'"))
+    user = make_user('outbox-timezone@test.com')
+    [row] = NotificationOutboxService.add(user.id, 'Aviso', 'Mensaje', 'general', None, ['push'])
+    session.flush()
+
+    claimed = NotificationOutboxService.claim(limit=10, lease_seconds=60, now=datetime.now(timezone.utc))
+
+    assert [claim['id'] for claim in claimed] == [row.id]
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from app.models import Notification, NotificationArchive
+from app.services.notification_retention_service import NotificationRetentionService
+
+
+def add_notification(session, user, days_old, is_read=False, title='Aviso'):
+    notification = Notification(
+        user_id=user.id,
+        title=title,
+        message='Mensaje',
+        notification_type='general',
+        is_read=is_read,
+        created_at=datetime.utcnow() - timedelta(days=days_old)
+    )
+    session.add(notification)
+    session.flush()
+    return notification
+
+
+def remaining_titles(user):
+    return sorted(n.title for n in Notification.query.filter_by(user_id=user.id))
+
+
+def test_retention_applies_read_and_unread_age_rules(session, make_user):
+    """Test read and unread notifications are pruned by their own age limit."""
+    user = make_user('retention-age@test.com')
+    add_notification(session, user, 40, is_read=True, title='read-old')
+    add_notification(session, user, 10, is_read=True, title='read-new')
+    add_notification(session, user, 40, title='unread-mid')
+    add_notification(session, user, 200, title='unread-old')
+
+    result = NotificationRetentionService.run(read_days=30, unread_days=180, max_per_user=0, pause=0)
+
+    assert result['deleted'] == 2
+    assert {rule: stats['rows'] for rule, stats in result['rules'].items()} == {'read': 1, 'unread': 1}
+    assert remaining_titles(user) == ['read-new', 'unread-mid']
+
+
+def test_retention_cap_keeps_newest_per_user(session, make_user):
+    """Test only the newest max_per_user notifications of each user survive."""
+    busy = make_user('retention-busy@test.com')
+    for days_old in range(5):
+        add_notification(session, busy, days_old, title=f'day-{days_old}')
+    quiet = make_user('retention-quiet@test.com')
+    add_notification(session, quiet, 3, title='only')
+
+    result = NotificationRetentionService.run(read_days=0, unread_days=0, max_per_user=2, batch_size=2, pause=0)
+
+    assert result['rules'] == {'per_user_cap': {**result['rules']['per_user_cap'], 'rows': 3, 'batches': 2}}
+    assert remaining_titles(busy) == ['day-0', 'day-1']
+    assert remaining_titles(quiet) == ['only']
+
+
+def test_retention_archives_before_deleting(session, make_user):
+    """Test archive mode copies each pruned row to notification_archive."""
+    user = make_user('retention-archive@test.com')
+    pruned_id = add_notification(session, user, 40, is_read=True, title='archived').id
+    add_notification(session, user, 1, is_read=True, title='kept')
+
+    NotificationRetentionService.run(read_days=30, unread_days=0, max_per_user=0, pause=0, archive=True)
+
+    [archived] = NotificationArchive.query.all()
+    assert (archived.id, archived.user_id, archived.title, archived.is_read) == (pruned_id, user.id, 'archived', True)
+    assert archived.archived_at is not None
+    assert remaining_titles(user) == ['kept']
+
+
+def test_retention_deletes_in_batches(session, make_user):
+    """Test each batch holds at most batch_size rows and checks for cancellation."""
+    user = make_user('retention-batches@test.com')
+    for _ in range(5):
+        add_notification(session, user, 40, is_read=True)
+    batches = []
+    checks = []
+
+    result = NotificationRetentionService.run(
+        read_days=30, unread_days=0, max_per_user=0, batch_size=2, pause=0,
+        check_cancelled=lambda: checks.append(1), on_batch=batches.append
+    )
+
+    assert [batch['rows'] for batch in batches] == [2, 2, 1]
+    assert len(checks) == 3
+    assert result['rules']['read']['batches'] == 3
+    assert Notification.query.filter_by(user_id=user.id).count() == 0
@@ -0,0 +1,109 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from app.models import Notification, NotificationOutbox
+from app.services.notification_outbox_service import NotificationOutboxService
+from app.services.notification_service import NotificationService
+
+
+def snapshot(user_ids):
+    """Notification and outbox rows of each user, without generated ids."""
+    rows = {}
+    for user_id in user_ids:
+        notification = Notification.query.filter_by(user_id=user_id).one_or_none()
+        outbox = sorted(
+            (row.channel, row.notification_type, row.title, row.message, row.data, row.status, row.attempts,
+             notification is not None and row.notification_id == notification.id)
+            for row in NotificationOutbox.query.filter_by(user_id=user_id)
+        )
+        rows[user_id] = (
+            notification and (notification.notification_type, notification.title, notification.message,
+                              notification.data, notification.is_read, notification.sent_via),
+            outbox
+        )
+    return rows
+
+
+def test_send_bulk_stages_the_same_rows_as_enqueue(session, make_user):
+    """Test the bulk insert matches one enqueue per user for users with every channel on."""
+    users = [make_user(f'bulk-same{i}@test.com', fcm_token=f'token-{i}') for i in range(3)]
+    items = [(user.id, f'Hola {i}', f'Mensaje {i}', {'index': i}) for i, user in enumerate(users)]
+    user_ids = [user.id for user in users]
+
+    savepoint = session.begin_nested()
+    for user_id, title, message, data in items:
+        NotificationService.enqueue(user_id, title, message, 'payment_reminder', data)
+    session.flush()
+    expected = snapshot(user_ids)
+    savepoint.rollback()
+
+    assert NotificationService.send_bulk(items, notification_type='payment_reminder', batch_size=2) == 3
+    session.flush()
+
+    assert snapshot(user_ids) == expected
+    assert all(len(outbox) == 2 for _, outbox in expected.values())
+
+
+def test_send_bulk_drops_unknown_users_and_disabled_channels(session, make_user):
+    """Test only channels with a destination the user allows get an outbox row."""
+    push_off = make_user('bulk-push-off@test.com', fcm_token='token-a',
+                         notification_preferences={'push_enabled': False})
+    no_token = make_user('bulk-no-token@test.com')
+    summary_off = make_user('bulk-summary-off@test.com', fcm_token='token-b',
+                            notification_preferences={'weekly_summary': False})
+    no_profile = make_user('bulk-no-profile@test.com', profile=False)
+    unknown = str(uuid.uuid4())
+
+    user_ids = [push_off.id, no_token.id, summary_off.id, no_profile.id]
+
+    staged = NotificationService.send_bulk(
+        [(user_id, 'Resumen', 'Detalle', None) for user_id in user_ids + [unknown]],
+        notification_type='weekly_summary'
+    )
+    session.flush()
+
+    assert staged == 4
+    channels = {
+        user_id: [channel for channel, *_ in outbox]
+        for user_id, (_, outbox) in snapshot(user_ids).items()
+    }
+    assert channels == {push_off.id: ['email'], no_token.id: ['email'], summary_off.id: [], no_profile.id: ['email']}
+    assert Notification.query.filter_by(user_id=unknown).count() == 0
+    assert Notification.query.filter_by(user_id=summary_off.id).count() == 1
+
+
+def test_send_bulk_push_override(session, make_user):
+    """Test a shared push replaces the per-user text on the push channel only."""
+    user = make_user('bulk-override@test.com', fcm_token='token-c')
+
+    NotificationService.send_bulk(
+        [(user.id, 'Resumen personal', 'Gastaste $10.00', {'total': 10})],
+        notification_type='weekly_summary',
+        push=('Tu resumen está listo', 'Abre la app', {'week': '1'})
+    )
+    session.flush()
+
+    rows = {
+        row.channel: (row.title, row.message, row.data)
+        for row in NotificationOutbox.query.filter_by(user_id=user.id)
+    }
+    assert rows == {
+        'push': ('Tu resumen está listo', 'Abre la app', {'week': '1'}),
+        'email': ('Resumen personal', 'Gastaste $10.00', {'total': 10}),
+    }
+    notification = Notification.query.filter_by(user_id=user.id).one()
+    assert (notification.title, notification.data) == ('Resumen personal', {'total': 10})
+
+
+def test_send_bulk_rows_are_due_in_any_database_timezone(session, make_user):
+    """Test bulk-staged outbox rows are claimable right away whatever the session TimeZone."""
+    session.execute(text("SET LOCAL TimeZone = 'America/Lima'"))
+    user = make_user('bulk-timezone@test.com', fcm_token='token-d')
+
+    NotificationService.send_bulk([(user.id, 'Aviso', 'Mensaje', None)])
+    session.flush()
+
+    claimed = NotificationOutboxService.claim(limit=10, lease_seconds=60, now=datetime.now(timezone.utc))
+    assert sorted(row['channel'] for row in claimed) == ['email', 'push']
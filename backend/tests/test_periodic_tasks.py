@@ -0,0 +1,275 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.models import Category, Expense, Notification, Payment, PaymentReminder, UserProfile
+from app.models.task_checkpoint import TaskCheckpoint
+from app.services.budget_service import BudgetService
+from app.tasks import periodic_tasks
+from app.tasks.periodic_tasks import (
+    _user_id_ranges,
+    send_daily_reminders,
+    send_payment_reminders,
+    send_weekly_summary,
+    send_weekly_summary_chunk,
+)
+from app.utils.helpers import next_local_occurrence
+
+pytestmark = pytest.mark.usefixtures('no_outbox_delivery')
+
+NOW = datetime(2026, 3, 10, 15, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def frozen_clock(monkeypatch):
+    """Run the reminder tasks at NOW."""
+    zone_clock = periodic_tasks._ZoneClock
+    monkeypatch.setattr(periodic_tasks, '_ZoneClock', lambda now=None: zone_clock(NOW))
+
+
+def add_expense(session, user, amount, expense_date):
+    category = Category(user_id=user.id, name=f'Cat {amount}')
+    session.add(category)
+    session.flush()
+    session.add(Expense(user_id=user.id, category_id=category.id, amount=Decimal(amount), expense_date=expense_date))
+    session.flush()
+
+
+def reminder_prefs(enabled=True, reminder_time='20:00'):
+    return {'daily_reminder': enabled, 'reminder_time': reminder_time}
+
+
+def daily_reminders(user_id):
+    return Notification.query.filter_by(user_id=user_id, notification_type='daily_reminder').all()
+
+
+def add_payment(session, user, name, due_in_days=3, **fields):
+    payment = Payment(user_id=user.id, name=name, amount=Decimal('50.00'),
+                      due_date=date.today() + timedelta(days=due_in_days), **fields)
+    session.add(payment)
+    session.flush()
+    return payment
+
+
+def add_reminder(session, payment, days_before, fire_at, expires_at):
+    session.add(PaymentReminder(payment_id=payment.id, days_before=days_before, user_id=payment.user_id,
+                                fire_at=fire_at, expires_at=expires_at))
+    session.flush()
+
+
+def payment_reminders(user_id):
+    return Notification.query.filter_by(user_id=user_id, notification_type='payment_reminder').all()
+
+
+def in_range(user_id, lower, upper):
+    return (lower is None or user_id >= lower) and (upper is None or user_id < upper)
+
+
+def test_user_id_ranges_cover_each_user_once(session, make_user):
+    """Test every active user falls in exactly one chunk range."""
+    user_ids = [make_user(f'range{i}@test.com').id for i in range(5)]
+
+    ranges = _user_id_ranges(2)
+
+    assert len(ranges) == 3
+    assert ranges[0][0] is None and ranges[-1][1] is None
+    for user_id in user_ids:
+        assert sum(in_range(user_id, lower, upper) for lower, upper in ranges) == 1
+
+
+def test_weekly_summary_rerun_enqueues_only_pending_chunks(app, session, make_user, run_task, monkeypatch):
+    """Test a second run of the same week skips chunks marked done."""
+    enqueued = []
+    monkeypatch.setattr(send_weekly_summary_chunk, 'delay', lambda **kwargs: enqueued.append(kwargs))
+    monkeypatch.setitem(app.config, 'WEEKLY_SUMMARY_CHUNK_SIZE', 2)
+    for i in range(5):
+        make_user(f'weekly{i}@test.com')
+
+    first = run_task(send_weekly_summary)
+
+    assert first['chunks'] == 3
+    assert [kwargs['chunk_index'] for kwargs in enqueued] == [0, 1, 2]
+    assert TaskCheckpoint.query.filter_by(run_key=first['run_key']).count() == 3
+
+    session.get(TaskCheckpoint, (first['run_key'], 1)).state = 'done'
+    session.commit()
+    enqueued.clear()
+
+    second = run_task(send_weekly_summary)
+
+    assert second['enqueued_chunks'] == 2
+    assert [kwargs['chunk_index'] for kwargs in enqueued] == [0, 2]
+
+
+def test_weekly_summary_chunk_sends_and_marks_done(app, session, make_user, run_task, monkeypatch):
+    """Test a chunk notifies its opted-in users once and records its checkpoint."""
+    enqueued = []
+    monkeypatch.setattr(send_weekly_summary_chunk, 'delay', lambda **kwargs: enqueued.append(kwargs))
+    monkeypatch.setitem(app.config, 'WEEKLY_SUMMARY_CHUNK_SIZE', 10)
+    opted_in = [make_user(f'chunk{i}@test.com').id for i in range(3)]
+    make_user('chunk-off@test.com', notification_preferences={'weekly_summary': False})
+
+    run_task(send_weekly_summary)
+    result = run_task(send_weekly_summary_chunk, **enqueued[0])
+
+    assert result == {'status': 'success', 'chunk': 0, 'sent_count': 3}
+    notifications = Notification.query.filter_by(notification_type='weekly_summary').all()
+    assert sorted(notification.user_id for notification in notifications) == sorted(opted_in)
+    checkpoint = session.get(TaskCheckpoint, (enqueued[0]['run_key'], 0))
+    assert checkpoint.state == 'done'
+    assert checkpoint.processed == 3
+
+    again = run_task(send_weekly_summary_chunk, **enqueued[0])
+
+    assert again == {'status': 'skipped', 'chunk': 0}
+    assert Notification.query.filter_by(notification_type='weekly_summary').count() == 3
+
+
+def test_daily_reminders_only_process_due_profiles(session, make_user, run_task, frozen_clock):
+    """Test due profiles get today's spend and are rescheduled; others are left alone."""
+    today = NOW.date()
+    due = make_user(
+        'daily-due@test.com', timezone='UTC', notification_preferences=reminder_prefs(reminder_time='14:55'),
+        next_reminder_at=NOW - timedelta(minutes=5)
+    )
+    add_expense(session, due, '12.50', today)
+    add_expense(session, due, '7.50', today)
+    add_expense(session, due, '30.00', today - timedelta(days=1))
+    later = make_user(
+        'daily-later@test.com', timezone='UTC', notification_preferences=reminder_prefs(),
+        next_reminder_at=NOW + timedelta(hours=5)
+    )
+    disabled = make_user(
+        'daily-off@test.com', timezone='UTC', notification_preferences=reminder_prefs(enabled=False),
+        next_reminder_at=NOW - timedelta(minutes=1)
+    )
+
+    result = run_task(send_daily_reminders)
+
+    assert result == {'status': 'success', 'sent_count': 1}
+    expected_spent = float(BudgetService.get_period_expenses(due.id, today, today))
+    [notification] = daily_reminders(due.id)
+    assert notification.data == {'daily_spent': expected_spent} == {'daily_spent': 20.0}
+    assert '$20.00' in notification.message
+    assert daily_reminders(later.id) == [] and daily_reminders(disabled.id) == []
+
+    session.expire_all()
+    profiles = {profile.user_id: profile for profile in UserProfile.query.all()}
+    assert profiles[due.id].next_reminder_at == next_local_occurrence((14, 55), 'UTC', NOW)
+    assert profiles[later.id].next_reminder_at == NOW + timedelta(hours=5)
+    assert profiles[disabled.id].next_reminder_at is None
+
+
+def test_daily_reminders_use_each_users_local_day(session, make_user, run_task, frozen_clock):
+    """Test each zone counts its own local day and overdue reminders from a past day are not sent."""
+    # NOW is 10:00 on 10/03 in Lima and 04:00 on 11/03 in Auckland
+    lima = make_user(
+        'daily-lima@test.com', timezone='America/Lima', notification_preferences=reminder_prefs(reminder_time='09:30'),
+        next_reminder_at=datetime(2026, 3, 10, 14, 30, tzinfo=timezone.utc)
+    )
+    add_expense(session, lima, '11.00', date(2026, 3, 10))
+    add_expense(session, lima, '5.00', date(2026, 3, 11))
+    auckland = make_user(
+        'daily-auckland@test.com', timezone='Pacific/Auckland',
+        notification_preferences=reminder_prefs(reminder_time='03:30'),
+        next_reminder_at=datetime(2026, 3, 10, 14, 30, tzinfo=timezone.utc)
+    )
+    add_expense(session, auckland, '4.00', date(2026, 3, 10))
+    add_expense(session, auckland, '9.00', date(2026, 3, 11))
+    stale = make_user(
+        'daily-stale@test.com', timezone='America/Lima', notification_preferences=reminder_prefs(reminder_time='09:30'),
+        next_reminder_at=datetime(2026, 3, 9, 14, 30, tzinfo=timezone.utc)
+    )
+
+    result = run_task(send_daily_reminders)
+
+    assert result['sent_count'] == 2
+    assert [n.data for n in daily_reminders(lima.id)] == [{'daily_spent': 11.0}]
+    assert [n.data for n in daily_reminders(auckland.id)] == [{'daily_spent': 9.0}]
+    assert daily_reminders(stale.id) == []
+
+    session.expire_all()
+    next_at = {profile.user_id: profile.next_reminder_at for profile in UserProfile.query.all()}
+    assert next_at[lima.id] == next_at[stale.id] == datetime(2026, 3, 11, 14, 30, tzinfo=timezone.utc)
+    assert next_at[auckland.id] == datetime(2026, 3, 11, 14, 30, tzinfo=timezone.utc)
+
+
+def test_payment_reminders_send_missed_reminders_within_their_day(session, make_user, run_task):
+    """Test a late reminder is still sent before it expires and dropped after."""
+    now = datetime.now(timezone.utc)
+    user = make_user('payment-late@test.com')
+    payment = add_payment(session, user, 'Internet')
+    add_reminder(session, payment, 3, fire_at=now - timedelta(hours=3), expires_at=now + timedelta(hours=1))
+    add_reminder(session, payment, 7, fire_at=now - timedelta(days=4), expires_at=now - timedelta(days=3))
+
+    result = run_task(send_payment_reminders)
+
+    assert result == {'status': 'success', 'sent_count': 1, 'expired_count': 1}
+    [notification] = payment_reminders(user.id)
+    assert notification.message == f"Tu pago 'Internet' vence en 3 dias ({payment.due_date.isoformat()})."
+    assert notification.data['days_before'] == 3
+    assert PaymentReminder.query.count() == 0
+    session.refresh(payment)
+    assert (payment.reminder_7_sent, payment.reminder_3_sent) == (False, True)
+
+
+def test_payment_reminders_claim_deletes_rows_and_sets_flags(session, make_user, run_task):
+    """Test claimed rows are deleted, flags are OR-ed per payment and paid payments are skipped."""
+    now = datetime.now(timezone.utc)
+    due_window = dict(fire_at=now - timedelta(minutes=5), expires_at=now + timedelta(hours=2))
+    user = make_user('payment-claim@test.com')
+    earlier = add_payment(session, user, 'Renta', reminder_7_sent=True)
+    add_reminder(session, earlier, 3, **due_window)
+    today = add_payment(session, user, 'Luz', due_in_days=0)
+    add_reminder(session, today, 0, **due_window)
+    paid = add_payment(session, user, 'Agua', is_paid=True)
+    add_reminder(session, paid, 3, **due_window)
+    upcoming = add_payment(session, user, 'Gas', due_in_days=7)
+    add_reminder(session, upcoming, 7, fire_at=now + timedelta(hours=1), expires_at=now + timedelta(hours=6))
+    no_profile = make_user('payment-noprofile@test.com', profile=False)
+    orphan = add_payment(session, no_profile, 'Seguro')
+    add_reminder(session, orphan, 3, **due_window)
+
+    result = run_task(send_payment_reminders)
+
+    assert result == {'status': 'success', 'sent_count': 3, 'expired_count': 1}
+    assert sorted(n.data['payment_name'] for n in payment_reminders(user.id)) == ['Luz', 'Renta']
+    assert [n.data['payment_name'] for n in payment_reminders(no_profile.id)] == ['Seguro']
+    assert [(row.payment_id, row.days_before) for row in PaymentReminder.query.all()] == [(upcoming.id, 7)]
+
+    session.expire_all()
+    flags = {
+        payment.name: (payment.reminder_7_sent, payment.reminder_3_sent, payment.reminder_0_sent)
+        for payment in Payment.query.all()
+    }
+    assert flags == {
+        'Renta': (True, True, False),
+        'Luz': (False, False, True),
+        'Agua': (False, False, False),
+        'Gas': (False, False, False),
+        'Seguro': (False, True, False),
+    }
+
+
+def test_next_local_occurrence_is_after_the_fall_back_hour():
+    """Test the repeated local hour of a DST fall-back day never yields a time before `after`."""
+    after = datetime(2026, 11, 1, 6, 10, tzinfo=timezone.utc)  # 01:10 EST, second pass
+
+    next_at = next_local_occurrence((1, 30), 'America/New_York', after)
+
+    assert next_at == datetime(2026, 11, 2, 6, 30, tzinfo=timezone.utc)
+
+
+def test_daily_reminders_handle_each_profile_once_per_run(session, make_user, run_task, frozen_clock, monkeypatch):
+    """Test a profile rescheduled back into the due window is not sent again in the same run."""
+    monkeypatch.setattr(periodic_tasks, 'next_local_occurrence', lambda *args: NOW - timedelta(minutes=1))
+    user = make_user(
+        'daily-once@test.com', timezone='UTC', notification_preferences=reminder_prefs(reminder_time='14:55'),
+        next_reminder_at=NOW - timedelta(minutes=5)
+    )
+
+    result = run_task(send_daily_reminders)
+
+    assert result == {'status': 'success', 'sent_count': 1}
+    assert len(daily_reminders(user.id)) == 1
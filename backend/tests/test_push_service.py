@@ -0,0 +1,101 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.push_service import PushService
+from app.task_metrics import provider_metrics
+
+
+class StubFCM(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubFCMHandler)
+        self.requests = []
+        self.invalid = set()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/fcm/send'
+
+
+class StubFCMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        # pyfcm sends a single token as 'to'
+        tokens = payload.get('registration_ids') or [payload['to']]
+        self.server.requests.append({'tokens': tokens, **payload})
+        results = [
+            {'error': 'NotRegistered'} if token in self.server.invalid else {'message_id': f'm-{token}'}
+            for token in tokens
+        ]
+        body = json.dumps({
+            'multicast_id': 1,
+            'success': sum(1 for result in results if 'message_id' in result),
+            'failure': sum(1 for result in results if 'error' in result),
+            'canonical_ids': 0,
+            'results': results,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fcm():
+    server = StubFCM()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_service(fcm, **kwargs):
+    service = PushService(server_key=f'test-key-{fcm.server_address[1]}', **kwargs)
+    service.client.FCM_END_POINT = fcm.url
+    return service
+
+
+def test_push_services_share_one_client_per_thread(fcm):
+    """Test the FCM client is reused within a thread and not shared across threads."""
+    clients = []
+    thread = threading.Thread(target=lambda: clients.append(make_service(fcm).client))
+    thread.start()
+    thread.join()
+
+    assert make_service(fcm).client is make_service(fcm).client
+    assert clients[0] is not make_service(fcm).client
+
+
+def test_send_push_multicast_batches_and_reports_per_token(fcm, monkeypatch):
+    """Test tokens are sent batch_size per request and invalid ones are pruned in one call."""
+    pruned = []
+    monkeypatch.setattr(PushService, 'prune_tokens', staticmethod(lambda tokens: pruned.append(tokens)))
+    fcm.invalid = {'t1', 't4'}
+    before = provider_metrics.snapshot().get('fcm', {'recipients': 0})
+
+    errors = make_service(fcm, batch_size=2).send_push_multicast(
+        ['t0', 't1', 't2', 't3', 't4'], 'Resumen', 'Listo', {'week': '1'}
+    )
+
+    assert errors == [None, 'NotRegistered', None, None, 'NotRegistered']
+    assert [payload['tokens'] for payload in fcm.requests] == [['t0', 't1'], ['t2', 't3'], ['t4']]
+    assert fcm.requests[0]['notification']['title'] == 'Resumen'
+    assert pruned == [['t1', 't4']]
+    assert provider_metrics.snapshot()['fcm']['recipients'] == before['recipients'] + 5
+
+
+def test_send_push_without_server_key_reports_every_token():
+    """Test an unconfigured provider fails each token without a request."""
+    service = PushService(server_key='')
+
+    assert service.client is None
+    assert service.send_push_multicast(['a', 'b'], 'T', 'B') == ['push provider not configured'] * 2
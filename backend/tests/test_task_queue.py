@@ -0,0 +1,474 @@
+import logging
+import math
+import threading
+import time
+
+import pytest
+
+from app.task_backends import InMemoryResultBackend, ResultBackend
+from app.task_queue import TaskQueue, TaskRecord, TaskRecordStore, TaskState, TimeLimitExceeded
+
+
+def make_record(task_id, state=TaskState.SUCCESS, updated_at=None):
+    now = time.time() if updated_at is None else updated_at
+    return TaskRecord(id=task_id, name='test', state=state, created_at=now, updated_at=now)
+
+
+def wait_for(result, states, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if result.state in states:
+            return result.state
+        time.sleep(0.01)
+    return result.state
+
+
+def test_record_store_expires_by_state_ttl():
+    """Test finished records expire after their state's TTL."""
+    store = TaskRecordStore(ttls={TaskState.SUCCESS: 10})
+    store.put(make_record('old', updated_at=time.time() - 60))
+    store.put(make_record('running', state=TaskState.STARTED, updated_at=time.time() - 60))
+
+    assert store.get('old') is None
+    assert store.get('running') is not None
+    assert store.stats()['expired'] == 1
+
+
+def test_record_store_sweep_skips_unexpired_head():
+    """Test the sweep reaches expired records queued behind a longer-lived one."""
+    store = TaskRecordStore(ttls={TaskState.SUCCESS: 10, TaskState.FAILURE: 3600})
+    store.put(make_record('failed', state=TaskState.FAILURE, updated_at=time.time() - 60))
+    store.put(make_record('done', updated_at=time.time() - 60))
+    store.put(make_record('fresh'))
+
+    assert len(store) == 2
+    assert store.stats()['expired'] == 1
+    assert store.get('failed') is not None
+
+
+def test_record_store_evicts_lru_finished_records():
+    """Test capacity eviction drops least recently used finished records only."""
+    store = TaskRecordStore(max_entries=3)
+    store.put(make_record('live', state=TaskState.PENDING))
+    store.put(make_record('a'))
+    store.put(make_record('b'))
+    store.get('a')
+    store.put(make_record('c'))
+    store.put(make_record('d'))
+
+    stats = store.stats()
+    assert stats['live'] == 3
+    assert stats['evicted'] == 2
+    assert store.get('live') is not None
+    assert store.get('b') is None
+    assert store.get('d') is not None
+
+
+def test_task_queue_runs_task():
+    """Test a queued task runs and its record is retrievable."""
+    queue = TaskQueue(max_workers=1)
+
+    @queue.task(name='tests.add')
+    def add(a, b):
+        return a + b
+
+    result = add.delay(2, 3)
+
+    assert wait_for(result, {'SUCCESS', 'FAILURE'}) == 'SUCCESS'
+    assert result.result == 5
+    assert queue.stats()['records']['live'] == 1
+
+
+def test_task_queue_caps_concurrency_per_task_name():
+    """Test calls over max_concurrency are parked until a slot frees up."""
+    queue = TaskQueue(max_workers=4, lanes={})
+    release = threading.Event()
+    running = []
+
+    @queue.task(name='tests.blocking', max_concurrency=1)
+    def blocking(n):
+        running.append(n)
+        release.wait(5)
+        return n
+
+    first = blocking.delay(1)
+    second = blocking.delay(2)
+
+    assert wait_for(first, {'STARTED'}) == 'STARTED'
+    assert second.state == 'PENDING'
+    assert queue.lane_depths()['default'] == 1
+
+    release.set()
+    assert wait_for(second, {'SUCCESS'}) == 'SUCCESS'
+    assert running == [1, 2]
+
+
+def test_task_queue_countdown_and_revoke_delayed_task():
+    """Test countdown delays execution and delayed tasks can be revoked."""
+    queue = TaskQueue(max_workers=1, lanes={})
+
+    @queue.task(name='tests.echo')
+    def echo(value):
+        return value
+
+    delayed = echo.apply_async(args=('later',), countdown=0.2)
+    cancelled = echo.apply_async(kwargs={'value': 'never'}, countdown=0.2)
+
+    assert delayed.state == 'PENDING'
+    assert queue.stats()['delayed'] == 2
+    cancelled.revoke()
+
+    assert wait_for(delayed, {'SUCCESS'}) == 'SUCCESS'
+    assert delayed.result == 'later'
+    assert cancelled.state == 'REVOKED'
+
+
+def test_delayed_gauge_counts_only_delayed_submissions():
+    """Test time-limit watchdogs and coalesce windows are not reported as delayed tasks."""
+    queue = TaskQueue(max_workers=1, lanes={})
+    started, release = threading.Event(), threading.Event()
+
+    @queue.task(name='tests.guarded', soft_time_limit=30, time_limit=60)
+    def guarded():
+        started.set()
+        release.wait(5)
+
+    @queue.task(name='tests.window', coalesce_key=lambda: 'key', coalesce_window=30)
+    def window():
+        pass
+
+    @queue.task(name='tests.later')
+    def later():
+        pass
+
+    running = guarded.delay()
+    window.delay()
+    later.apply_async(countdown=30)
+    assert started.wait(5)
+
+    assert queue.gauges()['delayed'] == {'': 1}
+    assert queue.stats()['delayed'] == 1
+    release.set()
+    assert wait_for(running, {'SUCCESS'}) == 'SUCCESS'
+
+
+def test_task_queue_soft_time_limit_sets_flag_and_times_out():
+    """Test the soft time limit flags the task and ends in TIMEOUT."""
+    queue = TaskQueue(max_workers=1, lanes={})
+
+    @queue.task(name='tests.slow', bind=True, soft_time_limit=0.1, time_limit=5)
+    def slow(self):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            self.check_time_limit()
+            time.sleep(0.01)
+
+    result = slow.delay()
+
+    assert wait_for(result, {'TIMEOUT', 'SUCCESS', 'FAILURE'}) == 'TIMEOUT'
+    assert queue.stats()['timeouts']['tests.slow'] == {'soft': 1, 'hard': 0}
+
+
+def test_task_queue_hard_time_limit_discards_late_result():
+    """Test the hard time limit marks TIMEOUT even if the thread keeps running."""
+    queue = TaskQueue(max_workers=1, lanes={})
+    release = threading.Event()
+
+    @queue.task(name='tests.stuck', time_limit=0.1)
+    def stuck():
+        release.wait(5)
+        return 'late'
+
+    result = stuck.delay()
+
+    assert wait_for(result, {'TIMEOUT'}) == 'TIMEOUT'
+    release.set()
+    time.sleep(0.05)
+    assert result.state == 'TIMEOUT'
+    assert result.result is None
+
+
+def test_task_queue_revoke_cancels_running_task():
+    """Test revoking a started task trips its cancellation token."""
+    queue = TaskQueue(max_workers=1, lanes={})
+    processed = []
+
+    @queue.task(name='tests.loop', bind=True)
+    def loop(self):
+        for i in range(500):
+            try:
+                self.check_cancelled()
+                processed.append(i)
+                time.sleep(0.01)
+            except Exception:
+                continue
+
+    result = loop.delay()
+    assert wait_for(result, {'STARTED'}) == 'STARTED'
+    time.sleep(0.05)
+    result.revoke(terminate=True)
+
+    assert wait_for(result, {'REVOKED', 'SUCCESS'}) == 'REVOKED'
+    assert len(processed) < 500
+
+
+def test_task_queue_call_runs_on_process_lane():
+    """Test call() runs a function in a worker process and returns its result."""
+    queue = TaskQueue(max_workers=1, lanes={}, process_lanes={'cpu': 1})
+
+    try:
+        assert queue.call('cpu', math.factorial, 10, timeout=30) == 3628800
+        assert queue.stats()['lanes']['cpu']['processes'] == 1
+    finally:
+        queue.shutdown()
+
+
+def test_task_queue_call_timeout_recycles_only_its_lane():
+    """Test a call waiting for a busy lane times out untouched and a running one recycles only its lane."""
+    queue = TaskQueue(max_workers=1, lanes={}, process_lanes={'cpu': 1, 'cpu_sync': 1})
+    results = []
+
+    try:
+        assert queue.call('cpu', math.factorial, 5, timeout=30) == 120
+        busy = threading.Thread(target=lambda: results.append(queue.call('cpu_sync', time.sleep, 1, timeout=30)))
+        busy.start()
+        time.sleep(0.1)
+
+        with pytest.raises(TimeLimitExceeded):
+            queue.call('cpu_sync', math.factorial, 5, timeout=0.2)
+        busy.join(30)
+        assert results == [None]
+        assert queue.stats()['lanes']['cpu_sync']['restarts'] == 0
+
+        with pytest.raises(TimeLimitExceeded):
+            queue.call('cpu_sync', time.sleep, 30, timeout=0.5)
+        stats = queue.stats()['lanes']
+        assert stats['cpu_sync']['restarts'] == 1
+        assert stats['cpu']['restarts'] == 0
+        assert queue.call('cpu_sync', math.factorial, 5, timeout=30) == 120
+        assert queue.call('cpu', math.factorial, 6, timeout=30) == 720
+    finally:
+        queue.shutdown()
+
+
+def test_task_queue_coalesces_calls_with_same_key():
+    """Test calls sharing a coalesce key within the window run once with merged kwargs."""
+    queue = TaskQueue(max_workers=1, lanes={})
+    calls = []
+
+    @queue.task(
+        name='tests.check',
+        coalesce_key=lambda user_id, **_: user_id,
+        coalesce_window=0.2,
+        coalesce_merge=lambda pending, new: {**new, 'amount': pending['amount'] + new['amount']},
+    )
+    def check(user_id, amount):
+        calls.append((user_id, amount))
+        return amount
+
+    first = check.delay(user_id='u1', amount=10)
+    second = check.delay(user_id='u1', amount=5)
+    other = check.delay(user_id='u2', amount=1)
+
+    assert first.id == second.id
+    assert other.id != first.id
+    assert wait_for(first, {'SUCCESS'}) == 'SUCCESS'
+    assert wait_for(other, {'SUCCESS'}) == 'SUCCESS'
+    assert first.result == 15
+    assert sorted(calls) == [('u1', 15), ('u2', 1)]
+    assert queue.stats()['coalesced'] == 1
+
+
+def test_task_queue_records_metrics():
+    """Test outcomes and timings are recorded per task name and rendered for Prometheus."""
+    queue = TaskQueue(max_workers=1, lanes={})
+
+    @queue.task(name='tests.maybe_fail')
+    def maybe_fail(fail):
+        if fail:
+            raise ValueError('boom')
+        return 'ok'
+
+    ok = maybe_fail.delay(False)
+    failed = maybe_fail.delay(True)
+    assert wait_for(ok, {'SUCCESS'}) == 'SUCCESS'
+    assert wait_for(failed, {'FAILURE'}) == 'FAILURE'
+    time.sleep(0.05)
+
+    stats = queue.metrics_snapshot()['tasks']['tests.maybe_fail']
+    assert stats['success'] == 1
+    assert stats['failure'] == 1
+    assert stats['run_seconds']['count'] == 2
+    assert stats['wait_seconds']['count'] == 2
+
+    text = queue.metrics_text()
+    assert 'task_queue_tasks_total{task="tests.maybe_fail",outcome="failure"} 1' in text
+    assert 'task_queue_run_seconds_count{task="tests.maybe_fail"} 2' in text
+    assert 'task_queue_pending{lane="default"} 0' in text
+
+
+def test_task_queue_wait_metric_runs_from_enqueue():
+    """Test wait time includes the coalesce window and parking, but not a countdown."""
+    queue = TaskQueue(max_workers=2, lanes={})
+
+    @queue.task(name='tests.debounced', coalesce_key=lambda: 'key', coalesce_window=0.2)
+    def debounced():
+        return 'ok'
+
+    @queue.task(name='tests.serial', max_concurrency=1)
+    def serial():
+        time.sleep(0.2)
+
+    @queue.task(name='tests.later')
+    def later():
+        return 'ok'
+
+    results = [debounced.delay(), serial.delay(), serial.delay(), later.apply_async(countdown=1)]
+    for result in results:
+        assert wait_for(result, {'SUCCESS'}) == 'SUCCESS'
+
+    tasks = queue.metrics_snapshot()['tasks']
+    assert tasks['tests.debounced']['wait_seconds']['max'] >= 0.2
+    assert tasks['tests.serial']['wait_seconds']['max'] >= 0.2
+    assert tasks['tests.later']['wait_seconds']['max'] < 0.5
+
+
+def test_task_queue_status_visible_through_shared_backend():
+    """Test another queue (worker) reads task state from the shared result backend."""
+    backend = InMemoryResultBackend()
+    producer = TaskQueue(max_workers=1, lanes={})
+    other_worker = TaskQueue(max_workers=1, lanes={})
+    producer.use_result_backend(backend, flush_interval=0.01)
+    other_worker.use_result_backend(backend, flush_interval=0.01)
+
+    @producer.task(name='tests.report')
+    def report():
+        return {'size': 10}
+
+    result = report.delay()
+    assert wait_for(result, {'SUCCESS'}) == 'SUCCESS'
+
+    remote = other_worker.AsyncResult(result.id)
+    assert wait_for(remote, {'SUCCESS'}) == 'SUCCESS'
+    assert remote.result == {'size': 10}
+    assert other_worker.AsyncResult('unknown').state == 'PENDING'
+
+
+def test_result_backend_requires_every_method():
+    """Test an incomplete result backend fails at construction instead of on first use."""
+    class ReadOnlyBackend(ResultBackend):
+        def get(self, task_id):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnlyBackend()
+
+
+class FakeJobTable:
+    max_attempts = 5
+
+    def __init__(self, rows, exhausted=()):
+        self.rows = list(rows)
+        self.exhausted = list(exhausted)
+        self.completed = []
+
+    def drop_exhausted(self):
+        exhausted, self.exhausted = self.exhausted, []
+        return exhausted
+
+    def claim(self, worker_id, limit, lease_seconds):
+        claimed, self.rows = self.rows[:limit], self.rows[limit:]
+        return claimed
+
+    def renew(self, worker_id, job_ids, lease_seconds):
+        pass
+
+    def complete(self, job_ids):
+        self.completed.extend(job_ids)
+
+    def release(self, worker_id, job_ids):
+        pass
+
+
+def test_worker_runs_claimed_jobs_and_completes_them():
+    """Test the worker runs claimed rows through the registered task and deletes them."""
+    from app.worker import Worker
+
+    queue = TaskQueue(max_workers=2, lanes={})
+    seen = []
+
+    @queue.task(name='tests.job')
+    def job(value):
+        seen.append(value)
+
+    jobs = FakeJobTable([
+        {'id': 'job-1', 'name': 'tests.job', 'args': [1], 'kwargs': {}, 'attempts': 1},
+        {'id': 'job-2', 'name': 'tests.job', 'args': [], 'kwargs': {'value': 2}, 'attempts': 1},
+        {'id': 'job-3', 'name': 'tests.missing', 'args': [], 'kwargs': {}, 'attempts': 1},
+    ])
+    worker = Worker(None, queue, jobs, batch_size=2, poll_interval=0.01, lease_seconds=30)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+
+    deadline = time.time() + 5
+    while len(jobs.completed) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    worker.stop()
+    thread.join(5)
+
+    assert sorted(seen) == [1, 2]
+    assert sorted(jobs.completed) == ['job-1', 'job-2', 'job-3']
+
+
+def test_worker_runs_jobs_sharing_a_coalesce_key_separately():
+    """Test claimed rows are not coalesced again, so each one runs under its own id and completes."""
+    from app.worker import Worker
+
+    queue = TaskQueue(max_workers=2, lanes={})
+    seen = []
+
+    @queue.task(name='tests.debounced_job', coalesce_key=lambda user_id: user_id, coalesce_window=30)
+    def debounced_job(user_id):
+        seen.append(user_id)
+
+    jobs = FakeJobTable([
+        {'id': 'job-1', 'name': 'tests.debounced_job', 'args': ['u1'], 'kwargs': {}, 'attempts': 1},
+        {'id': 'job-2', 'name': 'tests.debounced_job', 'args': ['u1'], 'kwargs': {}, 'attempts': 1},
+    ])
+    worker = Worker(None, queue, jobs, batch_size=2, poll_interval=0.01, lease_seconds=30)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+
+    deadline = time.time() + 5
+    while len(jobs.completed) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    worker.stop()
+    thread.join(5)
+
+    assert seen == ['u1', 'u1']
+    assert sorted(jobs.completed) == ['job-1', 'job-2']
+    assert queue.stats()['coalesced'] == 0
+
+
+def test_worker_drops_and_logs_exhausted_jobs(caplog):
+    """Test rows whose lease expired on their last attempt are dropped and logged, not run."""
+    from app.worker import Worker
+
+    queue = TaskQueue(max_workers=1, lanes={})
+    seen = []
+
+    @queue.task(name='tests.exhausted_job')
+    def exhausted_job():
+        seen.append('ran')
+
+    jobs = FakeJobTable([], exhausted=[
+        {'id': 'job-1', 'name': 'tests.exhausted_job', 'attempts': 5, 'locked_by': 'worker-a'},
+    ])
+    worker = Worker(None, queue, jobs, batch_size=2, poll_interval=0.01, lease_seconds=30)
+
+    with caplog.at_level(logging.ERROR, logger='app.worker'):
+        assert worker._claim() == 0
+
+    assert seen == []
+    assert jobs.exhausted == []
+    assert any('job-1' in record.getMessage() and 'attempt 5 of 5' in record.getMessage() for record in caplog.records)
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from app.task_queue import TaskQueue
+from app.task_scheduler import FileLeaderLock, SchedulerLeader, SingleFlightJob
+
+
+def test_only_one_process_is_scheduler_leader(tmp_path):
+    """Test a second contender stays follower until the leader resigns."""
+    path = str(tmp_path / 'scheduler.lock')
+    first = SchedulerLeader(FileLeaderLock(path))
+    second = SchedulerLeader(FileLeaderLock(path))
+
+    first.elect()
+    second.elect()
+    assert first.is_leader
+    assert not second.is_leader
+
+    first.resign()
+    second.elect()
+    assert second.is_leader
+
+
+def test_cron_jobs_only_fire_on_leader(tmp_path):
+    """Test scheduled callbacks are no-ops on followers."""
+    queue = TaskQueue(max_workers=1, lanes={})
+    fired = []
+
+    @queue.task(name='tests.tick')
+    def tick():
+        fired.append(1)
+
+    leader = SchedulerLeader(FileLeaderLock(str(tmp_path / 'scheduler.lock')))
+    job = SingleFlightJob('tick', tick, leader, queue.metrics)
+
+    job()
+    assert fired == []
+
+    leader.elect()
+    job()
+    deadline = time.time() + 5
+    while not fired and time.time() < deadline:
+        time.sleep(0.01)
+    assert fired == [1]
+    leader.resign()
+
+
+def test_single_flight_job_skips_ticks_while_previous_run_is_in_progress(tmp_path):
+    """Test overlapping ticks are skipped and the finished run's duration is recorded."""
+    queue = TaskQueue(max_workers=2, lanes={})
+    release = threading.Event()
+
+    @queue.task(name='tests.slow_tick')
+    def slow_tick():
+        release.wait(5)
+
+    leader = SchedulerLeader(FileLeaderLock(str(tmp_path / 'scheduler.lock')))
+    leader.elect()
+    job = SingleFlightJob('slow_tick', slow_tick, leader, queue.metrics)
+
+    job()
+    job()
+    job()
+    release.set()
+    deadline = time.time() + 5
+    while queue.metrics.scheduled_snapshot()['slow_tick']['run_seconds']['count'] == 0 and time.time() < deadline:
+        job.collect()
+        time.sleep(0.01)
+
+    stats = queue.metrics.scheduled_snapshot()['slow_tick']
+    assert stats['fired'] == 1
+    assert stats['skipped'] == 2
+    assert stats['last_run_seconds'] is not None
+    leader.resign()